@@ -2,10 +2,35 @@ from makeproto.interface import ILabeledMethod, IMetaType, IProtoPackage, IServi
 
 __all__ = [
     "compile_service",
+    "compile_service_partial",
+    "compile_service_async",
+    "CompileOptions",
+    "CompileResult",
+    "CompileSession",
     "IService",
     "ILabeledMethod",
     "IMetaType",
     "IProtoPackage",
+    "memoize_function",
+    "write_protos",
+    "write_archive",
+    "WriteResult",
+    "run_protoc",
+    "compile_descriptors",
+    "ShardPolicy",
 ]
 
-from makeproto.build_service import compile_service
+from makeproto.archive import write_archive
+from makeproto.async_compile import compile_service_async
+from makeproto.build_service import (
+    CompileResult,
+    compile_service,
+    compile_service_partial,
+)
+from makeproto.descriptor import compile_descriptors
+from makeproto.memo import memoize_function
+from makeproto.options import CompileOptions
+from makeproto.protoc import run_protoc
+from makeproto.session import CompileSession
+from makeproto.shard import ShardPolicy
+from makeproto.writer import WriteResult, write_protos
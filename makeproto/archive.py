@@ -0,0 +1,131 @@
+import bz2
+import contextlib
+import gzip
+import io
+import lzma
+import tarfile
+import zipfile
+from pathlib import Path
+
+from typing_extensions import IO, Iterable, Iterator, List, Set, Union
+
+from makeproto.interface import IProtoPackage
+
+# zip cannot store anything older than 1980; tar uses the same instant
+ARCHIVE_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+ARCHIVE_MTIME = 315532800
+ARCHIVE_FILE_MODE = 0o644
+
+ARCHIVE_FORMATS = ("zip", "tar", "tar.gz", "tar.bz2", "tar.xz")
+
+
+def _iter_chunks(package: IProtoPackage) -> Iterator[str]:
+    iter_content = getattr(package, "iter_content", None)
+    if iter_content is not None:
+        return iter_content()
+    return iter([package.content])
+
+
+def _check_unique(name: str, seen: Set[str]) -> None:
+    if name in seen:
+        raise ValueError(f"Duplicated archive entry: {name}")
+    seen.add(name)
+
+
+def write_zip(
+    packages: Iterable[IProtoPackage],
+    sink: IO[bytes],
+    encoding: str = "utf-8",
+    compression: int = zipfile.ZIP_DEFLATED,
+) -> List[str]:
+    names: List[str] = []
+    seen: Set[str] = set()
+    # zipfile handles unseekable sinks (pipes, sockets) with data descriptors
+    with zipfile.ZipFile(sink, mode="w", compression=compression) as archive:
+        for package in packages:
+            name = package.qual_name
+            _check_unique(name, seen)
+            info = zipfile.ZipInfo(name, date_time=ARCHIVE_DATE_TIME)
+            info.compress_type = compression
+            info.create_system = 3
+            info.external_attr = (0o100000 | ARCHIVE_FILE_MODE) << 16
+            with archive.open(info, mode="w") as entry:
+                for chunk in _iter_chunks(package):
+                    entry.write(chunk.encode(encoding))
+            names.append(name)
+    return names
+
+
+@contextlib.contextmanager
+def _compressed(sink: IO[bytes], compression: str) -> Iterator[IO[bytes]]:
+    if compression == "gz":
+        # an explicit mtime and no file name keep the gzip header stable
+        with gzip.GzipFile(
+            filename="", mode="wb", fileobj=sink, mtime=ARCHIVE_MTIME
+        ) as stream:
+            yield stream  # type: ignore[misc]
+    elif compression == "bz2":
+        with bz2.BZ2File(sink, mode="wb") as stream:
+            yield stream  # type: ignore[misc]
+    elif compression == "xz":
+        with lzma.LZMAFile(sink, mode="wb") as stream:
+            yield stream  # type: ignore[misc]
+    else:
+        yield sink
+
+
+def write_tar(
+    packages: Iterable[IProtoPackage],
+    sink: IO[bytes],
+    encoding: str = "utf-8",
+    compression: str = "",
+) -> List[str]:
+    names: List[str] = []
+    seen: Set[str] = set()
+    with _compressed(sink, compression) as stream:
+        # "w|" writes strictly forward, so the sink never needs to seek
+        with tarfile.open(fileobj=stream, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+            for package in packages:
+                name = package.qual_name
+                _check_unique(name, seen)
+                # tar headers carry the size up front
+                data = "".join(_iter_chunks(package)).encode(encoding)
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mtime = ARCHIVE_MTIME
+                info.mode = ARCHIVE_FILE_MODE
+                info.uid = info.gid = 0
+                info.uname = info.gname = ""
+                tar.addfile(info, io.BytesIO(data))
+                names.append(name)
+    return names
+
+
+def write_archive(
+    packages: Iterable[IProtoPackage],
+    sink: Union[str, Path, IO[bytes]],
+    format: str = "zip",
+    encoding: str = "utf-8",
+) -> List[str]:
+    if format not in ARCHIVE_FORMATS:
+        raise ValueError(
+            f"Unknown archive format '{format}', expected one of {ARCHIVE_FORMATS}"
+        )
+
+    def write(target: IO[bytes]) -> List[str]:
+        if format == "zip":
+            return write_zip(packages, target, encoding)
+        return write_tar(packages, target, encoding, format[len("tar.") :])
+
+    if isinstance(sink, (str, Path)):
+        with open(sink, "wb") as f:
+            return write(f)
+    return write(sink)
+
+
+def archive_bytes(
+    packages: Iterable[IProtoPackage], format: str = "zip", encoding: str = "utf-8"
+) -> bytes:
+    buffer = io.BytesIO()
+    write_archive(packages, buffer, format, encoding)
+    return buffer.getvalue()
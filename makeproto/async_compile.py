@@ -0,0 +1,158 @@
+import asyncio
+import functools
+import threading
+
+from typing_extensions import (
+    Any,
+    AsyncGenerator,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from makeproto.build_service import (
+    PortableResult,
+    check_picklable,
+    compile_portable_package,
+    generate_protos,
+    make_compiler_context,
+    portable_context,
+)
+from makeproto.compiler import CompilerContext, CompilerPass, ErrorBudget
+from makeproto.compiler_passes import CompilationError, compile_package
+from makeproto.interface import IProtoPackage, IService
+from makeproto.make_service_template import make_service_template
+from makeproto.options import CompileOptions
+from makeproto.portable import PortableService, make_portable_service
+from makeproto.shard import ShardPolicy, shard_templates
+
+PackageOutcome = Tuple[List[IProtoPackage], CompilerContext]
+
+
+def compile_render_package(
+    service_list: Sequence[IService],
+    compilerpasses: List[List[CompilerPass]],
+    version: int,
+    renderer: str,
+    fuse_passes: bool,
+    budget: ErrorBudget,
+    cancelled: threading.Event,
+    shard: Optional[ShardPolicy] = None,
+) -> PackageOutcome:
+    compiler_ctx = make_compiler_context(service_list, version)
+    if compiler_ctx is None or cancelled.is_set():
+        return [], CompilerContext()
+    allmodules, ctx = compiler_ctx
+    templates = [make_service_template(service) for service in service_list]
+    compile_package((templates, ctx), compilerpasses, fuse_passes, budget)
+    # a cancelled or over-budget run still finishes the pass it was in, but
+    # skips rendering
+    if ctx.has_errors() or cancelled.is_set() or budget.exhausted:
+        return [], ctx
+    return (
+        list(generate_protos(shard_templates(allmodules, shard, renderer), renderer)),
+        ctx,
+    )
+
+
+async def compile_service_async(
+    services: Dict[str, List[IService]],
+    options: Optional[CompileOptions] = None,
+) -> AsyncGenerator[IProtoPackage, None]:
+
+    options = options or CompileOptions()
+    # rendering happens per package inside the executor
+    options.reject(
+        "compile_service_async",
+        "stream",
+        "render_executor",
+        "jobs",
+        "render_cache",
+        "disk_cache",
+    )
+    # packages always compile concurrently, on executor threads or processes
+    make_passes = options.pass_factory(concurrent=True)
+    executor = options.compile_executor
+    loop = asyncio.get_running_loop()
+    cancelled = threading.Event()
+    budget = options.error_budget()
+
+    if options.in_processes:
+        check_picklable(
+            name_normalizer=options.name_normalizer,
+            format_comment=options.format_comment,
+            extra_passes=options.extra_passes,
+        )
+    futures: List["asyncio.Future[PackageOutcome]"] = []
+    for service_list in services.values():
+        if not service_list:
+            continue
+        if options.in_processes:
+            process_job = _compile_in_process(service_list, options)
+            futures.append(asyncio.ensure_future(process_job))
+        else:
+            thread_job = functools.partial(
+                compile_render_package,
+                service_list,
+                make_passes(),
+                options.version,
+                options.renderer,
+                options.fuse_passes,
+                budget,
+                cancelled,
+                options.shard,
+            )
+            futures.append(loop.run_in_executor(executor, thread_job))
+
+    failed: List[CompilerContext] = []
+    try:
+        # packages come out in input order, each as soon as it and the ones
+        # before it are done
+        for future in futures:
+            packages, ctx = await future
+            if ctx.has_errors():
+                failed.append(ctx)
+                if options.fail_fast or budget.exhausted:
+                    break
+            if failed:
+                # the run has failed; keep collecting errors, stop yielding
+                continue
+            for package in packages:
+                yield package
+        if failed:
+            raise CompilationError(failed, limit_reached=budget.exhausted)
+    finally:
+        # on failure, aclose() or task cancellation: queued packages never
+        # start and running ones skip rendering
+        cancelled.set()
+        for future in futures:
+            future.cancel()
+
+
+def make_portable_services(
+    service_list: Sequence[IService],
+    custompassmethod: Callable[[Callable[..., Any]], List[str]],
+) -> List[PortableService]:
+    return [
+        make_portable_service(service, custompassmethod) for service in service_list
+    ]
+
+
+async def _compile_in_process(
+    service_list: Sequence[IService], options: CompileOptions
+) -> PackageOutcome:
+    loop = asyncio.get_running_loop()
+    # the user's custom pass runs here for every method: it stays in this
+    # process, but off the event loop
+    portable = await loop.run_in_executor(
+        None,
+        functools.partial(
+            make_portable_services, service_list, options.custompassmethod
+        ),
+    )
+    job = functools.partial(compile_portable_package, portable, options.for_workers())
+    result: PortableResult = await loop.run_in_executor(options.compile_executor, job)
+    return list(result.packages), portable_context(service_list[0].package, result)
@@ -1,70 +1,529 @@
-from dataclasses import dataclass
-from typing import Generator, Iterable, Mapping, Set
+import io
+import json
+import os
+import pickle
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import Deque, Generator, Iterable, Iterator, Mapping, Sequence, Set
 
 from typing_extensions import Any, Callable, Dict, List, Optional, Tuple
 
 from makeproto.compiler import CompilerContext, CompilerPass
 from makeproto.compiler_passes import (
     CompilationError,
+    PassFactory,
+    build_extra_passes,
+    compile_package,
     default_format,
+    identity,
     make_setters,
     make_validators,
+    no_custom_errors,
     run_compiler_passes,
+    run_compiler_passes_parallel,
 )
+from makeproto.disk_cache import disk_cache_key
 from makeproto.format_comment import format_comment
 from makeproto.interface import IProtoPackage, IService
 from makeproto.make_service_template import make_service_template
-from makeproto.template import ProtoTemplate, ServiceTemplate, render_protofile_template
+from makeproto.options import CompileOptions, resolve_options
+from makeproto.portable import make_portable_service, portable_custom_errors
+from makeproto.render_cache import RenderCache, render_key
+from makeproto.renderers import (
+    ChunkRenderer,
+    Renderer,
+    get_chunk_renderer,
+    get_renderer,
+)
+from makeproto.report import CompileReport
+from makeproto.shard import shard_templates
+from makeproto.template import (
+    ProtoTemplate,
+    ServiceTemplate,
+    detach_protofile,
+    proto_qual_name,
+    warn_empty_protofile,
+)
 from makeproto.validators.name import check_valid, check_valid_filenames
 
 
 def compile_service(
     services: Dict[str, List[IService]],
-    name_normalizer: Callable[[str], str] = lambda x: x,
+    name_normalizer: Callable[[str], str] = identity,
     format_comment: Callable[[str], str] = default_format,
-    custompassmethod: Callable[[Callable[..., Any]], List[str]] = lambda x: [],
+    custompassmethod: Callable[[Callable[..., Any]], List[str]] = no_custom_errors,
     version: int = 3,
+    options: Optional[CompileOptions] = None,
 ) -> Optional[Generator[IProtoPackage, None, None]]:
 
-    validators = make_validators(custompassmethod)
-    setters = make_setters(
-        name_normalizer=name_normalizer, format_comment=format_comment
+    options = resolve_options(
+        options,
+        name_normalizer=name_normalizer,
+        format_comment=format_comment,
+        custompassmethod=custompassmethod,
+        version=version,
     )
+    if options.disk_cache is not None:
+        return compile_service_cached(services, options)
 
-    return compile_service_internal(
-        services,
-        [validators, setters],
-        version,
-    )
+    make_passes = options.pass_factory()
+    if options.in_processes:
+        return compile_service_processes(services, options)
+    return compile_service_internal(services, make_passes(), options, make_passes)
 
 
 def compile_service_internal(
     services: Dict[str, List[IService]],
     compilerpasses: List[List[CompilerPass]],
-    version: int = 3,
+    options: Optional[CompileOptions] = None,
+    make_passes: Optional[PassFactory] = None,
 ) -> Optional[Generator[IProtoPackage, None, None]]:
 
-    all_templates, compiler_execution = prepare_modules(services, version)
+    options = options or CompileOptions()
+    all_templates = compile_templates(services, compilerpasses, options, make_passes)
+    if all_templates is None:
+        return None
+
+    return generate_protos(
+        shard_templates(all_templates, options.shard, options.renderer),
+        renderer=options.renderer,
+        stream=options.stream,
+        render_executor=options.render_executor,
+        jobs=options.jobs,
+        render_cache=options.render_cache,
+    )
+
+
+def compile_templates(
+    services: Dict[str, List[IService]],
+    compilerpasses: List[List[CompilerPass]],
+    options: CompileOptions,
+    make_passes: Optional[PassFactory] = None,
+) -> Optional[List[ProtoTemplate]]:
+
+    compile_executor = options.compile_executor
+    if options.in_processes:
+        raise ValueError("compile_executor must share memory (e.g. a thread pool)")
+    if compile_executor is not None and make_passes is None:
+        raise ValueError(
+            "compile_executor needs make_passes to build a pipeline per package"
+        )
+    all_templates, compiler_execution = prepare_modules(services, options.version)
     try:
-        for compilerpass in compilerpasses:
-            run_compiler_passes(compiler_execution, compilerpass)
+        if compile_executor is not None and make_passes is not None:
+            run_compiler_passes_parallel(
+                compiler_execution,
+                make_passes,
+                compile_executor,
+                options.fuse_passes,
+                max_errors=options.max_errors,
+                fail_fast=options.fail_fast,
+            )
+        else:
+            budget = options.error_budget()
+            for compilerpass in compilerpasses:
+                run_compiler_passes(
+                    compiler_execution, compilerpass, options.fuse_passes, budget=budget
+                )
     except CompilationError as e:
         for ctx in e.contexts:
             if ctx.has_errors():
                 ctx.show()
         return None
+    return all_templates
+
+
+def compile_service_cached(
+    services: Dict[str, List[IService]], options: CompileOptions
+) -> Optional[Generator[IProtoPackage, None, None]]:
+
+    disk_cache = options.disk_cache
+    if disk_cache is None:
+        raise ValueError("compile_service_cached needs options.disk_cache")
+    keys = {
+        name: disk_cache_key(
+            service_list,
+            options.version,
+            options.renderer,
+            options.name_normalizer,
+            options.format_comment,
+            options.custompassmethod,
+            list(options.extra_passes),
+            options.shard,
+            options.cache_salt,
+        )
+        for name, service_list in services.items()
+        if service_list
+    }
+    cached = {name: load_packages(disk_cache.get(key)) for name, key in keys.items()}
+    missing = {name: services[name] for name, hit in cached.items() if hit is None}
+
+    if missing:
+        protos = compile_service(
+            missing, options=replace(options, disk_cache=None, cache_salt=None)
+        )
+        if protos is None:
+            return None
+        by_package: Dict[str, List[IProtoPackage]] = {}
+        for proto in protos:
+            by_package.setdefault(proto.package, []).append(proto)
+        for name, service_list in missing.items():
+            packages = by_package.get(service_list[0].package, [])
+            disk_cache.put(keys[name], dump_packages(packages))
+            cached[name] = packages
+        disk_cache.prune()
+
+    def generate_results() -> Generator[IProtoPackage, None, None]:
+        for name in keys:
+            yield from cached[name] or []
+
+    return generate_results()
+
+
+def dump_packages(packages: List[IProtoPackage]) -> str:
+    return json.dumps(
+        [
+            {
+                "package": package.package,
+                "filename": package.filename,
+                "content": package.content,
+                "depends": sorted(package.depends),
+            }
+            for package in packages
+        ]
+    )
+
+
+def load_packages(data: Optional[str]) -> Optional[List[IProtoPackage]]:
+    if data is None:
+        return None
+    try:
+        entries = json.loads(data)
+        return [
+            ProtoPackage(
+                entry["package"],
+                entry["filename"],
+                entry["content"],
+                set(entry["depends"]),
+            )
+            for entry in entries
+        ]
+    except (ValueError, KeyError, TypeError):
+        # an unreadable entry is a miss; the next put() replaces it
+        return None
+
+
+@dataclass
+class CompileResult:
+    packages: Iterator[IProtoPackage]
+    failed: List[CompilerContext]
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed
 
-    def generate_protos() -> Generator[IProtoPackage, None, None]:
-        for template in all_templates:
-            module_dict = template.to_dict()
-            if not module_dict:  # pragma: no cover
+
+def compile_service_partial(
+    services: Dict[str, List[IService]],
+    options: Optional[CompileOptions] = None,
+) -> CompileResult:
+
+    options = options or CompileOptions()
+    options.reject("compile_service_partial", "disk_cache")
+    make_passes = options.pass_factory()
+
+    if options.in_processes:
+        results = run_portable_packages(services, options)
+        failed = [
+            portable_context(name, result)
+            for name, result in results
+            if any(len(report) for report in result.reports)
+        ]
+        portable_packages = [
+            package for _, result in results for package in result.packages
+        ]
+        return CompileResult(iter(portable_packages), failed)
+
+    groups = prepare_packages(services, options.version)
+
+    # every package is compiled on a pipeline of its own with its own error
+    # budget, so one broken package cannot stop or taint the others
+    def compile_one(
+        pack: Tuple[List[ServiceTemplate], CompilerContext],
+    ) -> CompilerContext:
+        return compile_package(
+            pack, make_passes(), options.fuse_passes, options.error_budget()
+        )
+
+    packs = [(blocks, ctx) for _, blocks, ctx in groups]
+    if options.compile_executor is not None:
+        ctxs = list(options.compile_executor.map(compile_one, packs))
+    else:
+        ctxs = [compile_one(pack) for pack in packs]
+
+    healthy = [
+        template
+        for (templates, _, _), ctx in zip(groups, ctxs)
+        if not ctx.has_errors()
+        for template in templates
+    ]
+    packages = generate_protos(
+        shard_templates(healthy, options.shard, options.renderer),
+        renderer=options.renderer,
+        stream=options.stream,
+        render_executor=options.render_executor,
+        jobs=options.jobs,
+        render_cache=options.render_cache,
+    )
+    return CompileResult(packages, [ctx for ctx in ctxs if ctx.has_errors()])
+
+
+@dataclass
+class PortableResult:
+    packages: List["ProtoPackage"]
+    reports: List[CompileReport]
+
+
+def compile_portable_package(
+    service_list: Sequence[IService], options: CompileOptions
+) -> PortableResult:
+
+    compiler_ctx = make_compiler_context(service_list, options.version)
+    if compiler_ctx is None:  # pragma: no cover
+        return PortableResult([], [])
+    allmodules, ctx = compiler_ctx
+    templates = [make_service_template(service) for service in service_list]
+    compilerpasses = [
+        make_validators(portable_custom_errors),
+        make_setters(
+            name_normalizer=options.name_normalizer,
+            format_comment=options.format_comment,
+        )
+        + build_extra_passes(list(options.extra_passes)),
+    ]
+    compile_package(
+        (templates, ctx), compilerpasses, options.fuse_passes, options.error_budget()
+    )
+    reports = list(ctx.reports.values())
+    if ctx.has_errors():
+        return PortableResult([], reports)
+    packages = [
+        ProtoPackage(template.package, template.module, rendered, template.depends())
+        for template, rendered in render_templates(
+            shard_templates(allmodules, options.shard, options.renderer),
+            options.renderer,
+        )
+        if rendered
+    ]
+    return PortableResult(packages, reports)
+
+
+def compile_service_processes(
+    services: Dict[str, List[IService]], options: CompileOptions
+) -> Optional[Generator[IProtoPackage, None, None]]:
+
+    results = run_portable_packages(services, options)
+
+    failed = False
+    for name, result in results:
+        if any(len(report) for report in result.reports):
+            failed = True
+            portable_context(name, result).show()
+    if failed:
+        return None
+
+    def generate_results() -> Generator[IProtoPackage, None, None]:
+        for _, result in results:
+            yield from result.packages
+
+    return generate_results()
+
+
+def run_portable_packages(
+    services: Dict[str, List[IService]], options: CompileOptions
+) -> List[Tuple[str, PortableResult]]:
+
+    executor = options.compile_executor
+    if executor is None:
+        raise ValueError("run_portable_packages needs options.compile_executor")
+    check_picklable(
+        name_normalizer=options.name_normalizer,
+        format_comment=options.format_comment,
+        extra_passes=options.extra_passes,
+    )
+    worker_options = options.for_workers()
+    names: List[str] = []
+    futures: List["Future[PortableResult]"] = []
+    for service_list in services.values():
+        if not service_list:
+            continue
+        # user callables and types stay here; workers get plain data only
+        portable = [
+            make_portable_service(service, options.custompassmethod)
+            for service in service_list
+        ]
+        names.append(service_list[0].package)
+        futures.append(
+            executor.submit(compile_portable_package, portable, worker_options)
+        )
+    return [(name, future.result()) for name, future in zip(names, futures)]
+
+
+def check_picklable(**arguments: Any) -> None:
+    # fail before anything is submitted, not with a bare PicklingError from
+    # the first future
+    for name, value in arguments.items():
+        try:
+            pickle.dumps(value)
+        except (pickle.PicklingError, AttributeError, TypeError) as e:
+            raise ValueError(
+                f"process-pool compilation sends {name} to the workers, but it "
+                f"cannot be pickled ({e}); use module-level functions and "
+                "classes"
+            ) from e
+
+
+def portable_context(name: str, result: PortableResult) -> CompilerContext:
+    ctx = CompilerContext(name=name)
+    for report in result.reports:
+        ctx.reports[report] = report
+        ctx.error_count += len(report)
+    return ctx
+
+
+def generate_protos(
+    templates: List[ProtoTemplate],
+    renderer: str = "jinja",
+    stream: bool = False,
+    render_executor: Optional[Executor] = None,
+    jobs: Optional[int] = None,
+    render_cache: Optional[RenderCache] = None,
+) -> Generator[IProtoPackage, None, None]:
+
+    if stream:
+        render_chunks = get_chunk_renderer(renderer)
+        for template in templates:
+            if template.is_empty():
+                warn_empty_protofile(template)
                 continue
-            rendered = render_protofile_template(module_dict)
-            yield ProtoPackage(
-                template.package, template.module, rendered, template.imports
+            yield StreamingProtoPackage(
+                template.package,
+                template.module,
+                template.depends(),
+                template,
+                render_chunks,
             )
+        return
 
-    return generate_protos()
+    for template, rendered in render_templates(
+        templates, renderer, render_executor, jobs, render_cache
+    ):
+        if not rendered:  # pragma: no cover
+            continue
+        yield ProtoPackage(
+            template.package, template.module, rendered, template.depends()
+        )
+
+
+def render_templates(
+    templates: Iterable[ProtoTemplate],
+    renderer: str = "jinja",
+    executor: Optional[Executor] = None,
+    jobs: Optional[int] = None,
+    cache: Optional[RenderCache] = None,
+) -> Iterator[Tuple[ProtoTemplate, str]]:
+
+    render = get_renderer(renderer)
+    if executor is None:
+        if (jobs or 1) <= 1:
+            for template in templates:
+                key, rendered = _cache_lookup(template, renderer, cache)
+                if rendered is None:
+                    rendered = render(template)
+                    _cache_store(key, rendered, cache)
+                yield template, rendered
+            return
+        with ThreadPoolExecutor(max_workers=jobs) as own_executor:
+            yield from _render_ordered(
+                templates, renderer, render, own_executor, jobs, cache
+            )
+        return
+    yield from _render_ordered(templates, renderer, render, executor, jobs, cache)
+
+
+def _cache_lookup(
+    template: ProtoTemplate, renderer: str, cache: Optional[RenderCache]
+) -> Tuple[Optional[str], Optional[str]]:
+    if cache is None:
+        return None, None
+    key = render_key(template, renderer)
+    return key, cache.get(key)
+
+
+def _cache_store(
+    key: Optional[str], rendered: str, cache: Optional[RenderCache]
+) -> None:
+    if cache is not None and key is not None:
+        cache.put(key, rendered)
+
+
+def _render_ordered(
+    templates: Iterable[ProtoTemplate],
+    renderer: str,
+    render: Renderer,
+    executor: Executor,
+    jobs: Optional[int],
+    cache: Optional[RenderCache],
+) -> Iterator[Tuple[ProtoTemplate, str]]:
+
+    detach = isinstance(executor, ProcessPoolExecutor)
+    window = 2 * (jobs or os.cpu_count() or 1)
+    pending: Deque[Tuple[ProtoTemplate, Optional[str], "Future[str]"]] = deque()
+
+    def collect() -> Tuple[ProtoTemplate, str]:
+        done, key, future = pending.popleft()
+        rendered = future.result()
+        _cache_store(key, rendered, cache)
+        return done, rendered
+
+    for template in templates:
+        key, cached = _cache_lookup(template, renderer, cache)
+        if cached is not None:
+            future: "Future[str]" = Future()
+            future.set_result(cached)
+            key = None
+        else:
+            payload = detach_protofile(template) if detach else template
+            future = executor.submit(render, payload)
+        pending.append((template, key, future))
+        if len(pending) >= window:
+            yield collect()
+    while pending:
+        yield collect()
+
+
+def _is_binary_sink(sink: Any) -> bool:
+    if isinstance(sink, io.TextIOBase):
+        return False
+    if isinstance(sink, (io.RawIOBase, io.BufferedIOBase)):
+        return True
+    return hasattr(sink, "sendall") or "b" in getattr(sink, "mode", "")
+
+
+def write_chunks(chunks: Iterable[str], sink: Any, encoding: str = "utf-8") -> int:
+    binary = _is_binary_sink(sink)
+    write = getattr(sink, "sendall", None) or sink.write
+    written = 0
+    for chunk in chunks:
+        if binary:
+            data = chunk.encode(encoding)
+            write(data)
+            written += len(data)
+        else:
+            write(chunk)
+            written += len(chunk)
+    return written
 
 
 @dataclass
@@ -76,11 +535,37 @@ class ProtoPackage(IProtoPackage):
 
     @property
     def qual_name(self) -> str:  # pragma: no cover
-        file_path = f"{self.filename}.proto"
-        if self.package:
-            pack = self.package.replace(".", "/")
-            file_path = f"{pack}/{file_path}"
-        return file_path
+        return proto_qual_name(self.package, self.filename)
+
+    def iter_content(self) -> Iterator[str]:
+        yield self.content
+
+    def write_to(self, sink: Any, encoding: str = "utf-8") -> int:
+        return write_chunks(self.iter_content(), sink, encoding)
+
+
+@dataclass
+class StreamingProtoPackage(IProtoPackage):
+    package: str
+    filename: str
+    depends: Set[str]
+    template: ProtoTemplate = field(repr=False)
+    render_chunks: ChunkRenderer = field(repr=False)
+
+    @property
+    def qual_name(self) -> str:
+        return proto_qual_name(self.package, self.filename)
+
+    @property
+    def content(self) -> str:  # type: ignore[override]
+        # rendered on every access, so nothing large is kept alive
+        return "".join(self.iter_content())
+
+    def iter_content(self) -> Iterator[str]:
+        return self.render_chunks(self.template)
+
+    def write_to(self, sink: Any, encoding: str = "utf-8") -> int:
+        return write_chunks(self.iter_content(), sink, encoding)
 
 
 def prepare_modules(
@@ -91,42 +576,58 @@ def prepare_modules(
     all_templates: List[ProtoTemplate] = []
     compiler_execution: List[Tuple[List[ServiceTemplate], CompilerContext]] = []
 
+    for allmodules, templates, ctx in prepare_packages(services, version):
+        all_templates.extend(allmodules)
+        compiler_execution.append((templates, ctx))
+
+    return all_templates, compiler_execution
+
+
+def prepare_packages(
+    services: Dict[str, List[IService]],
+    version: int = 3,
+) -> List[Tuple[List[ProtoTemplate], List[ServiceTemplate], CompilerContext]]:
+
+    packages: List[
+        Tuple[List[ProtoTemplate], List[ServiceTemplate], CompilerContext]
+    ] = []
+
     for _, service_list in services.items():
         compiler_ctx = make_compiler_context(service_list, version)
         if compiler_ctx is None:
             continue
         allmodules, ctx = compiler_ctx
-        all_templates.extend(allmodules)
         templates = [make_service_template(service) for service in service_list]
-        compiler_execution.append((templates, ctx))
+        packages.append((allmodules, templates, ctx))
 
-    return all_templates, compiler_execution
+    return packages
 
 
 def extract_modules(
-    packlist: List[IService],
+    packlist: Sequence[IService],
 ) -> Mapping[str, Tuple[Iterable[str], Iterable[str]]]:
 
-    modules: Dict[str, Tuple[Set[str], Set[str]]] = {}
+    # dicts as insertion-ordered sets keep the output stable across processes
+    modules: Dict[str, Tuple[Dict[str, None], Dict[str, None]]] = {}
     for service in packlist:
         mod_name = service.module
         mod_opt = service.module_level_options
         mod_com = service.module_level_comments
         if mod_name not in modules:
             modules[mod_name] = (
-                set(mod_opt),
-                set(mod_com),
+                dict.fromkeys(mod_opt),
+                dict.fromkeys(mod_com),
             )
         else:
             option, comment = modules[mod_name]
-            option.update(mod_opt)
-            comment.update(mod_com)
+            option.update(dict.fromkeys(mod_opt))
+            comment.update(dict.fromkeys(mod_com))
 
     return modules
 
 
 def make_compiler_context(
-    packlist: List[IService],
+    packlist: Sequence[IService],
     version: int = 3,
 ) -> Optional[Tuple[List[ProtoTemplate], CompilerContext]]:
 
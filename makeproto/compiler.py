@@ -1,19 +1,50 @@
+import threading
+
 from rich.console import Console
-from typing_extensions import Any, Dict, List, Optional
+from typing_extensions import Any, Dict, FrozenSet, List, Optional, Tuple
 
-from makeproto.report import CompileReport
+from makeproto.report import CompileError, CompileReport
 from makeproto.template import MethodTemplate, ServiceTemplate, Visitor
 
 
+class ErrorLimitReached(Exception):
+    pass
+
+
+class ErrorBudget:
+    # shared by every context of a run; a thread-safe running count of the
+    # reported errors that aborts the traversal once the limit is reached
+    def __init__(self, max_errors: Optional[int] = None) -> None:
+        if max_errors is not None and max_errors <= 0:
+            raise ValueError("max_errors must be positive")
+        self.max_errors = max_errors
+        self.count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def exhausted(self) -> bool:
+        return self.max_errors is not None and self.count >= self.max_errors
+
+    def charge(self) -> None:
+        with self._lock:
+            self.count += 1
+            exhausted = self.exhausted
+        if exhausted:
+            raise ErrorLimitReached(f"Stopped after {self.count} errors")
+
+
 class CompilerContext:
     def __init__(
         self,
         name: str = "",
         state: Optional[Dict[str, Any]] = None,
+        budget: Optional[ErrorBudget] = None,
     ):
         self.name = name
         self.reports: Dict[Any, CompileReport] = {}
-        self._state: Dict[str, Any] = state or {}
+        self._state: Dict[str, Any] = state if state is not None else {}
+        self.budget = budget
+        self.error_count = 0
 
     def __len__(self) -> int:
         return sum(len(r) for r in self.reports.values())
@@ -21,12 +52,19 @@ class CompilerContext:
     def has_errors(self) -> bool:
         return any(not report.is_valid() for report in self.reports.values())
 
+    def count_error(self) -> None:
+        self.error_count += 1
+        if self.budget is not None:
+            self.budget.charge()
+
     def get_state(self, key: str) -> Optional[Any]:
         return self._state.get(key, None)
 
     def get_report(self, block_name: Any) -> CompileReport:
         if block_name not in self.reports:
-            self.reports[block_name] = CompileReport(name=block_name.name)
+            self.reports[block_name] = CompileReport(
+                name=block_name.name, on_error=self.count_error
+            )
         return self.reports[block_name]
 
     def is_valid(self) -> bool:
@@ -51,6 +89,15 @@ def list_ctx_error_code(context: CompilerContext) -> List[str]:
 
 
 class CompilerPass(Visitor):
+    # fusable passes do their service-level work in visit_service_node and
+    # only use visit_service to descend into the methods
+    fusable: bool = False
+    # template fields the pass reads and writes ("method.request_str",
+    # "module.imports", ...); None means undeclared, so the scheduler keeps
+    # the pass in place relative to every other pass
+    reads: Optional[FrozenSet[str]] = None
+    writes: Optional[FrozenSet[str]] = None
+
     def __init__(self) -> None:
         self._ctx: Optional[CompilerContext] = None
 
@@ -82,5 +129,61 @@ class CompilerPass(Visitor):
     def visit_service(self, block: ServiceTemplate) -> None:
         return  # pragma: no cover
 
+    def visit_service_node(self, block: ServiceTemplate) -> None:
+        return
+
     def visit_method(self, method: MethodTemplate) -> None:
         return  # pragma: no cover
+
+
+class ShadowContext(CompilerContext):
+    # keeps the errors of one fused pass, in the order they were reported and
+    # without charging the budget, until merge() replays them
+    def __init__(self, ctx: CompilerContext) -> None:
+        super().__init__(ctx.name, ctx._state)
+        self.log: List[Tuple[Any, CompileError]] = []
+
+    def get_report(self, block_name: Any) -> CompileReport:
+        if block_name not in self.reports:
+            report = CompileReport(name=block_name.name)
+            report.on_error = lambda: self.log.append((block_name, report.errors[-1]))
+            self.reports[block_name] = report
+        return self.reports[block_name]
+
+
+class FusedPass(CompilerPass):
+    def __init__(self, passes: List[CompilerPass]) -> None:
+        super().__init__()
+        self.passes = passes
+        self._shadows: List[Tuple[CompilerContext, List[ShadowContext]]] = []
+
+    def execute(self, blocks: list[ServiceTemplate], ctx: CompilerContext) -> None:
+        self._ctx = ctx
+        # each pass reports into its own context, so merge() can replay the
+        # errors pass by pass exactly as the unfused pipeline would
+        shadows = [ShadowContext(ctx) for _ in self.passes]
+        self._shadows.append((ctx, shadows))
+        for cpass, shadow in zip(self.passes, shadows):
+            cpass._ctx = shadow
+            cpass.set_default()
+        for block in blocks:
+            for cpass in self.passes:
+                cpass.visit_service_node(block)
+            for method in block.methods:
+                for cpass in self.passes:
+                    cpass.visit_method(method)
+            for cpass in self.passes:
+                cpass.reset()
+        for cpass in self.passes:
+            cpass.finish()
+
+    def merge(self, index: int) -> None:
+        # charged here, pass by pass and package by package, so an error limit
+        # stops at the same error as in the unfused pipeline
+        for ctx, shadows in self._shadows:
+            for block_name, error in shadows[index].log:
+                ctx.get_report(block_name).errors.append(error)
+                ctx.count_error()
+
+    def clear(self) -> None:
+        self._shadows.clear()
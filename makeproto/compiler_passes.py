@@ -1,6 +1,23 @@
-from typing_extensions import Any, Callable, List, Tuple
+from concurrent.futures import Executor
 
-from makeproto.compiler import CompilerContext, CompilerPass
+from typing_extensions import (
+    Any,
+    Callable,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
+
+from makeproto.compiler import (
+    CompilerContext,
+    CompilerPass,
+    ErrorBudget,
+    ErrorLimitReached,
+    FusedPass,
+)
 from makeproto.format_comment import format_comment
 from makeproto.setters.comment import CommentSetter
 from makeproto.setters.imports import ImportsSetter
@@ -16,30 +33,208 @@ from makeproto.validators.type import TypeValidator
 
 
 class CompilationError(Exception):
-    def __init__(self, contexts: List[CompilerContext]) -> None:
+    def __init__(
+        self, contexts: List[CompilerContext], limit_reached: bool = False
+    ) -> None:
         self.contexts = contexts
         self.total_errors = sum(len(ctx) for ctx in contexts)
+        self.limit_reached = limit_reached
+        stopped = " (stopped at the error limit)" if limit_reached else ""
         super().__init__(
-            f"Compilation failed with {self.total_errors} errors across {len(self.contexts)} packages."
+            f"Compilation failed with {self.total_errors} errors across {len(self.contexts)} packages{stopped}."
         )
 
 
+def _raise_on_errors(ctxs: List[CompilerContext]) -> None:
+    # error_count is kept up to date by the reports, no need to re-sum them
+    if any(ctx.error_count for ctx in ctxs):
+        raise CompilationError(ctxs)
+
+
+# fields filled in by make_service_template / make_compiler_context, before
+# any pass runs; everything else must be written by an earlier pass
+INPUT_FIELDS = frozenset(
+    {
+        "service.name",
+        "service.module",
+        "service.package",
+        "service.comments",
+        "service.options",
+        "method.name",
+        "method.comments",
+        "method.options",
+        "method.method_func",
+        "method.request_types",
+        "method.response_type",
+        "module.comments",
+        "module.syntax",
+        "module.package",
+        "module.module",
+        "module.options",
+    }
+)
+
+
+class PassOrderError(ValueError):
+    pass
+
+
+def passes_conflict(first: CompilerPass, second: CompilerPass) -> bool:
+    if first.reads is None or first.writes is None:
+        return True
+    if second.reads is None or second.writes is None:
+        return True
+    return bool(
+        first.writes & second.reads
+        or first.reads & second.writes
+        or first.writes & second.writes
+    )
+
+
+class PassScheduler:
+    def __init__(self, passes: Iterable[CompilerPass] = ()) -> None:
+        self.passes: List[CompilerPass] = []
+        self._available: Set[str] = set(INPUT_FIELDS)
+        self._opaque = False
+        for cpass in passes:
+            self.register(cpass)
+
+    def register(self, cpass: CompilerPass) -> None:
+        if cpass.reads is None or cpass.writes is None:
+            # an undeclared pass may write anything, so later reads can no
+            # longer be checked
+            self._opaque = True
+        missing = (cpass.reads or frozenset()) - self._available
+        if missing and not self._opaque:
+            raise PassOrderError(
+                f"{type(cpass).__name__} reads {sorted(missing)}, "
+                "but no earlier pass writes them"
+            )
+        self._available.update(cpass.writes or ())
+        self.passes.append(cpass)
+
+    def stages(self) -> List[List[CompilerPass]]:
+        # a pass goes one stage after the last earlier pass it conflicts with,
+        # so every read sees the same writes as in registration order
+        levels: List[int] = []
+        for index, cpass in enumerate(self.passes):
+            level = 0
+            for previous, previous_level in zip(self.passes[:index], levels):
+                if passes_conflict(previous, cpass):
+                    level = max(level, previous_level + 1)
+            levels.append(level)
+        stages: List[List[CompilerPass]] = [
+            [] for _ in range(max(levels, default=-1) + 1)
+        ]
+        for cpass, level in zip(self.passes, levels):
+            stages[level].append(cpass)
+        return stages
+
+    def schedule(self) -> List[CompilerPass]:
+        scheduled: List[CompilerPass] = []
+        for stage in self.stages():
+            fusable = [cpass for cpass in stage if cpass.fusable]
+            scheduled.extend(cpass for cpass in stage if not cpass.fusable)
+            if len(fusable) > 1:
+                scheduled.append(FusedPass(fusable))
+            else:
+                scheduled.extend(fusable)
+        return scheduled
+
+
+def fuse_compiler_passes(compilerpass: List[CompilerPass]) -> List[CompilerPass]:
+    return PassScheduler(compilerpass).schedule()
+
+
 def run_compiler_passes(
     packs: List[Tuple[List[ServiceTemplate], CompilerContext]],
     compilerpass: List[CompilerPass],
+    fuse: bool = False,
+    max_errors: Optional[int] = None,
+    fail_fast: bool = False,
+    budget: Optional[ErrorBudget] = None,
 ) -> None:
     ctxs = [ctx for _, ctx in packs]
-    for cpass in compilerpass:
-        for block, ctx in packs:
-            cpass.execute(block, ctx)
+    if budget is None:
+        budget = ErrorBudget(1 if fail_fast else max_errors)
+    if fuse:
+        compilerpass = fuse_compiler_passes(compilerpass)
+    for ctx in ctxs:
+        ctx.budget = budget
+    try:
+        for cpass in compilerpass:
+            try:
+                for block, ctx in packs:
+                    cpass.execute(block, ctx)
+                if isinstance(cpass, FusedPass):
+                    try:
+                        for index in range(len(cpass.passes)):
+                            cpass.merge(index)
+                            _raise_on_errors(ctxs)
+                    finally:
+                        cpass.clear()
+                else:
+                    _raise_on_errors(ctxs)
+            except ErrorLimitReached:
+                raise CompilationError(ctxs, limit_reached=True)
+    finally:
+        for ctx in ctxs:
+            ctx.budget = None
+
 
-        total_errors = sum(len(ctx) for ctx in ctxs)
-        if total_errors > 0:
-            raise CompilationError(ctxs)
+def compile_package(
+    pack: Tuple[List[ServiceTemplate], CompilerContext],
+    compilerpasses: List[List[CompilerPass]],
+    fuse: bool = False,
+    budget: Optional[ErrorBudget] = None,
+) -> CompilerContext:
+    _, ctx = pack
+    try:
+        for compilerpass in compilerpasses:
+            if budget is not None and budget.exhausted:
+                break
+            run_compiler_passes([pack], compilerpass, fuse, budget=budget)
+    except CompilationError:
+        pass
+    return ctx
+
+
+PassFactory = Callable[[], List[List[CompilerPass]]]
+
+
+def run_compiler_passes_parallel(
+    packs: List[Tuple[List[ServiceTemplate], CompilerContext]],
+    make_passes: PassFactory,
+    executor: Executor,
+    fuse: bool = False,
+    max_errors: Optional[int] = None,
+    fail_fast: bool = False,
+) -> None:
+    # one budget for the whole run: once a package hits the limit, the
+    # packages still queued return without running their passes
+    budget = ErrorBudget(1 if fail_fast else max_errors)
+    # passes keep per-run state (context, used names), so every package
+    # gets a pipeline of its own
+    futures = [
+        executor.submit(compile_package, pack, make_passes(), fuse, budget)
+        for pack in packs
+    ]
+    ctxs = [future.result() for future in futures]
+    if budget.exhausted:
+        raise CompilationError(ctxs, limit_reached=True)
+    _raise_on_errors(ctxs)
+
+
+def no_custom_errors(func: Callable[..., Any]) -> List[str]:
+    return []
+
+
+def identity(name: str) -> str:
+    return name
 
 
 def make_validators(
-    custompassmethod: Callable[[Any], List[str]] = lambda x: [],
+    custompassmethod: Callable[[Any], List[str]] = no_custom_errors,
 ) -> List[CompilerPass]:
 
     custompass = CustomPass(visitmethod=custompassmethod)
@@ -58,7 +253,7 @@ default_format = format_comment
 
 
 def make_setters(
-    name_normalizer: Callable[[str], str] = lambda x: x,
+    name_normalizer: Callable[[str], str] = identity,
     format_comment: Callable[[str], str] = default_format,
 ) -> List[CompilerPass]:
 
@@ -70,3 +265,60 @@ def make_setters(
         CommentSetter(format_comment),
     ]
     return setters
+
+
+def make_compiler_passes(
+    custompassmethod: Callable[[Any], List[str]] = no_custom_errors,
+    name_normalizer: Callable[[str], str] = identity,
+    format_comment: Callable[[str], str] = default_format,
+    extra_passes: Optional[List[CompilerPass]] = None,
+) -> List[List[CompilerPass]]:
+    # extra passes run after the setters; registering them up front rejects
+    # a pass that reads a field nothing has written yet
+    scheduler = PassScheduler(
+        make_setters(name_normalizer=name_normalizer, format_comment=format_comment)
+    )
+    for cpass in extra_passes or []:
+        scheduler.register(cpass)
+    return [make_validators(custompassmethod), scheduler.passes]
+
+
+# a user pass, or a factory (usually the pass class) that builds one
+ExtraPass = Union[CompilerPass, Callable[[], CompilerPass]]
+
+
+def build_extra_passes(extra_passes: Optional[List[ExtraPass]]) -> List[CompilerPass]:
+    return [
+        cpass if isinstance(cpass, CompilerPass) else cpass()
+        for cpass in extra_passes or []
+    ]
+
+
+def compiler_pass_factory(
+    custompassmethod: Callable[[Any], List[str]] = no_custom_errors,
+    name_normalizer: Callable[[str], str] = identity,
+    format_comment: Callable[[str], str] = default_format,
+    extra_passes: Optional[List[ExtraPass]] = None,
+    concurrent: bool = False,
+) -> PassFactory:
+    # every call builds the built-in passes anew; user callables and pass
+    # instances are used as they are, so their state stays the caller's
+    if concurrent:
+        for cpass in extra_passes or []:
+            if isinstance(cpass, CompilerPass):
+                name = type(cpass).__name__
+                raise ValueError(
+                    f"extra pass {name} would be shared by packages compiled "
+                    f"concurrently; pass a factory such as {name} instead of "
+                    "an instance"
+                )
+
+    def make_passes() -> List[List[CompilerPass]]:
+        return make_compiler_passes(
+            custompassmethod,
+            name_normalizer,
+            format_comment,
+            build_extra_passes(extra_passes),
+        )
+
+    return make_passes
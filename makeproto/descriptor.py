@@ -0,0 +1,289 @@
+import ast
+import importlib
+import re
+
+from typing_extensions import Any, Callable, Dict, Iterable, List, Optional
+
+from makeproto.build_service import compile_templates
+from makeproto.interface import IService
+from makeproto.options import CompileOptions
+from makeproto.shard import shard_templates
+from makeproto.template import (
+    MethodTemplate,
+    ProtoTemplate,
+    ServiceTemplate,
+    proto_qual_name,
+    warn_empty_protofile,
+    warn_empty_service,
+)
+
+DESCRIPTOR_EXTRA_HINT = "install it with `pip install makeproto[descriptor]`"
+
+OPTION_RE = re.compile(r"^\s*(\([\w.]+\)|\w+)\s*=\s*(.+?)\s*$", re.DOTALL)
+COMMENT_LINE_RE = re.compile(r"^\s*//")
+
+# FileDescriptorProto / ServiceDescriptorProto field numbers, for comment paths
+FILE_SERVICE_FIELD = 6
+SERVICE_METHOD_FIELD = 2
+
+
+class DescriptorOptionError(ValueError):
+    def __init__(self, option: str, owner: str, reason: str) -> None:
+        self.option = option
+        self.owner = owner
+        super().__init__(f"Cannot set option '{option}' on {owner}: {reason}")
+
+
+def load_descriptor_pb2() -> Any:
+    try:
+        from google.protobuf import descriptor_pb2
+    except ImportError as e:
+        raise ImportError(
+            f"the descriptor backend needs protobuf; {DESCRIPTOR_EXTRA_HINT}"
+        ) from e
+    return descriptor_pb2
+
+
+def qualified_type_name(type_str: Optional[str], package: str) -> str:
+    # the setters write names relative to the service package: "Name" for the
+    # same package, "other.pkg.Name" otherwise
+    if not type_str:
+        raise ValueError("method type was not set by the compiler passes")
+    if type_str.startswith("."):
+        return type_str
+    if "." in type_str or not package:
+        return f".{type_str}"
+    return f".{package}.{type_str}"
+
+
+def parse_option_value(field: Any, literal: str) -> Any:
+    if literal.startswith(("{", "[")):
+        raise ValueError("aggregate values are not supported")
+    if field.type == field.TYPE_STRING or field.type == field.TYPE_BYTES:
+        if literal[:1] not in ("'", '"'):
+            raise ValueError("expected a quoted string")
+        value = ast.literal_eval(literal)
+        return value.encode("utf-8") if field.type == field.TYPE_BYTES else value
+    if field.type == field.TYPE_BOOL:
+        if literal not in ("true", "false"):
+            raise ValueError("expected true or false")
+        return literal == "true"
+    if field.type == field.TYPE_ENUM:
+        enum_value = field.enum_type.values_by_name.get(literal)
+        if enum_value is None:
+            raise ValueError(f"unknown {field.enum_type.name} value")
+        return enum_value.number
+    if field.type in (field.TYPE_FLOAT, field.TYPE_DOUBLE):
+        return float(literal)
+    if field.type == field.TYPE_MESSAGE:
+        raise ValueError("message values are not supported")
+    return int(literal, 0)
+
+
+def set_option(options: Any, option: str, owner: str) -> None:
+    match = OPTION_RE.match(option)
+    if match is None:
+        raise DescriptorOptionError(option, owner, "expected 'name = value'")
+    name, literal = match.groups()
+    try:
+        if name.startswith("("):
+            # custom options resolve against the extensions already loaded
+            # into the default pool
+            from google.protobuf import descriptor_pool
+
+            try:
+                field = descriptor_pool.Default().FindExtensionByName(name[1:-1])
+            except KeyError:
+                raise ValueError("extension is not registered") from None
+            if field.containing_type is not options.DESCRIPTOR:
+                raise ValueError(f"extension does not extend {options.DESCRIPTOR.name}")
+            options.Extensions[field] = parse_option_value(field, literal)
+            return
+        field = options.DESCRIPTOR.fields_by_name.get(name)
+        if field is None:
+            raise ValueError(f"{options.DESCRIPTOR.name} has no such field")
+        setattr(options, name, parse_option_value(field, literal))
+    except (ValueError, SyntaxError, TypeError) as e:
+        raise DescriptorOptionError(option, owner, str(e)) from None
+
+
+def set_options(
+    proto: Any, options_type: Callable[[], Any], options: Iterable[str], owner: str
+) -> None:
+    options = list(options or [])
+    if not options:
+        return
+    message = options_type()
+    for option in options:
+        set_option(message, option, owner)
+    proto.options.CopyFrom(message)
+
+
+def comment_text(comments: str) -> str:
+    comments = comments.strip()
+    if not comments:
+        return ""
+    if comments.startswith("/*") and comments.endswith("*/"):
+        return comments[2:-2].strip("\n") + "\n"
+    return "".join(
+        f"{COMMENT_LINE_RE.sub('', line)}\n" for line in comments.splitlines()
+    )
+
+
+def add_comment(source_info: Any, path: List[int], comments: str) -> None:
+    text = comment_text(comments)
+    if text:
+        location = source_info.location.add()
+        location.path.extend(path)
+        location.leading_comments = text
+
+
+def build_method_descriptor(
+    method: MethodTemplate, package: str, proto: Any, pb2: Any
+) -> None:
+    owner = f"method '{method.service.name}.{method.name}'"
+    proto.name = method.name
+    proto.input_type = qualified_type_name(method.request_str, package)
+    proto.output_type = qualified_type_name(method.response_str, package)
+    if method.request_stream:
+        proto.client_streaming = True
+    if method.response_stream:
+        proto.server_streaming = True
+    set_options(proto, pb2.MethodOptions, method.options, owner)
+
+
+def build_service_descriptor(
+    service: ServiceTemplate, package: str, proto: Any, pb2: Any
+) -> None:
+    proto.name = service.name
+    set_options(proto, pb2.ServiceOptions, service.options, f"service '{service.name}'")
+    for method in service.methods:
+        build_method_descriptor(method, package, proto.method.add(), pb2)
+
+
+def build_file_descriptor(template: ProtoTemplate, comments: bool = True) -> Any:
+    pb2 = load_descriptor_pb2()
+    proto = pb2.FileDescriptorProto()
+    proto.name = proto_qual_name(template.package, template.module)
+    if template.package:
+        proto.package = template.package
+    if template.syntax == 3:
+        proto.syntax = "proto3"
+    proto.dependency.extend(template.sorted_imports())
+    for public in template.sorted_public_imports():
+        proto.public_dependency.append(len(proto.dependency))
+        proto.dependency.append(public)
+    set_options(proto, pb2.FileOptions, template.options, f"file '{proto.name}'")
+
+    source_info = pb2.SourceCodeInfo()
+    for service in template.services:
+        if not service.methods:
+            warn_empty_service(service)
+            continue
+        index = len(proto.service)
+        build_service_descriptor(service, template.package, proto.service.add(), pb2)
+        if comments:
+            path = [FILE_SERVICE_FIELD, index]
+            add_comment(source_info, path, service.comments)
+            for method_index, method in enumerate(service.methods):
+                method_path = path + [SERVICE_METHOD_FIELD, method_index]
+                add_comment(source_info, method_path, method.comments)
+    if source_info.location:
+        proto.source_code_info.CopyFrom(source_info)
+    return proto
+
+
+def load_dependency(name: str) -> Optional[Any]:
+    from google.protobuf import descriptor_pool
+
+    pool = descriptor_pool.Default()
+    try:
+        found = pool.FindFileByName(name)
+    except KeyError:
+        # the generated stubs register their file when imported
+        module = name[: -len(".proto")].replace("-", "_").replace("/", ".") + "_pb2"
+        try:
+            importlib.import_module(module)
+            found = pool.FindFileByName(name)
+        except (ImportError, KeyError):
+            return None
+    proto = load_descriptor_pb2().FileDescriptorProto()
+    found.CopyToProto(proto)
+    return proto
+
+
+def build_descriptor_set(
+    templates: Iterable[ProtoTemplate],
+    include_imports: bool = True,
+    comments: bool = True,
+) -> Any:
+    pb2 = load_descriptor_pb2()
+    files: Dict[str, Any] = {}
+    for template in templates:
+        if template.is_empty():
+            warn_empty_protofile(template)
+            continue
+        proto = build_file_descriptor(template, comments)
+        files[proto.name] = proto
+
+    # dependencies come before their dependents, as protoc emits them, so the
+    # set loads straight into a DescriptorPool
+    ordered: List[Any] = []
+    visited: Dict[str, bool] = {}
+
+    def visit(name: str, proto: Any) -> None:
+        if name in visited:
+            return
+        visited[name] = True
+        for dependency in proto.dependency:
+            dep = files.get(dependency)
+            if dep is None and include_imports:
+                dep = load_dependency(dependency)
+            if dep is not None:
+                visit(dependency, dep)
+        ordered.append(proto)
+
+    for name, proto in files.items():
+        visit(name, proto)
+
+    descriptor_set = pb2.FileDescriptorSet()
+    descriptor_set.file.extend(ordered)
+    return descriptor_set
+
+
+def compile_descriptors(
+    services: Dict[str, List[IService]],
+    options: Optional[CompileOptions] = None,
+    include_imports: bool = True,
+    comments: bool = True,
+) -> Optional[Any]:
+
+    options = options or CompileOptions()
+    # descriptors are built from the templates; nothing is rendered
+    options.reject(
+        "compile_descriptors",
+        "stream",
+        "render_executor",
+        "jobs",
+        "render_cache",
+        "disk_cache",
+    )
+    load_descriptor_pb2()
+    make_passes = options.pass_factory()
+    templates = compile_templates(services, make_passes(), options, make_passes)
+    if templates is None:
+        return None
+    return build_descriptor_set(
+        shard_templates(templates, options.shard, options.renderer),
+        include_imports,
+        comments,
+    )
+
+
+def descriptor_set_bytes(
+    services: Dict[str, List[IService]], **kwargs: Any
+) -> Optional[bytes]:
+    descriptor_set = compile_descriptors(services, **kwargs)
+    if descriptor_set is None:
+        return None
+    return descriptor_set.SerializeToString(deterministic=True)
@@ -0,0 +1,173 @@
+import hashlib
+import os
+import tempfile
+import threading
+from dataclasses import dataclass
+from importlib import metadata
+from pathlib import Path
+
+from typing_extensions import Any, Callable, Iterable, List, Optional, Tuple, Union
+
+from makeproto.compiler_passes import ExtraPass
+from makeproto.fingerprint import (
+    UnstableIdentity,
+    function_identity,
+    package_fingerprint,
+    pass_identity,
+)
+from makeproto.interface import IService
+from makeproto.shard import ShardPolicy
+from makeproto.template import TEMPLATE_SOURCES
+
+ENTRY_SUFFIX = ".json"
+
+
+def makeproto_version() -> str:
+    try:
+        version = metadata.version("makeproto")
+    except metadata.PackageNotFoundError:
+        version = "unknown"
+    # a source checkout keeps its version while the templates change
+    templates = hashlib.sha256(
+        repr(sorted(TEMPLATE_SOURCES.items())).encode("utf-8")
+    ).hexdigest()
+    return f"{version}+{templates[:16]}"
+
+
+def disk_cache_key(
+    services: Iterable[IService],
+    version: int,
+    renderer: str,
+    name_normalizer: Callable[[str], str],
+    format_comment: Callable[[str], str],
+    custompassmethod: Callable[[Callable[..., Any]], List[str]],
+    extra_passes: Optional[List[ExtraPass]] = None,
+    shard: Optional[ShardPolicy] = None,
+    cache_salt: Optional[str] = None,
+) -> str:
+    # entries outlive the process, so every callable has to be identified by
+    # what it does, captured values included; whatever cannot be must be
+    # vouched for with an explicit salt
+    strict = cache_salt is None
+    try:
+        callables = (
+            function_identity(name_normalizer, strict),
+            function_identity(format_comment, strict),
+            function_identity(custompassmethod, strict),
+            tuple(pass_identity(cpass, strict) for cpass in extra_passes or []),
+        )
+    except UnstableIdentity as e:
+        raise UnstableIdentity(
+            f"{e}; the disk cache cannot tell its versions apart, "
+            "pass cache_salt to cache it anyway"
+        ) from None
+    return package_fingerprint(
+        services,
+        makeproto_version(),
+        version,
+        renderer,
+        callables,
+        repr(shard),
+        cache_salt,
+    )
+
+
+@dataclass
+class DiskCacheInfo:
+    hits: int
+    misses: int
+    entries: int
+    total_bytes: int
+    max_bytes: int
+
+
+class DiskCache:
+    def __init__(
+        self, directory: Union[str, Path], max_bytes: int = 256 * 1024 * 1024
+    ) -> None:
+        if max_bytes <= 0:
+            raise ValueError("DiskCache max_bytes must be positive")
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}{ENTRY_SUFFIX}"
+
+    def get(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        try:
+            content = path.read_text(encoding="utf-8")
+            # mtime is the recency used by prune()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return content
+
+    def put(self, key: str, content: str) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # write aside and rename: readers and concurrent writers only ever see
+        # complete entries, and the last rename wins
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-", suffix=".part")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:  # pragma: no cover
+                pass
+            raise
+
+    def _entries(self) -> List[Tuple[float, int, Path]]:
+        entries: List[Tuple[float, int, Path]] = []
+        if not self.directory.is_dir():
+            return entries
+        for path in self.directory.glob(f"*/*{ENTRY_SUFFIX}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:  # pragma: no cover
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def prune(self) -> int:
+        entries = sorted(self._entries(), key=lambda entry: entry[0])
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:  # pragma: no cover
+                # another process evicted it first
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self) -> None:
+        for _, _, path in self._entries():
+            try:
+                path.unlink()
+            except FileNotFoundError:  # pragma: no cover
+                pass
+
+    def cache_info(self) -> DiskCacheInfo:
+        entries = self._entries()
+        return DiskCacheInfo(
+            hits=self.hits,
+            misses=self.misses,
+            entries=len(entries),
+            total_bytes=sum(size for _, size, _ in entries),
+            max_bytes=self.max_bytes,
+        )
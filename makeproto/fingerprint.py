@@ -0,0 +1,221 @@
+import enum
+import functools
+import hashlib
+import inspect
+import re
+from types import (
+    BuiltinFunctionType,
+    CodeType,
+    FunctionType,
+    MethodType,
+    ModuleType,
+)
+
+from typing_extensions import Any, Callable, Iterable, Optional, Set, Tuple
+
+from makeproto.interface import ILabeledMethod, IMetaType, IService
+
+
+def type_identity(tp: Any) -> str:
+    # module and qualified name survive a restart, id() and repr() of a class
+    # object do not
+    if isinstance(tp, type):
+        return f"{tp.__module__}.{tp.__qualname__}"
+    return repr(tp)
+
+
+def _code_key(code: CodeType) -> Tuple[Any, ...]:
+    consts = tuple(
+        _code_key(const) if isinstance(const, CodeType) else repr(const)
+        for const in code.co_consts
+    )
+    return (code.co_code, code.co_names, code.co_varnames, consts)
+
+
+def _global_names(code: CodeType) -> Set[str]:
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, CodeType):
+            names |= _global_names(const)
+    return names
+
+
+class UnstableIdentity(ValueError):
+    pass
+
+
+PLAIN_VALUES = (type(None), bool, int, float, complex, str, bytes)
+FUNCTION_TYPES = (FunctionType, MethodType, BuiltinFunctionType, functools.partial)
+
+
+def value_identity(
+    value: Any, strict: bool = True, _seen: Optional[Set[int]] = None
+) -> Any:
+    # what a value contributes to a key: plain data, types, functions and
+    # objects built only from those survive a restart unchanged
+    if isinstance(value, PLAIN_VALUES):
+        return repr(value)
+    if isinstance(value, type):
+        return type_identity(value)
+    if isinstance(value, enum.Enum):
+        return (type_identity(type(value)), value.name)
+    if isinstance(value, ModuleType):
+        return ("module", value.__name__)
+    if isinstance(value, re.Pattern):
+        return ("pattern", value.pattern, value.flags)
+
+    seen = _seen if _seen is not None else set()
+    if id(value) in seen:
+        return ("<recursive>", type_identity(type(value)))
+    seen.add(id(value))
+    try:
+        if isinstance(value, (tuple, list)):
+            items = tuple(value_identity(item, strict, seen) for item in value)
+            return (type(value).__name__, items)
+        if isinstance(value, (set, frozenset)):
+            members = sorted(repr(value_identity(item, strict, seen)) for item in value)
+            return (type(value).__name__, tuple(members))
+        if isinstance(value, dict):
+            pairs = sorted(
+                (
+                    repr(value_identity(k, strict, seen)),
+                    repr(value_identity(v, strict, seen)),
+                )
+                for k, v in value.items()
+            )
+            return ("dict", tuple(pairs))
+        if isinstance(value, FUNCTION_TYPES) or (
+            callable(value)
+            and (hasattr(value, "__wrapped__") or not hasattr(value, "__dict__"))
+        ):
+            return function_identity(value, strict, seen)
+        return object_identity(value, strict, seen)
+    finally:
+        seen.discard(id(value))
+
+
+def object_identity(
+    obj: Any, strict: bool = True, _seen: Optional[Set[int]] = None
+) -> Tuple[Any, ...]:
+    state = getattr(obj, "__dict__", None)
+    if state is None:
+        # locks, sockets, C objects: nothing says two of them behave alike
+        if strict:
+            raise UnstableIdentity(
+                f"cannot fingerprint {type_identity(type(obj))} instance {obj!r}"
+            )
+        return ("<opaque>", type_identity(type(obj)))
+    # the context a pass last ran on is not part of its configuration
+    fields = {key: field for key, field in state.items() if key != "_ctx"}
+    return (type_identity(type(obj)), value_identity(fields, strict, _seen))
+
+
+def function_identity(
+    func: Callable[..., Any], strict: bool = False, _seen: Optional[Set[int]] = None
+) -> Tuple[Any, ...]:
+    # wrappers (memoized passes, functools.wraps decorators) stand for the
+    # function they wrap
+    func = inspect.unwrap(func)
+    seen = _seen if _seen is not None else set()
+    if isinstance(func, functools.partial):
+        return (
+            "partial",
+            function_identity(func.func, strict, seen),
+            value_identity(func.args, strict, seen),
+            value_identity(func.keywords, strict, seen),
+        )
+    name = getattr(func, "__qualname__", getattr(func, "__name__", None))
+    if name is None:
+        # a callable instance: its class and attributes decide what it does
+        return object_identity(func, strict, seen)
+    code = getattr(func, "__code__", None)
+    try:
+        signature = str(inspect.signature(func))
+    except (TypeError, ValueError):
+        signature = ""
+    # the same code behaves differently through what it captured
+    closure = tuple(
+        value_identity(_cell_contents(cell), strict, seen)
+        for cell in getattr(func, "__closure__", None) or ()
+    )
+    # and through the module globals it reads (co_names also lists attribute
+    # names; those that happen to match a global only make the key stricter)
+    func_globals = getattr(func, "__globals__", None) or {}
+    read_globals: Tuple[Any, ...] = ()
+    if isinstance(code, CodeType):
+        read_globals = tuple(
+            (name, value_identity(func_globals[name], strict, seen))
+            for name in sorted(_global_names(code))
+            if name in func_globals
+        )
+    bound = getattr(func, "__self__", None)
+    return (
+        f"{getattr(func, '__module__', '')}.{name}",
+        signature,
+        inspect.isasyncgenfunction(func),
+        _code_key(code) if isinstance(code, CodeType) else None,
+        closure,
+        read_globals,
+        value_identity(getattr(func, "__defaults__", None), strict, seen),
+        value_identity(getattr(func, "__kwdefaults__", None), strict, seen),
+        None if bound is None else value_identity(bound, strict, seen),
+    )
+
+
+def _cell_contents(cell: Any) -> Any:
+    try:
+        return cell.cell_contents
+    except ValueError:
+        # a closure over a variable that was never assigned
+        return None
+
+
+def pass_identity(cpass: Any, strict: bool = True) -> Any:
+    if isinstance(cpass, type) or isinstance(cpass, FUNCTION_TYPES):
+        # a pass factory: the pass class or a function building one
+        return value_identity(cpass, strict)
+    return object_identity(cpass, strict)
+
+
+def metatype_fingerprint(meta: Optional[IMetaType]) -> Optional[Tuple[Any, ...]]:
+    if meta is None:
+        return None
+    return (
+        type_identity(meta.argtype),
+        type_identity(meta.basetype),
+        type_identity(meta.origin),
+        meta.package,
+        meta.proto_path,
+    )
+
+
+def method_fingerprint(method: ILabeledMethod) -> Tuple[Any, ...]:
+    return (
+        method.name,
+        method.package,
+        method.module,
+        method.service,
+        repr(method.options),
+        repr(method.comments),
+        tuple(metatype_fingerprint(meta) for meta in method.request_types),
+        metatype_fingerprint(method.response_types),
+        function_identity(method.method),
+    )
+
+
+def service_fingerprint(service: IService) -> Tuple[Any, ...]:
+    return (
+        service.name,
+        service.module,
+        service.package,
+        repr(service.options),
+        repr(service.comments),
+        tuple(repr(option) for option in service.module_level_options),
+        tuple(repr(comment) for comment in service.module_level_comments),
+        tuple(method_fingerprint(method) for method in service.methods),
+    )
+
+
+def package_fingerprint(services: Iterable[IService], *salt: Any) -> str:
+    key = (salt, tuple(service_fingerprint(service) for service in services))
+    return hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
@@ -0,0 +1,87 @@
+import functools
+import threading
+import weakref
+from dataclasses import dataclass
+
+from typing_extensions import Any, Callable, Generic, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class FunctionMemoInfo:
+    hits: int
+    misses: int
+    currsize: int
+
+
+class FunctionMemo(Generic[T]):
+    # results are keyed weakly by the inspected function and tagged with its
+    # __code__, so a redefined or patched function is inspected again and a
+    # collected one drops out of the cache
+    def __init__(self, inspect_func: Callable[[Callable[..., Any]], T]) -> None:
+        functools.update_wrapper(self, inspect_func)
+        self.inspect_func = inspect_func
+        self._cache: "weakref.WeakKeyDictionary[Any, Tuple[Any, T]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        # bound methods: function -> instance -> entry
+        self._bound: "weakref.WeakKeyDictionary[Any, Any]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _slot(
+        self, func: Callable[..., Any]
+    ) -> Tuple["weakref.WeakKeyDictionary[Any, Tuple[Any, T]]", Any]:
+        target = getattr(func, "__func__", None)
+        owner = getattr(func, "__self__", None)
+        if target is None or owner is None:
+            return self._cache, func
+        # a bound method is a new object on every attribute access, so it is
+        # keyed by its function and, weakly, by its instance
+        instances = self._bound.get(target)
+        if instances is None:
+            instances = self._bound[target] = weakref.WeakKeyDictionary()
+        return instances, owner
+
+    def __call__(self, func: Callable[..., Any]) -> T:
+        code = getattr(func, "__code__", None)
+        try:
+            with self._lock:
+                cache, key = self._slot(func)
+                entry: Optional[Tuple[Any, T]] = cache.get(key)
+                if entry is not None and entry[0] is code:
+                    self.hits += 1
+                    return entry[1]
+                self.misses += 1
+        except TypeError:
+            # not weak-referenceable or not hashable: nothing to key on
+            with self._lock:
+                self.misses += 1
+            return self.inspect_func(func)
+
+        result = self.inspect_func(func)
+        with self._lock:
+            cache[key] = (code, result)
+        return result
+
+    def cache_clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            self._bound.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def cache_info(self) -> FunctionMemoInfo:
+        with self._lock:
+            currsize = len(self._cache) + sum(
+                len(instances) for instances in self._bound.values()
+            )
+        return FunctionMemoInfo(hits=self.hits, misses=self.misses, currsize=currsize)
+
+
+def memoize_function(
+    inspect_func: Callable[[Callable[..., Any]], T],
+) -> FunctionMemo[T]:
+    return FunctionMemo(inspect_func)
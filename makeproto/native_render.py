@@ -0,0 +1,87 @@
+from typing_extensions import Iterator, List
+
+from makeproto.template import (
+    MethodTemplate,
+    ProtoTemplate,
+    ServiceTemplate,
+    warn_empty_protofile,
+    warn_empty_service,
+)
+
+PROTOFILE_HEADER = '/* "Generated .proto file" */\n'
+
+
+def render_method_native(method: MethodTemplate) -> str:
+    parts: List[str] = []
+    if method.comments:
+        parts.append(f"{method.comments}\n")
+
+    if method.request_stream:
+        request = f"(stream {method.request_str})"
+    else:
+        request = f"({method.request_str})"
+    if method.response_stream:
+        response = f"(stream {method.response_str})"
+    else:
+        response = f"({method.response_str})"
+    parts.append(f"rpc {method.name}{request} returns {response}")
+
+    if method.options:
+        parts.append("{\n")
+        for option in method.options:
+            parts.append(f"    option {option};\n")
+        parts.append("  };\n")
+    else:
+        parts.append(";\n")
+    return "".join(parts)
+
+
+def iter_service_native(service: ServiceTemplate) -> Iterator[str]:
+    if service.comments:
+        yield f"{service.comments}\nservice {service.name} {{\n"
+    else:
+        yield f"service {service.name} {{\n"
+    for method in service.methods:
+        yield render_method_native(method)
+    yield "}"
+
+
+def render_service_native(service: ServiceTemplate) -> str:
+    return "".join(iter_service_native(service))
+
+
+def iter_protofile_native(template: ProtoTemplate) -> Iterator[str]:
+    if template.is_empty():
+        warn_empty_protofile(template)
+        return
+
+    parts: List[str] = [
+        PROTOFILE_HEADER,
+        f"{template.comments}\n",
+        f'syntax = "proto{template.syntax}";\n\n',
+    ]
+    if template.package:
+        parts.append(f"package {template.package};\n")
+    parts.append("\n")
+
+    for imp in template.sorted_imports():
+        parts.append(f'import "{imp}";\n')
+    for imp in template.sorted_public_imports():
+        parts.append(f'import public "{imp}";\n')
+    parts.append("\n")
+
+    for option in template.options:
+        parts.append(f"option {option};\n")
+    parts.append("\n")
+    yield "".join(parts)
+
+    for service in template.services:
+        if not service.methods:
+            warn_empty_service(service)
+            continue
+        yield from iter_service_native(service)
+        yield "\n"
+
+
+def render_protofile_native(template: ProtoTemplate) -> str:
+    return "".join(iter_protofile_native(template))
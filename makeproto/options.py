@@ -0,0 +1,123 @@
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass, fields, replace
+
+from typing_extensions import Any, Callable, List, Optional, Sequence
+
+from makeproto.compiler import ErrorBudget
+from makeproto.compiler_passes import (
+    ExtraPass,
+    PassFactory,
+    compiler_pass_factory,
+    default_format,
+    identity,
+    no_custom_errors,
+)
+from makeproto.disk_cache import DiskCache
+from makeproto.render_cache import RenderCache
+from makeproto.renderers import get_renderer
+from makeproto.shard import ShardPolicy
+
+
+@dataclass(frozen=True)
+class CompileOptions:
+    name_normalizer: Callable[[str], str] = identity
+    format_comment: Callable[[str], str] = default_format
+    custompassmethod: Callable[[Callable[..., Any]], List[str]] = no_custom_errors
+    version: int = 3
+    renderer: str = "jinja"
+    stream: bool = False
+    render_executor: Optional[Executor] = None
+    jobs: Optional[int] = None
+    render_cache: Optional[RenderCache] = None
+    fuse_passes: bool = False
+    compile_executor: Optional[Executor] = None
+    extra_passes: Sequence[ExtraPass] = ()
+    max_errors: Optional[int] = None
+    fail_fast: bool = False
+    shard: Optional[ShardPolicy] = None
+    disk_cache: Optional[DiskCache] = None
+    cache_salt: Optional[str] = None
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "extra_passes", tuple(self.extra_passes or ()))
+        get_renderer(self.renderer)
+        if self.max_errors is not None and self.max_errors <= 0:
+            raise ValueError("max_errors must be positive")
+        if self.jobs is not None and self.jobs <= 0:
+            raise ValueError("jobs must be positive")
+        if self.cache_salt is not None and self.disk_cache is None:
+            raise ValueError("cache_salt only applies together with a disk cache")
+        if self.stream:
+            if self.render_executor is not None or (self.jobs or 1) > 1:
+                raise ValueError(
+                    "stream=True cannot be combined with parallel rendering"
+                )
+            if self.render_cache is not None:
+                raise ValueError("stream=True cannot be combined with a render cache")
+            if self.disk_cache is not None:
+                raise ValueError("stream=True cannot be combined with a disk cache")
+        if self.in_processes and (
+            self.stream
+            or self.render_executor is not None
+            or self.jobs is not None
+            or self.render_cache is not None
+        ):
+            raise ValueError(
+                "process-pool compilation renders inside the workers and does not "
+                "support stream, render_executor, jobs or render_cache"
+            )
+
+    @property
+    def in_processes(self) -> bool:
+        return isinstance(self.compile_executor, ProcessPoolExecutor)
+
+    def error_budget(self) -> ErrorBudget:
+        return ErrorBudget(1 if self.fail_fast else self.max_errors)
+
+    def pass_factory(self, concurrent: bool = False) -> PassFactory:
+        make_passes = compiler_pass_factory(
+            self.custompassmethod,
+            self.name_normalizer,
+            self.format_comment,
+            list(self.extra_passes),
+            concurrent=concurrent or self.compile_executor is not None,
+        )
+        # fail on a misordered pipeline here, not on the first package
+        make_passes()
+        return make_passes
+
+    def for_workers(self) -> "CompileOptions":
+        # what compile_portable_package needs; the custom pass has already run
+        # and the executor and caches stay in this process
+        return replace(
+            self,
+            custompassmethod=no_custom_errors,
+            compile_executor=None,
+            disk_cache=None,
+            cache_salt=None,
+        )
+
+    def reject(self, entry: str, *names: str) -> None:
+        # an entry point refuses the options it has no use for instead of
+        # silently ignoring them
+        given = [name for name in names if getattr(self, name) != DEFAULTS[name]]
+        if given:
+            raise ValueError(f"{entry} does not support {', '.join(given)}")
+
+
+DEFAULTS = {option.name: option.default for option in fields(CompileOptions)}
+
+
+def resolve_options(
+    options: Optional[CompileOptions], **arguments: Any
+) -> CompileOptions:
+    # the positional arguments of compile_service predate CompileOptions; they
+    # are accepted on their own, never mixed with an options object
+    given = {
+        name: value for name, value in arguments.items() if value != DEFAULTS[name]
+    }
+    if options is None:
+        return CompileOptions(**given)
+    if given:
+        raise ValueError(f"pass {', '.join(given)} inside options, not next to it")
+    return options
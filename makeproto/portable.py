@@ -0,0 +1,146 @@
+import inspect
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
+
+from typing_extensions import Any, Callable, Iterable, List, Optional, Sequence, Type
+
+from makeproto.interface import ILabeledMethod, IMetaType, IService
+
+
+class TypeRef:
+    def __init__(self, name: str, key: str) -> None:
+        self.__name__ = name
+        self.key = key
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, TypeRef) and self.key == other.key
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+    def __repr__(self) -> str:
+        return f"TypeRef({self.__name__})"
+
+
+class PortableFunction:
+    def __init__(self, name: str, is_asyncgen: bool, custom_errors: List[str]) -> None:
+        self.__name__ = name
+        self.is_asyncgen = is_asyncgen
+        self.custom_errors = custom_errors
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        raise RuntimeError(
+            f"'{self.__name__}' is a portable description and cannot be called"
+        )  # pragma: no cover
+
+
+@dataclass
+class PortableMetaType(IMetaType):
+    argtype: Any
+    basetype: Any
+    origin: Optional[Type[Any]]
+    package: str
+    proto_path: str
+
+
+@dataclass
+class PortableMethod(ILabeledMethod):
+    name: str
+    method: Callable[..., Any]
+    package: str
+    module: str
+    service: str
+    options: Sequence[str]
+    comments: str
+    request_types: Sequence[IMetaType]
+    response_types: Optional[IMetaType]
+
+
+@dataclass
+class PortableService(IService):
+    name: str
+    module: str
+    package: str
+    options: Sequence[str]
+    comments: str
+    module_level_options: Iterable[str]
+    module_level_comments: Iterable[str]
+    _methods: List[PortableMethod] = field(default_factory=list)
+
+    @property
+    def methods(self) -> Sequence[ILabeledMethod]:
+        return self._methods
+
+    @property
+    def qual_name(self) -> str:
+        if self.package:
+            return f"{self.package}.{self.name}"
+        return self.name
+
+
+def _type_ref(cls: Any) -> TypeRef:
+    name = getattr(cls, "__name__", repr(cls))
+    module = getattr(cls, "__module__", "")
+    qualname = getattr(cls, "__qualname__", name)
+    # id() keeps distinct classes with the same name apart
+    return TypeRef(name, f"{module}.{qualname}:{id(cls)}")
+
+
+def make_portable_metatype(meta: Optional[IMetaType]) -> Optional[IMetaType]:
+    if meta is None:
+        return None
+    return PortableMetaType(
+        argtype=_type_ref(meta.argtype),
+        basetype=_type_ref(meta.basetype),
+        origin=AsyncIterator if meta.origin is AsyncIterator else None,
+        package=meta.package,
+        proto_path=meta.proto_path,
+    )
+
+
+def make_portable_function(
+    func: Callable[..., Any],
+    custompassmethod: Callable[[Callable[..., Any]], List[str]],
+) -> PortableFunction:
+    return PortableFunction(
+        name=getattr(func, "__name__", repr(func)),
+        is_asyncgen=inspect.isasyncgenfunction(func),
+        custom_errors=list(custompassmethod(func)),
+    )
+
+
+def make_portable_service(
+    service: IService,
+    custompassmethod: Callable[[Callable[..., Any]], List[str]],
+) -> PortableService:
+    methods = [
+        PortableMethod(
+            name=method.name,
+            method=make_portable_function(method.method, custompassmethod),
+            package=method.package,
+            module=method.module,
+            service=method.service,
+            options=method.options,
+            comments=method.comments,
+            request_types=[
+                make_portable_metatype(meta)  # type: ignore[misc]
+                for meta in method.request_types
+            ],
+            response_types=make_portable_metatype(method.response_types),
+        )
+        for method in service.methods
+    ]
+    return PortableService(
+        name=service.name,
+        module=service.module,
+        package=service.package,
+        options=service.options,
+        comments=service.comments,
+        module_level_options=list(service.module_level_options),
+        module_level_comments=list(service.module_level_comments),
+        _methods=methods,
+    )
+
+
+def portable_custom_errors(func: Callable[..., Any]) -> List[str]:
+    return list(getattr(func, "custom_errors", []))
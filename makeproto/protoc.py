@@ -0,0 +1,117 @@
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from typing_extensions import Any, Iterable, List, Optional, Sequence, Union
+
+from makeproto.interface import IProtoPackage
+from makeproto.writer import write_protos
+
+PROTOC_EXTRA_HINT = "install it with `pip install makeproto[protoc]`"
+
+
+class ProtocError(Exception):
+    def __init__(self, returncode: int, files: Sequence[str]) -> None:
+        self.returncode = returncode
+        self.files = list(files)
+        super().__init__(
+            f"protoc failed with exit code {returncode} compiling {len(self.files)} files"
+        )
+
+
+@dataclass
+class ProtocResult:
+    files: List[str]
+    output_dir: Optional[Path] = None
+    descriptor_set: Optional[bytes] = None
+    generated: List[str] = field(default_factory=list)
+
+
+def load_grpc_tools() -> Any:
+    try:
+        from grpc_tools import protoc
+    except ImportError as e:
+        raise ImportError(
+            f"the protoc stage needs grpcio-tools; {PROTOC_EXTRA_HINT}"
+        ) from e
+    return protoc
+
+
+def google_include_path() -> Path:
+    import grpc_tools
+
+    # grpcio-tools ships the well-known types (google/protobuf/*.proto)
+    return Path(grpc_tools.__file__).parent / "_proto"
+
+
+def python_stub_names(proto_file: str, grpc_out: bool = True) -> List[str]:
+    # protoc's python generators map "a/b-c.proto" to "a/b_c_pb2.py" and
+    # "a/v1.api.proto" to "a/v1/api_pb2.py"
+    stem = proto_file[: -len(".proto")].replace("-", "_").replace(".", "/")
+    names = [f"{stem}_pb2.py"]
+    if grpc_out:
+        names.append(f"{stem}_pb2_grpc.py")
+    return names
+
+
+def run_protoc(
+    packages: Iterable[IProtoPackage],
+    output_dir: Optional[Union[str, Path]] = None,
+    python_out: bool = True,
+    grpc_out: bool = True,
+    descriptor_set_out: Optional[Union[str, Path]] = None,
+    include_imports: bool = True,
+    include_paths: Sequence[Union[str, Path]] = (),
+    add_google: bool = True,
+    jobs: Optional[int] = None,
+) -> ProtocResult:
+
+    protoc = load_grpc_tools()
+    if output_dir is None and descriptor_set_out is None:
+        raise ValueError("run_protoc needs an output_dir, a descriptor_set_out or both")
+    if output_dir is not None and not (python_out or grpc_out):
+        raise ValueError("output_dir given but python_out and grpc_out are disabled")
+
+    with tempfile.TemporaryDirectory(prefix="makeproto-protoc-") as tmpdir:
+        source = Path(tmpdir)
+        # stage every file in one tree, then compile them all in a single run:
+        # protoc parses each import once and starts once
+        files = write_protos(packages, source, jobs=jobs).written
+
+        args = ["grpc_tools.protoc", f"--proto_path={source}"]
+        args.extend(f"--proto_path={path}" for path in include_paths)
+        if add_google:
+            args.append(f"--proto_path={google_include_path()}")
+
+        out: Optional[Path] = None
+        if output_dir is not None:
+            out = Path(output_dir)
+            out.mkdir(parents=True, exist_ok=True)
+            if python_out:
+                args.append(f"--python_out={out}")
+            if grpc_out:
+                args.append(f"--grpc_python_out={out}")
+        if descriptor_set_out is not None:
+            Path(descriptor_set_out).parent.mkdir(parents=True, exist_ok=True)
+            args.append(f"--descriptor_set_out={descriptor_set_out}")
+            if include_imports:
+                args.append("--include_imports")
+        args.extend(files)
+
+        if not files:
+            return ProtocResult(files=[], output_dir=out)
+        returncode = protoc.main(args)
+        if returncode != 0:
+            raise ProtocError(returncode, files)
+
+    result = ProtocResult(files=files, output_dir=out)
+    if out is not None:
+        for name in files:
+            message_stub, grpc_stub = python_stub_names(name)
+            if python_out:
+                result.generated.append(message_stub)
+            if grpc_out:
+                result.generated.append(grpc_stub)
+    if descriptor_set_out is not None:
+        result.descriptor_set = Path(descriptor_set_out).read_bytes()
+    return result
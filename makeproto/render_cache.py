@@ -0,0 +1,113 @@
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from typing_extensions import Any, Optional, Tuple
+
+from makeproto.template import MethodTemplate, ProtoTemplate, ServiceTemplate
+
+
+@dataclass
+class RenderCacheInfo:
+    hits: int
+    misses: int
+    entries: int
+    total_bytes: int
+    max_entries: int
+    max_bytes: int
+
+
+class RenderCache:
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        if max_entries <= 0 or max_bytes <= 0:
+            raise ValueError("RenderCache limits must be positive")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[str, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, content: str) -> None:
+        size = sys.getsizeof(content)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            self._entries[key] = (content, size)
+            self.total_bytes += size
+            while (
+                len(self._entries) > self.max_entries
+                or self.total_bytes > self.max_bytes
+            ):
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def cache_info(self) -> RenderCacheInfo:
+        return RenderCacheInfo(
+            hits=self.hits,
+            misses=self.misses,
+            entries=len(self._entries),
+            total_bytes=self.total_bytes,
+            max_entries=self.max_entries,
+            max_bytes=self.max_bytes,
+        )
+
+
+def _method_key(method: MethodTemplate) -> Tuple[Any, ...]:
+    return (
+        method.name,
+        method.comments,
+        tuple(method.options or ()),
+        method.request_str,
+        method.response_str,
+        method.request_stream,
+        method.response_stream,
+    )
+
+
+def _service_key(service: ServiceTemplate) -> Tuple[Any, ...]:
+    return (
+        service.name,
+        service.comments,
+        tuple(service.options or ()),
+        tuple(_method_key(method) for method in service.methods),
+    )
+
+
+def render_key(template: ProtoTemplate, renderer: str) -> str:
+    key = (
+        renderer,
+        template.comments,
+        template.syntax,
+        template.package,
+        template.module,
+        tuple(template.sorted_imports()),
+        tuple(template.sorted_public_imports()),
+        tuple(template.options),
+        tuple(_service_key(service) for service in template.services),
+    )
+    return hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
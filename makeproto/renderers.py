@@ -0,0 +1,61 @@
+from typing_extensions import Callable, Dict, Iterator
+
+from makeproto.native_render import (
+    iter_protofile_native,
+    render_protofile_native,
+    render_service_native,
+)
+from makeproto.template import (
+    ProtoTemplate,
+    ServiceTemplate,
+    iter_protofile,
+    render_protofile,
+    render_service_template,
+)
+
+Renderer = Callable[[ProtoTemplate], str]
+ChunkRenderer = Callable[[ProtoTemplate], Iterator[str]]
+ServiceRenderer = Callable[[ServiceTemplate], str]
+
+
+RENDERERS: Dict[str, Renderer] = {
+    "jinja": render_protofile,
+    "native": render_protofile_native,
+}
+
+CHUNK_RENDERERS: Dict[str, ChunkRenderer] = {
+    "jinja": iter_protofile,
+    "native": iter_protofile_native,
+}
+
+SERVICE_RENDERERS: Dict[str, ServiceRenderer] = {
+    "jinja": render_service_template,
+    "native": render_service_native,
+}
+
+
+def _unknown_renderer(name: str) -> ValueError:
+    return ValueError(
+        f"Unknown renderer '{name}'. Available renderers: {sorted(RENDERERS)}"
+    )
+
+
+def get_renderer(name: str) -> Renderer:
+    try:
+        return RENDERERS[name]
+    except KeyError:
+        raise _unknown_renderer(name) from None
+
+
+def get_chunk_renderer(name: str) -> ChunkRenderer:
+    try:
+        return CHUNK_RENDERERS[name]
+    except KeyError:
+        raise _unknown_renderer(name) from None
+
+
+def get_service_renderer(name: str) -> ServiceRenderer:
+    try:
+        return SERVICE_RENDERERS[name]
+    except KeyError:
+        raise _unknown_renderer(name) from None
@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 from enum import Enum
-from typing import List, Optional
+from typing import Any, Callable, Dict, List, Optional
 
 from rich.console import Console
 from rich.table import Table
@@ -110,9 +110,15 @@ class CompileError:
 
 
 class CompileReport:
-    def __init__(self, name: str, errors: Optional[List[CompileError]] = None) -> None:
+    def __init__(
+        self,
+        name: str,
+        errors: Optional[List[CompileError]] = None,
+        on_error: Optional[Callable[[], None]] = None,
+    ) -> None:
         self.name = name
         self.errors: List[CompileError] = errors or []
+        self.on_error = on_error
 
     def __len__(self) -> int:
         return len(self.errors)
@@ -128,6 +134,15 @@ class CompileReport:
         self.errors.append(
             CompileError(code=code.code, message=message, location=location)
         )
+        if self.on_error is not None:
+            self.on_error()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # the error hook points back at the owning context; a copied report
+        # travels alone
+        state = self.__dict__.copy()
+        state["on_error"] = None
+        return state
 
     def is_valid(self) -> bool:
         return not self.errors  # pragma: no cover
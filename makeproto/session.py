@@ -0,0 +1,145 @@
+from dataclasses import dataclass
+
+from typing_extensions import Dict, Generator, List, Optional, Tuple
+
+from makeproto.build_service import (
+    CompileResult,
+    generate_protos,
+    make_compiler_context,
+)
+from makeproto.compiler import CompilerContext
+from makeproto.compiler_passes import compile_package
+from makeproto.fingerprint import package_fingerprint
+from makeproto.interface import IProtoPackage, IService
+from makeproto.make_service_template import make_service_template
+from makeproto.options import CompileOptions
+from makeproto.render_cache import RenderCache
+from makeproto.shard import shard_templates
+
+
+@dataclass
+class SessionInfo:
+    hits: int
+    misses: int
+    packages: int
+
+
+@dataclass
+class SessionEntry:
+    fingerprint: str
+    packages: List[IProtoPackage]
+    ctx: CompilerContext
+
+
+class CompileSession:
+    def __init__(self, options: Optional[CompileOptions] = None) -> None:
+        options = options or CompileOptions()
+        # the session keeps its packages in memory and renders them here
+        options.reject("CompileSession", "stream", "disk_cache")
+        if options.in_processes:
+            raise ValueError("CompileSession needs a thread pool as compile_executor")
+        self.make_passes = options.pass_factory()
+        self.options = options
+        # a changed package usually keeps most of its modules, so they are
+        # served from here instead of being rendered again
+        render_cache = options.render_cache
+        self.render_cache = render_cache if render_cache is not None else RenderCache()
+        self._entries: Dict[str, SessionEntry] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def compile(
+        self, services: Dict[str, List[IService]]
+    ) -> Optional[Generator[IProtoPackage, None, None]]:
+        result = self.compile_partial(services)
+        if not result.ok:
+            for ctx in result.failed:
+                ctx.show()
+            return None
+
+        def generate_results() -> Generator[IProtoPackage, None, None]:
+            yield from result.packages
+
+        return generate_results()
+
+    def compile_partial(self, services: Dict[str, List[IService]]) -> CompileResult:
+        entries: Dict[str, SessionEntry] = {}
+        stale: Dict[str, Tuple[List[IService], str]] = {}
+        for key, service_list in services.items():
+            if not service_list:
+                continue
+            fingerprint = package_fingerprint(service_list)
+            entry = self._entries.get(key)
+            if entry is None or entry.fingerprint != fingerprint:
+                self.misses += 1
+                stale[key] = (service_list, fingerprint)
+            else:
+                self.hits += 1
+                entries[key] = entry
+
+        # like compile_service_partial, every changed package gets a pipeline
+        # and an error budget of its own
+        def compile_one(job: Tuple[List[IService], str]) -> SessionEntry:
+            return self._compile_package(*job)
+
+        executor = self.options.compile_executor
+        jobs = list(stale.values())
+        if executor is not None:
+            compiled = list(executor.map(compile_one, jobs))
+        else:
+            compiled = [compile_one(job) for job in jobs]
+        entries.update(zip(stale, compiled))
+
+        packages: List[IProtoPackage] = []
+        failed: List[CompilerContext] = []
+        for key in services:
+            entry = entries.get(key)
+            if entry is None:
+                continue
+            if entry.ctx.has_errors():
+                failed.append(entry.ctx)
+            else:
+                packages.extend(entry.packages)
+        # packages that disappeared from the input are dropped
+        self._entries = entries
+        return CompileResult(iter(packages), failed)
+
+    def _compile_package(
+        self, service_list: List[IService], fingerprint: str
+    ) -> SessionEntry:
+        options = self.options
+        compiler_ctx = make_compiler_context(service_list, options.version)
+        if compiler_ctx is None:  # pragma: no cover
+            return SessionEntry(fingerprint, [], CompilerContext())
+        allmodules, ctx = compiler_ctx
+        templates = [make_service_template(service) for service in service_list]
+        compile_package(
+            (templates, ctx),
+            self.make_passes(),
+            options.fuse_passes,
+            options.error_budget(),
+        )
+        packages: List[IProtoPackage] = []
+        if not ctx.has_errors():
+            packages = list(
+                generate_protos(
+                    shard_templates(allmodules, options.shard, options.renderer),
+                    renderer=options.renderer,
+                    render_executor=options.render_executor,
+                    jobs=options.jobs,
+                    render_cache=self.render_cache,
+                )
+            )
+        return SessionEntry(fingerprint, packages, ctx)
+
+    def invalidate(self, package: Optional[str] = None) -> None:
+        if package is None:
+            self._entries.clear()
+            self.render_cache.clear()
+        else:
+            self._entries.pop(package, None)
+
+    def session_info(self) -> SessionInfo:
+        return SessionInfo(
+            hits=self.hits, misses=self.misses, packages=len(self._entries)
+        )
@@ -5,16 +5,25 @@ from makeproto.template import MethodTemplate, ProtoTemplate, ServiceTemplate
 
 
 class CommentSetter(CompilerPass):
+    fusable = True
+    reads = frozenset(
+        {"service.module", "module.comments", "service.comments", "method.comments"}
+    )
+    writes = frozenset({"module.comments", "service.comments", "method.comments"})
+
     def __init__(self, format: Callable[[str], str] = lambda x: x):
         super().__init__()
         self.format = format
 
     def visit_service(self, block: ServiceTemplate) -> None:
+        self.visit_service_node(block)
+        for field in block.methods:
+            field.accept(self)
+
+    def visit_service_node(self, block: ServiceTemplate) -> None:
         module: ProtoTemplate = self.ctx.get_state(block.module)
         module.comments = self.format(module.comments)
         block.comments = self.format(block.comments)
-        for field in block.methods:
-            field.accept(self)
 
     def visit_method(self, method: MethodTemplate) -> None:
         method.comments = self.format(method.comments)
@@ -5,6 +5,17 @@ from makeproto.template import MethodTemplate, ProtoTemplate, ServiceTemplate
 
 
 class ImportsSetter(CompilerPass):
+    fusable = True
+    reads = frozenset(
+        {
+            "service.name",
+            "service.module",
+            "method.name",
+            "method.request_types",
+            "method.response_type",
+        }
+    )
+    writes = frozenset({"module.imports"})
 
     def visit_service(self, block: ServiceTemplate) -> None:
         for field in block.methods:
@@ -5,14 +5,21 @@ from makeproto.template import MethodTemplate, ServiceTemplate
 
 
 class NameSetter(CompilerPass):
+    fusable = True
+    reads = frozenset({"service.name", "method.name"})
+    writes = frozenset({"service.name", "method.name"})
+
     def __init__(self, normalize_name: Callable[[str], str] = lambda x: x) -> None:
         super().__init__()
         self.normalize_name = normalize_name
 
     def visit_service(self, block: ServiceTemplate) -> None:
-        block.name = self.normalize_name(block.name)
+        self.visit_service_node(block)
         for field in block.methods:
             field.accept(self)
 
+    def visit_service_node(self, block: ServiceTemplate) -> None:
+        block.name = self.normalize_name(block.name)
+
     def visit_method(self, method: MethodTemplate) -> None:
         method.name = self.normalize_name(method.name)
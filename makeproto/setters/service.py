@@ -4,8 +4,14 @@ from makeproto.template import ProtoTemplate, ServiceTemplate
 
 
 class ServiceSetter(CompilerPass):
+    fusable = True
+    reads = frozenset({"service.name", "service.module", "service.package"})
+    writes = frozenset({"module.services"})
 
     def visit_service(self, block: ServiceTemplate) -> None:
+        self.visit_service_node(block)
+
+    def visit_service_node(self, block: ServiceTemplate) -> None:
         module_template: ProtoTemplate = self.ctx.get_state(block.module)
         services = module_template.services
         if block in services:
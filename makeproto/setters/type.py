@@ -15,6 +15,24 @@ def get_type_str(bt: IMetaType, package: str) -> str:
 
 
 class TypeSetter(CompilerPass):
+    fusable = True
+    reads = frozenset(
+        {
+            "service.name",
+            "service.package",
+            "method.name",
+            "method.request_types",
+            "method.response_type",
+        }
+    )
+    writes = frozenset(
+        {
+            "method.request_str",
+            "method.request_stream",
+            "method.response_str",
+            "method.response_stream",
+        }
+    )
 
     def visit_service(self, block: ServiceTemplate) -> None:
         for field in block.methods:
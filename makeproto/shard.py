@@ -0,0 +1,166 @@
+import re
+from dataclasses import dataclass
+
+from typing_extensions import Dict, List, Optional, Set
+
+from makeproto.renderers import get_service_renderer
+from makeproto.template import ProtoTemplate, ServiceTemplate, proto_qual_name
+
+# file options that name a generated class and so must differ between the files
+# of a package
+UNIQUE_FILE_OPTIONS = frozenset({"java_outer_classname"})
+QUOTED_OPTION_RE = re.compile(r'^\s*(\w+)\s*=\s*"([^"]*)"\s*$')
+
+
+@dataclass(frozen=True)
+class ShardPolicy:
+    max_services: Optional[int] = None
+    max_bytes: Optional[int] = None
+    aggregator: bool = False
+
+    def __post_init__(self) -> None:
+        if self.max_services is None and self.max_bytes is None:
+            raise ValueError("ShardPolicy needs max_services, max_bytes or both")
+        if (self.max_services is not None and self.max_services <= 0) or (
+            self.max_bytes is not None and self.max_bytes <= 0
+        ):
+            raise ValueError("ShardPolicy limits must be positive")
+
+
+def shard_module_name(module: str, index: int) -> str:
+    return f"{module}_{index}"
+
+
+def shard_options(options: List[str], index: int) -> List[str]:
+    sharded: List[str] = []
+    for option in options:
+        name = option.split("=", 1)[0].strip()
+        if name in UNIQUE_FILE_OPTIONS:
+            match = QUOTED_OPTION_RE.match(option)
+            if match is None:
+                raise ValueError(
+                    f"Cannot shard option '{option}': expected a quoted string"
+                )
+            option = f'{name} = "{match.group(2)}{index}"'
+        sharded.append(option)
+    return sharded
+
+
+def service_imports(service: ServiceTemplate) -> Optional[Set[str]]:
+    # the same files ImportsSetter adds for this service's methods
+    imports: Set[str] = set()
+    for method in service.methods:
+        if not method.request_types or method.response_type is None:
+            # detached templates keep no types: the caller falls back to the
+            # module imports
+            return None
+        for ftype in (method.request_types[0], method.response_type):
+            if ftype.proto_path:
+                imports.add(ftype.proto_path)
+    return imports
+
+
+def split_services(
+    services: List[ServiceTemplate], policy: ShardPolicy, renderer: str
+) -> List[List[ServiceTemplate]]:
+    render_service = get_service_renderer(renderer) if policy.max_bytes else None
+    groups: List[List[ServiceTemplate]] = []
+    current: List[ServiceTemplate] = []
+    current_bytes = 0
+    for service in services:
+        size = 0
+        if render_service is not None:
+            size = len(render_service(service).encode("utf-8"))
+        full = (
+            policy.max_services is not None and len(current) >= policy.max_services
+        ) or (policy.max_bytes is not None and current_bytes + size > policy.max_bytes)
+        # a service larger than max_bytes still gets a shard of its own
+        if current and full:
+            groups.append(current)
+            current, current_bytes = [], 0
+        current.append(service)
+        current_bytes += size
+    if current:
+        groups.append(current)
+    return groups
+
+
+def shard_template(
+    template: ProtoTemplate,
+    policy: ShardPolicy,
+    renderer: str = "jinja",
+    taken: Optional[Set[str]] = None,
+) -> List[ProtoTemplate]:
+
+    services = [service for service in template.services if service.methods]
+    groups = split_services(services, policy, renderer)
+    if len(groups) <= 1:
+        return [template]
+
+    taken = taken if taken is not None else set()
+    shards: List[ProtoTemplate] = []
+    for index, group in enumerate(groups, start=1):
+        module = shard_module_name(template.module, index)
+        if module in taken:
+            raise ValueError(
+                f"Shard '{module}' of module '{template.module}' collides with "
+                f"an existing module in package '{template.package}'"
+            )
+        imports: Set[str] = set()
+        for service in group:
+            needed = service_imports(service)
+            if needed is None:
+                imports = set(template.imports)
+                break
+            imports |= needed
+        shards.append(
+            ProtoTemplate(
+                comments=template.comments,
+                syntax=template.syntax,
+                package=template.package,
+                module=module,
+                imports=imports,
+                services=group,
+                options=shard_options(template.options, index),
+            )
+        )
+
+    if policy.aggregator:
+        # the original file name keeps working for existing importers, and
+        # the aggregator keeps the original options
+        shards.append(
+            ProtoTemplate(
+                comments=template.comments,
+                syntax=template.syntax,
+                package=template.package,
+                module=template.module,
+                imports=set(),
+                services=[],
+                options=list(template.options),
+                public_imports={
+                    proto_qual_name(shard.package, shard.module) for shard in shards
+                },
+            )
+        )
+    return shards
+
+
+def shard_templates(
+    templates: List[ProtoTemplate],
+    policy: Optional[ShardPolicy],
+    renderer: str = "jinja",
+) -> List[ProtoTemplate]:
+
+    if policy is None:
+        return templates
+    modules: Dict[str, Set[str]] = {}
+    for template in templates:
+        modules.setdefault(template.package, set()).add(template.module)
+
+    sharded: List[ProtoTemplate] = []
+    for template in templates:
+        taken = modules[template.package]
+        shards = shard_template(template, policy, renderer, taken)
+        taken.update(shard.module for shard in shards)
+        sharded.extend(shards)
+    return sharded
@@ -1,9 +1,30 @@
+import os
+import threading
 import warnings
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from importlib import resources
 from pathlib import Path
 
-from jinja2 import Environment, FileSystemLoader
-from typing_extensions import Any, Callable, Dict, List, Optional, Protocol, Set
+from jinja2 import (
+    BaseLoader,
+    DictLoader,
+    Environment,
+    FileSystemBytecodeCache,
+    FileSystemLoader,
+    Template,
+)
+from jinja2.bccache import Bucket
+from typing_extensions import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Protocol,
+    Set,
+    Union,
+)
 
 from makeproto.interface import IMetaType
 
@@ -86,10 +107,7 @@ class ServiceTemplate(Node, ToDict):
     def to_dict(self) -> Dict[str, Any]:
         self_dict: Dict[str, Any] = {}
         if not self.methods:
-            warnings.warn(
-                f"Service: '{self.package}.{self.name}' is empty and it was ignored",
-                UserWarning,
-            )
+            warn_empty_service(self)
             return self_dict
 
         self_dict["service_name"] = self.name
@@ -114,20 +132,33 @@ class ProtoTemplate(ToDict):
     imports: Set[str]
     services: List[ServiceTemplate]
     options: List[str]
+    # re-exported files, set on the aggregator of a sharded module
+    public_imports: Set[str] = field(default_factory=set)
+
+    def sorted_imports(self) -> List[str]:
+        # sets iterate in hash order, which changes between processes
+        return sorted(self.imports)
+
+    def sorted_public_imports(self) -> List[str]:
+        return sorted(self.public_imports)
+
+    def is_empty(self) -> bool:
+        return not self.services and not self.public_imports
+
+    def depends(self) -> Set[str]:
+        return self.imports | self.public_imports
 
     def to_dict(self) -> Dict[str, Any]:
         self_dict: Dict[str, Any] = {}
-        if not self.services:
-            warnings.warn(
-                f"Protofile: '{self.package or 'NO_PACKAGE'}.{self.module}.proto' is empty and it was ignored",
-                UserWarning,
-            )
+        if self.is_empty():
+            warn_empty_protofile(self)
             return self_dict
 
         self_dict["comment"] = self.comments
         self_dict["syntax"] = f"proto{self.syntax}"
         self_dict["package"] = self.package
-        self_dict["imports"] = self.imports
+        self_dict["imports"] = self.sorted_imports()
+        self_dict["public_imports"] = self.sorted_public_imports()
         self_dict["options"] = self.options
 
         services_dict: List[Dict[str, Any]] = []
@@ -141,21 +172,264 @@ class ProtoTemplate(ToDict):
         return self_dict
 
 
+def proto_qual_name(package: str, filename: str) -> str:
+    file_path = f"{filename}.proto"
+    if package:
+        pack = package.replace(".", "/")
+        file_path = f"{pack}/{file_path}"
+    return file_path
+
+
+def warn_empty_service(service: ServiceTemplate) -> None:
+    warnings.warn(
+        f"Service: '{service.package}.{service.name}' is empty and it was ignored",
+        UserWarning,
+    )
+
+
+def warn_empty_protofile(template: ProtoTemplate) -> None:
+    warnings.warn(
+        f"Protofile: '{template.package or 'NO_PACKAGE'}.{template.module}.proto' is empty and it was ignored",
+        UserWarning,
+    )
+
+
+def detach_protofile(template: ProtoTemplate) -> ProtoTemplate:
+    # copy keeping only what rendering reads, so it can be pickled
+    services: List[ServiceTemplate] = []
+    for service in template.services:
+        detached = ServiceTemplate(
+            name=service.name,
+            comments=service.comments,
+            options=list(service.options),
+            package=service.package,
+            module=service.module,
+            methods=[],
+        )
+        detached.methods = [
+            MethodTemplate(
+                name=method.name,
+                comments=method.comments,
+                options=list(method.options or []),
+                service=detached,
+                method_func=None,  # type: ignore[arg-type]
+                request_types=[],
+                response_type=None,
+                request_stream=method.request_stream,
+                response_stream=method.response_stream,
+                request_str=method.request_str,
+                response_str=method.response_str,
+            )
+            for method in service.methods
+        ]
+        services.append(detached)
+    return ProtoTemplate(
+        comments=template.comments,
+        syntax=template.syntax,
+        package=template.package,
+        module=template.module,
+        imports=set(template.imports),
+        services=services,
+        options=list(template.options),
+        public_imports=set(template.public_imports),
+    )
+
+
 TEMPLATE_DIR = Path(__file__).parent / "templates"
+TEMPLATE_CACHE_ENV = "MAKEPROTO_TEMPLATE_CACHE_DIR"
 
-env = Environment(
-    loader=FileSystemLoader(TEMPLATE_DIR), trim_blocks=True, lstrip_blocks=True
-)
+
+def load_packaged_templates() -> Dict[str, str]:
+    # works from wheels, zipapps and frozen bundles alike
+    root = resources.files("makeproto").joinpath("templates")
+    return {
+        entry.name: entry.read_text(encoding="utf-8")
+        for entry in root.iterdir()
+        if entry.name.endswith(".j2")
+    }
+
+
+TEMPLATE_SOURCES: Dict[str, str] = load_packaged_templates()
+
+# template variable name -> node attribute, for nodes rendered without to_dict()
+NODE_ATTRIBUTE_ALIASES: Dict[type, Dict[str, str]] = {
+    MethodTemplate: {
+        "comment": "comments",
+        "request_type": "request_str",
+        "response_type": "response_str",
+    },
+}
 
 
-def render_service_template(data: Dict[str, str]) -> str:
-    template = env.get_template("service.j2")
+class NodeEnvironment(Environment):
+    def getattr(self, obj: Any, attribute: str) -> Any:
+        aliases = NODE_ATTRIBUTE_ALIASES.get(type(obj))
+        if aliases is not None:
+            attribute = aliases.get(attribute, attribute)
+        return super().getattr(obj, attribute)
+
+
+class CountingBytecodeCache(FileSystemBytecodeCache):
+    def __init__(self, directory: Union[str, Path]) -> None:
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        super().__init__(str(directory))
+        self.hits = 0
+        self.misses = 0
+
+    def load_bytecode(self, bucket: Bucket) -> None:
+        super().load_bytecode(bucket)
+        if bucket.code is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+
+@dataclass
+class TemplateCacheInfo:
+    hits: int
+    misses: int
+    bytecode_hits: int
+    bytecode_misses: int
+    currsize: int
+
+
+class TemplateRegistry:
+    def __init__(self, env: Environment) -> None:
+        self.env = env
+        self._templates: Dict[str, Template] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name: str) -> Template:
+        with self._lock:
+            template = self._templates.get(name)
+            if template is not None:
+                self.hits += 1
+                return template
+            self.misses += 1
+            template = self.env.get_template(name)
+            self._templates[name] = template
+            return template
+
+    def set_bytecode_cache(self, directory: Optional[Union[str, Path]]) -> None:
+        if directory is None:
+            self.env.bytecode_cache = None
+        else:
+            self.env.bytecode_cache = CountingBytecodeCache(directory)
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._templates.clear()
+            if self.env.cache is not None:
+                self.env.cache.clear()
+
+    def cache_info(self) -> TemplateCacheInfo:
+        bcc = self.env.bytecode_cache
+        return TemplateCacheInfo(
+            hits=self.hits,
+            misses=self.misses,
+            bytecode_hits=getattr(bcc, "hits", 0),
+            bytecode_misses=getattr(bcc, "misses", 0),
+            currsize=len(self._templates),
+        )
+
+
+def make_environment(
+    cache_dir: Optional[Union[str, Path]] = None,
+    auto_reload: bool = False,
+) -> Environment:
+    bytecode_cache = None
+    if cache_dir is not None:
+        bytecode_cache = CountingBytecodeCache(cache_dir)
+    loader: BaseLoader
+    if auto_reload:
+        loader = FileSystemLoader(TEMPLATE_DIR)
+    else:
+        loader = DictLoader(TEMPLATE_SOURCES)
+    return NodeEnvironment(
+        loader=loader,
+        trim_blocks=True,
+        lstrip_blocks=True,
+        bytecode_cache=bytecode_cache,
+        auto_reload=auto_reload,
+    )
+
+
+env = make_environment(os.environ.get(TEMPLATE_CACHE_ENV) or None)
+template_registry = TemplateRegistry(env)
+
+
+def set_template_cache_dir(directory: Optional[Union[str, Path]]) -> None:
+    template_registry.set_bytecode_cache(directory)
+
+
+def template_cache_info() -> TemplateCacheInfo:
+    return template_registry.cache_info()
+
+
+def service_context(service: ServiceTemplate) -> Dict[str, Any]:
+    return {
+        "service_name": service.name,
+        "service_comment": service.comments,
+        "options": service.options,
+        "methods": service.methods,
+    }
+
+
+def protofile_context(template: ProtoTemplate) -> Dict[str, Any]:
+    services: List[ServiceTemplate] = []
+    for service in template.services:
+        if not service.methods:
+            warn_empty_service(service)
+            continue
+        services.append(service)
+    return {
+        "comment": template.comments,
+        "syntax": f"proto{template.syntax}",
+        "package": template.package,
+        "imports": template.sorted_imports(),
+        "public_imports": template.sorted_public_imports(),
+        "options": template.options,
+        "services": services,
+    }
+
+
+def render_service_template(data: Union[ServiceTemplate, Dict[str, Any]]) -> str:
+    if isinstance(data, ServiceTemplate):
+        data = service_context(data)
+    template = template_registry.get("service.j2")
     return template.render(data)
 
 
+# set once at import time: mutating env.globals per render is not thread safe
+env.globals["render_service_template"] = render_service_template
+
+
 def render_protofile_template(data: Dict[str, str]) -> str:
     if not data:
         return ""
-    env.globals["render_service_template"] = render_service_template
-    template = env.get_template("protofile.j2")
+    template = template_registry.get("protofile.j2")
     return template.render(data)
+
+
+def iter_protofile_template(data: Dict[str, str]) -> Iterator[str]:
+    if not data:
+        return
+    template = template_registry.get("protofile.j2")
+    yield from template.generate(data)
+
+
+def render_protofile(template: ProtoTemplate) -> str:
+    if template.is_empty():
+        warn_empty_protofile(template)
+        return ""
+    return render_protofile_template(protofile_context(template))
+
+
+def iter_protofile(template: ProtoTemplate) -> Iterator[str]:
+    if template.is_empty():
+        warn_empty_protofile(template)
+        return
+    yield from iter_protofile_template(protofile_context(template))
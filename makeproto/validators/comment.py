@@ -4,16 +4,24 @@ from makeproto.template import MethodTemplate, ServiceTemplate
 
 
 class CommentsValidator(CompilerPass):
+    fusable = True
+    reads = frozenset(
+        {"service.name", "service.comments", "method.name", "method.comments"}
+    )
+    writes = frozenset()
 
     def visit_service(self, block: ServiceTemplate) -> None:
+        self.visit_service_node(block)
+        for field in block.methods:
+            field.accept(self)
+
+    def visit_service_node(self, block: ServiceTemplate) -> None:
         report = self.ctx.get_report(block)
         if not isinstance(block.comments, str):
             report.report_error(
                 code=CompileErrorCode.INVALID_COMMENT,
                 location=block.name,
             )
-        for field in block.methods:
-            field.accept(self)
 
     def visit_method(self, method: MethodTemplate) -> None:
         report = self.ctx.get_report(method.service)
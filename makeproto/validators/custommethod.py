@@ -6,6 +6,10 @@ from makeproto.template import MethodTemplate, ServiceTemplate
 
 
 class CustomPass(CompilerPass):
+    fusable = True
+    reads = frozenset({"service.name", "method.name", "method.method_func"})
+    writes = frozenset()
+
     def __init__(
         self,
         visitmethod: Callable[[Callable[..., Any]], List[str]],
@@ -5,6 +5,11 @@ from makeproto.template import MethodTemplate, ServiceTemplate
 
 
 class ImportsValidator(CompilerPass):
+    fusable = True
+    reads = frozenset(
+        {"service.name", "method.name", "method.request_types", "method.response_type"}
+    )
+    writes = frozenset()
 
     def visit_service(self, block: ServiceTemplate) -> None:
         for field in block.methods:
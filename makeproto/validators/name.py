@@ -1,5 +1,7 @@
+import os
 import re
 import tempfile
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Tuple
 
@@ -78,8 +80,18 @@ class NameValidator(CompilerPass):
 
 
 class BlockNameValidator(NameValidator):
+    fusable = True
+    reads = frozenset({"service.name"})
+    writes = frozenset()
+
+    def set_default(self) -> None:
+        # service names only have to be unique within their package
+        self.used_names.clear()
 
     def visit_service(self, block: ServiceTemplate) -> None:
+        self.visit_service_node(block)
+
+    def visit_service_node(self, block: ServiceTemplate) -> None:
         name = block.name
         report = self.ctx.get_report(block)
         check_valid(name, report)
@@ -91,6 +103,10 @@ class BlockNameValidator(NameValidator):
 
 
 class FieldNameValidator(NameValidator):
+    fusable = True
+    reads = frozenset({"service.name", "method.name"})
+    writes = frozenset()
+
     def reset(self) -> None:
         self.used_names.clear()
 
@@ -109,9 +125,76 @@ class FieldNameValidator(NameValidator):
         )
 
 
-def check_valid_filenames(names: Sequence[str], report: CompileReport) -> None:
+PROBE_FILENAMES_ENV = "MAKEPROTO_PROBE_FILENAMES"
+
+# the POSIX portable filename character set
+PORTABLE_FILENAME_RE = re.compile(r"^[A-Za-z0-9._-]+$")
+MAX_FILENAME_BYTES = 255
+PROTO_SUFFIX = ".proto"
+
+WINDOWS_RESERVED_NAMES = {
+    "CON",
+    "PRN",
+    "AUX",
+    "NUL",
+    *(f"COM{i}" for i in range(1, 10)),
+    *(f"LPT{i}" for i in range(1, 10)),
+}
+
+
+@lru_cache(maxsize=4096)
+def filename_error(name: str) -> Optional[str]:
+    if not name:
+        return "File name is empty"
+    if name in (".", ".."):
+        return f"'{name}' is not a file name"
+    if not PORTABLE_FILENAME_RE.match(name):
+        return "File name must only use letters, digits, '.', '_' and '-'"
+    if name.startswith("-"):
+        return "File name must not start with '-'"
+    if name.endswith("."):
+        return "File name must not end with '.'"
+    if len(f"{name}{PROTO_SUFFIX}".encode("utf-8")) > MAX_FILENAME_BYTES:
+        return f"File name is longer than {MAX_FILENAME_BYTES} bytes"
+    if name.split(".")[0].upper() in WINDOWS_RESERVED_NAMES:
+        return f"'{name}' is a reserved file name on Windows"
+    return None
+
+
+def find_filename_errors(filenames: Sequence[str]) -> Sequence[Tuple[str, str]]:
+    errors: List[Tuple[str, str]] = []
+    for name in filenames:
+        if not isinstance(name, str):
+            errors.append((name, f"File name must be a str, not {type(name).__name__}"))
+            continue
+        err = filename_error(name)
+        if err is not None:
+            errors.append((name, err))
+    return errors
+
+
+def probe_filenames_enabled() -> bool:
+    return os.environ.get(PROBE_FILENAMES_ENV, "").lower() in ("1", "true", "yes")
 
-    fail_names = find_invalid_filenames(names)
+
+def check_valid_filenames(
+    names: Sequence[str], report: CompileReport, probe_disk: Optional[bool] = None
+) -> None:
+
+    fail_names = list(find_filename_errors(names))
+    if probe_disk is None:
+        probe_disk = probe_filenames_enabled()
+    if probe_disk:
+        rejected = {name for name, _ in fail_names if isinstance(name, str)}
+        fail_names.extend(
+            find_invalid_filenames(
+                [
+                    name
+                    for name in names
+                    if isinstance(name, str) and name not in rejected
+                ]
+            )
+        )
 
     for name, err in fail_names:
         report.report_error(
@@ -5,15 +5,32 @@ from typing_extensions import Any, Callable, List
 
 from makeproto.compiler import CompilerPass
 from makeproto.interface import IMetaType
+from makeproto.memo import memoize_function
+from makeproto.portable import PortableFunction
 from makeproto.report import CompileErrorCode, CompileReport
 from makeproto.template import MethodTemplate, ServiceTemplate
 
+is_asyncgen_function = memoize_function(inspect.isasyncgenfunction)
+
 
 def is_async_func(func: Callable[..., Any]) -> bool:
-    return inspect.isasyncgenfunction(func)
+    if isinstance(func, PortableFunction):
+        return func.is_asyncgen
+    return is_asyncgen_function(func)
 
 
 class TypeValidator(CompilerPass):
+    fusable = True
+    reads = frozenset(
+        {
+            "service.name",
+            "method.name",
+            "method.request_types",
+            "method.response_type",
+            "method.method_func",
+        }
+    )
+    writes = frozenset()
 
     def visit_service(self, block: ServiceTemplate) -> None:
         for field in block.methods:
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+import posixpath
+import secrets
+import stat
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from typing_extensions import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+from makeproto.interface import IProtoPackage
+
+MANIFEST_NAME = ".makeproto-manifest.json"
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class WriteResult:
+    written: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+
+
+def content_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_digest(path: Path) -> Optional[str]:
+    try:
+        return content_digest(path.read_bytes())
+    except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+        return None
+
+
+def create_temp(path: Path) -> Tuple[int, str]:
+    # unlike mkstemp's fixed 0600, os.open lets the kernel apply the umask,
+    # so it never has to be read (and reset) process-wide
+    while True:
+        tmp = str(path.parent / f".{path.name}.{secrets.token_hex(4)}.tmp")
+        try:
+            return os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666), tmp
+        except FileExistsError:  # pragma: no cover
+            continue
+
+
+def write_atomic(path: Path, data: bytes, mode: Optional[int] = None) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # the rename is atomic on the same filesystem, so readers never see a
+    # half-written file
+    fd, tmp = create_temp(path)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        if mode is not None:
+            os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:  # pragma: no cover
+            pass
+        raise
+
+
+def write_proto(
+    package: IProtoPackage, out_dir: Path, encoding: str
+) -> Tuple[bool, str]:
+    path = out_dir / package.qual_name
+    data = package.content.encode(encoding)
+    digest = content_digest(data)
+    if file_digest(path) == digest:
+        # untouched files keep their mtime, so protoc/make see no change
+        return False, digest
+    mode: Optional[int] = None
+    try:
+        mode = stat.S_IMODE(path.stat().st_mode)
+    except FileNotFoundError:
+        pass
+    write_atomic(path, data, mode)
+    return True, digest
+
+
+def write_protos(
+    packages: Iterable[IProtoPackage],
+    out_dir: Union[str, Path],
+    jobs: Optional[int] = None,
+    encoding: str = "utf-8",
+    manifest: bool = False,
+    keep: Iterable[str] = (),
+) -> WriteResult:
+
+    out_dir = Path(out_dir)
+    packages = list(packages)
+    names = [package.qual_name for package in packages]
+    if len(set(names)) != len(names):
+        duplicated = sorted({name for name in names if names.count(name) > 1})
+        raise ValueError(f"Duplicated output files: {duplicated}")
+
+    if jobs == 1:
+        outcomes = [write_proto(package, out_dir, encoding) for package in packages]
+    else:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            outcomes = list(
+                executor.map(
+                    lambda package: write_proto(package, out_dir, encoding),
+                    packages,
+                )
+            )
+
+    result = WriteResult()
+    for name, (was_written, _) in zip(names, outcomes):
+        (result.written if was_written else result.unchanged).append(name)
+
+    if manifest:
+        previous = read_manifest(out_dir)
+        # the files of the packages in keep, e.g. the failed ones of a partial
+        # compile, stay on disk and in the manifest until they compile again
+        kept_dirs = {package.replace(".", "/") for package in keep}
+        current = set(names)
+        files = {
+            name: entry
+            for name, entry in previous.items()
+            if name not in current and posixpath.dirname(name) in kept_dirs
+        }
+        result.removed = remove_orphans(out_dir, set(previous) - current - set(files))
+        for package, (_, digest) in zip(packages, outcomes):
+            files[package.qual_name] = {
+                "digest": digest,
+                "depends": sorted(package.depends),
+            }
+        write_manifest(out_dir, files)
+    return result
+
+
+def read_manifest(out_dir: Union[str, Path]) -> Dict[str, Dict[str, Any]]:
+    try:
+        data = json.loads((Path(out_dir) / MANIFEST_NAME).read_text(encoding="utf-8"))
+    except (FileNotFoundError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+        return {}
+    files = data.get("files")
+    return files if isinstance(files, dict) else {}
+
+
+def write_manifest(out_dir: Path, files: Dict[str, Dict[str, Any]]) -> None:
+    data = json.dumps(
+        {"version": MANIFEST_VERSION, "files": files}, indent=2, sort_keys=True
+    )
+    path = out_dir / MANIFEST_NAME
+    if file_digest(path) != content_digest(data.encode("utf-8")):
+        write_atomic(path, data.encode("utf-8"))
+
+
+def remove_orphans(out_dir: Path, orphans: Iterable[str]) -> List[str]:
+    root = out_dir.resolve()
+    removed: List[str] = []
+    for name in sorted(orphans):
+        path = (out_dir / name).resolve()
+        # never follow a manifest entry out of the output tree
+        if root not in path.parents:
+            continue
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            continue
+        removed.append(name)
+        parent = path.parent
+        while parent != root:
+            try:
+                parent.rmdir()
+            except OSError:
+                break
+            parent = parent.parent
+    return removed
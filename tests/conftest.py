@@ -1,3 +1,4 @@
+import threading
 from dataclasses import dataclass, field
 from pathlib import Path
 from tempfile import TemporaryDirectory
@@ -5,7 +6,9 @@ from typing import (
     Any,
     AsyncIterator,
     Callable,
+    Dict,
     Iterable,
+    List,
     Optional,
     Sequence,
     Type,
@@ -16,7 +19,9 @@ from typing import (
 import pytest
 from google.protobuf.empty_pb2 import Empty
 
-from makeproto.interface import ILabeledMethod, IMetaType, IService
+from makeproto import compile_service
+from makeproto.interface import ILabeledMethod, IMetaType, IProtoPackage, IService
+from makeproto.options import CompileOptions
 from tests.compile_helper import compile_protoc
 
 
@@ -120,6 +125,46 @@ class LabeledMethod(ILabeledMethod):
     response_types: Optional[Any] = None
 
 
+def make_packages(count: int, broken: bool = False) -> Dict[str, List[IService]]:
+    packages: Dict[str, List[IService]] = {}
+    for i in range(count):
+        name = f"pack{i}"
+        methods = [
+            LabeledMethod(
+                name=f"ping{j}",
+                request_types=[] if broken and i % 2 else [empty_instance],
+                response_types=empty_instance,
+                method=ping,
+            )
+            for j in range(3)
+        ]
+        packages[name] = [
+            Service(
+                name=f"service{i}", module=f"module{i}", package=name, _methods=methods
+            )
+        ]
+    return packages
+
+
+def compiled(
+    services: Dict[str, List[IService]], **options: Any
+) -> List[IProtoPackage]:
+    protos = compile_service(services, options=CompileOptions(**options))
+    assert protos is not None
+    return list(protos)
+
+
+class LockingLinter:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.checked = 0
+
+    def check(self, func: Callable[..., Any]) -> List[str]:
+        with self.lock:
+            self.checked += 1
+        return []
+
+
 @pytest.fixture
 def simple_service() -> Service:
     service = Service(
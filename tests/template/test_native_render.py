@@ -0,0 +1,117 @@
+import itertools
+import warnings
+from typing import List, Optional
+
+import pytest
+
+from makeproto.build_service import compile_service
+from makeproto.native_render import render_protofile_native, render_service_native
+from makeproto.options import CompileOptions
+from makeproto.renderers import get_renderer
+from makeproto.template import (
+    ProtoTemplate,
+    render_protofile_template,
+    render_service_template,
+)
+from tests.conftest import Service
+from tests.test_helpers import (
+    make_render_method,
+    make_render_protofile,
+    make_render_service,
+)
+
+
+def assert_equivalent(template: ProtoTemplate) -> None:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        expected = render_protofile_template(template.to_dict())
+        assert render_protofile_native(template) == expected
+
+
+@pytest.mark.parametrize(
+    "comments,options,request_stream,response_stream",
+    list(
+        itertools.product(
+            ["", "// method comment", "/* block\n comment */"],
+            [None, [], ["deprecated = true"], ["a = 1", "b = 2"]],
+            [False, True],
+            [False, True],
+        )
+    ),
+)
+def test_method_variants(
+    comments: str,
+    options: Optional[List[str]],
+    request_stream: bool,
+    response_stream: bool,
+) -> None:
+    service = make_render_service("svc", "// service comment")
+    make_render_method(
+        service, "m1", comments, options, request_stream, response_stream
+    )
+    make_render_method(service, "m2")
+
+    assert render_service_native(service) == render_service_template(service.to_dict())
+    assert_equivalent(make_render_protofile([service]))
+
+
+@pytest.mark.parametrize(
+    "comments,package,imports,options",
+    list(
+        itertools.product(
+            ["", "// file comment"],
+            ["", "my.pack"],
+            [[], ["a.proto"], ["a.proto", "b/c.proto"]],
+            [[], ['java_package = "x"', "optimize_for = SPEED"]],
+        )
+    ),
+)
+def test_protofile_variants(
+    comments: str, package: str, imports: List[str], options: List[str]
+) -> None:
+    service1 = make_render_service("svc1")
+    make_render_method(service1, "m1", "// comment", ["x = 1"], True, False)
+    service2 = make_render_service("svc2", "// second")
+    make_render_method(service2, "m1", response_stream=True)
+
+    template = make_render_protofile(
+        [service1, service2], comments, package, imports, options
+    )
+    assert_equivalent(template)
+
+
+def test_empty_service_skipped() -> None:
+    service = make_render_service("svc")
+    make_render_method(service, "m1")
+    empty = make_render_service("empty")
+
+    template = make_render_protofile([empty, service, empty])
+    assert_equivalent(template)
+    with pytest.warns(UserWarning, match="is empty"):
+        render_protofile_native(template)
+
+
+def test_empty_protofile() -> None:
+    template = make_render_protofile([])
+    with pytest.warns(UserWarning, match="is empty"):
+        assert render_protofile_native(template) == ""
+
+
+def test_compile_service_renderers_match(simple_service: Service) -> None:
+    service2 = Service(name="service_2", comments="Service2", module="protofile1")
+    services = {"": [simple_service, service2]}
+
+    jinja = [
+        p.content
+        for p in compile_service(services, options=CompileOptions(renderer="jinja"))
+    ]
+    native = [
+        p.content
+        for p in compile_service(services, options=CompileOptions(renderer="native"))
+    ]
+    assert native == jinja
+
+
+def test_unknown_renderer() -> None:
+    with pytest.raises(ValueError, match="Unknown renderer"):
+        get_renderer("mako")
@@ -0,0 +1,68 @@
+import warnings
+
+import pytest
+
+from makeproto.template import (
+    ProtoTemplate,
+    ServiceTemplate,
+    iter_protofile,
+    render_protofile,
+    render_protofile_template,
+    render_service_template,
+)
+from tests.test_helpers import (
+    make_render_method,
+    make_render_protofile,
+    make_render_service,
+)
+
+
+@pytest.fixture
+def protofile() -> ProtoTemplate:
+    service1 = make_render_service("svc1", "// first")
+    make_render_method(service1, "m1", "// comment", ["x = 1", "y = 2"], True, False)
+    make_render_method(service1, "m2", response_stream=True)
+    service2 = make_render_service("svc2")
+    make_render_method(service2, "m1")
+    empty = make_render_service("empty")
+    return make_render_protofile(
+        [service1, empty, service2],
+        imports=["a.proto", "b.proto"],
+        options=["optimize_for = SPEED"],
+    )
+
+
+def test_render_nodes_matches_to_dict(protofile: ProtoTemplate) -> None:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        expected = render_protofile_template(protofile.to_dict())
+        assert render_protofile(protofile) == expected
+        assert "".join(iter_protofile(protofile)) == expected
+
+
+def test_render_nodes_skips_to_dict(
+    protofile: ProtoTemplate, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def fail(self: object) -> None:
+        raise AssertionError("to_dict should not be called")
+
+    for cls in (ProtoTemplate, ServiceTemplate, type(protofile.services[0].methods[0])):
+        monkeypatch.setattr(cls, "to_dict", fail)
+
+    with pytest.warns(UserWarning, match="'pack.empty' is empty"):
+        assert "rpc m1(stream pack.Request) returns (Response){" in render_protofile(
+            protofile
+        )
+
+
+def test_render_service_node() -> None:
+    service = make_render_service("svc", "// service")
+    make_render_method(service, "m1", "// method", ["deprecated = true"])
+    assert render_service_template(service) == render_service_template(
+        service.to_dict()
+    )
+
+
+def test_render_empty_protofile_node() -> None:
+    with pytest.warns(UserWarning, match="is empty"):
+        assert render_protofile(make_render_protofile([])) == ""
@@ -0,0 +1,91 @@
+import os
+from pathlib import Path
+
+import pytest
+from jinja2 import DictLoader, FileSystemLoader
+
+from makeproto.template import (
+    TEMPLATE_DIR,
+    TEMPLATE_SOURCES,
+    TemplateRegistry,
+    make_environment,
+)
+
+
+def test_registry_caches_compiled_templates() -> None:
+    registry = TemplateRegistry(make_environment())
+
+    first = registry.get("service.j2")
+    second = registry.get("service.j2")
+
+    assert first is second
+    info = registry.cache_info()
+    assert info.hits == 1
+    assert info.misses == 1
+    assert info.currsize == 1
+
+
+def test_registry_clear() -> None:
+    registry = TemplateRegistry(make_environment())
+    registry.get("protofile.j2")
+    registry.clear()
+    assert registry.cache_info().currsize == 0
+
+    registry.get("protofile.j2")
+    assert registry.cache_info().misses == 2
+
+
+def test_bytecode_cache_persists_across_environments(tmp_path: Path) -> None:
+    cache_dir = tmp_path / "jinja_cache"
+
+    cold = TemplateRegistry(make_environment(cache_dir))
+    cold.get("service.j2")
+    cold_info = cold.cache_info()
+    assert cold_info.bytecode_hits == 0
+    assert cold_info.bytecode_misses == 1
+    assert any(cache_dir.iterdir())
+
+    warm = TemplateRegistry(make_environment(cache_dir))
+    warm.get("service.j2")
+    warm_info = warm.cache_info()
+    assert warm_info.bytecode_hits == 1
+    assert warm_info.bytecode_misses == 0
+
+
+def test_set_bytecode_cache(tmp_path: Path) -> None:
+    registry = TemplateRegistry(make_environment())
+    registry.get("service.j2")
+
+    registry.set_bytecode_cache(tmp_path)
+    assert registry.cache_info().currsize == 0
+    registry.get("service.j2")
+    assert registry.cache_info().bytecode_misses == 1
+
+    registry.set_bytecode_cache(None)
+    assert registry.env.bytecode_cache is None
+
+
+def test_templates_loaded_in_memory(monkeypatch: pytest.MonkeyPatch) -> None:
+    env = make_environment()
+    assert isinstance(env.loader, DictLoader)
+    assert not env.auto_reload
+    assert set(TEMPLATE_SOURCES) == {"protofile.j2", "service.j2"}
+
+    def no_stat(*args: object) -> None:
+        raise AssertionError("template lookup touched the filesystem")
+
+    monkeypatch.setattr(os.path, "getmtime", no_stat)
+    monkeypatch.setattr(os, "stat", no_stat)
+    registry = TemplateRegistry(env)
+    template = registry.get("service.j2")
+    assert env.get_template("service.j2") is template
+    assert "service s {" in template.render(service_name="s", methods=[])
+
+
+def test_auto_reload_uses_template_dir() -> None:
+    env = make_environment(auto_reload=True)
+    assert isinstance(env.loader, FileSystemLoader)
+    assert env.auto_reload
+    source, filename, _ = env.loader.get_source(env, "protofile.j2")
+    assert source == TEMPLATE_SOURCES["protofile.j2"]
+    assert Path(filename).parent == TEMPLATE_DIR
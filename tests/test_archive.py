@@ -0,0 +1,81 @@
+import io
+import os
+import tarfile
+import zipfile
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from makeproto import write_archive
+from makeproto.archive import ARCHIVE_FORMATS, archive_bytes
+from tests.conftest import compiled, make_packages
+
+
+def read_entries(data: bytes, format: str) -> dict:
+    if format == "zip":
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            return {
+                name: archive.read(name).decode("utf-8") for name in archive.namelist()
+            }
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r:*") as tar:
+        return {
+            member.name: tar.extractfile(member).read().decode("utf-8")  # type: ignore[union-attr]
+            for member in tar.getmembers()
+        }
+
+
+@pytest.mark.parametrize("format", ARCHIVE_FORMATS)
+def test_archive_roundtrip(format: str) -> None:
+    packages = compiled(make_packages(3))
+    data = archive_bytes(packages, format)
+    assert read_entries(data, format) == {p.qual_name: p.content for p in packages}
+
+
+@pytest.mark.parametrize("format", ARCHIVE_FORMATS)
+def test_archive_is_deterministic(format: str, monkeypatch: pytest.MonkeyPatch) -> None:
+    first = archive_bytes(compiled(make_packages(3)), format)
+    monkeypatch.setattr("time.time", lambda: 2_000_000_000.0)
+    assert archive_bytes(compiled(make_packages(3)), format) == first
+
+
+def test_streaming_packages_into_zip() -> None:
+    packages = compiled(make_packages(3), stream=True)
+    data = archive_bytes(packages, "zip")
+    assert read_entries(data, "zip") == {p.qual_name: p.content for p in packages}
+
+
+class Unseekable(io.RawIOBase):
+    def __init__(self) -> None:
+        self.buffer = bytearray()
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        self.buffer.extend(data)
+        return len(data)
+
+
+@pytest.mark.parametrize("format", ["zip", "tar.gz"])
+def test_archive_to_unseekable_stream(format: str) -> None:
+    sink = Unseekable()
+    names = write_archive(compiled(make_packages(3)), sink, format)
+    assert sorted(read_entries(bytes(sink.buffer), format)) == sorted(names)
+
+
+def test_archive_to_path(tmp_path: Path) -> None:
+    target = tmp_path / "protos.tar.xz"
+    names = write_archive(compiled(make_packages(3)), target, "tar.xz")
+    with tarfile.open(target) as tar:
+        assert tar.getnames() == names
+        assert all(member.mtime == 315532800 for member in tar.getmembers())
+    assert not [p for p in os.listdir(tmp_path) if p != "protos.tar.xz"]
+
+
+def test_archive_rejects_bad_input() -> None:
+    packages = compiled(make_packages(1))
+    with pytest.raises(ValueError, match="Duplicated"):
+        archive_bytes(packages * 2)
+    with pytest.raises(ValueError, match="Unknown archive format"):
+        archive_bytes(packages, "rar")
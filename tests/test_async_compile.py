@@ -0,0 +1,142 @@
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+import makeproto.async_compile as async_compile
+from makeproto import compile_service_async
+from makeproto.compiler_passes import CompilationError
+from makeproto.interface import IService
+from makeproto.options import CompileOptions
+from tests.conftest import LockingLinter, compiled, make_packages
+
+
+async def collect(services: Dict[str, List[IService]], **options: Any) -> List[str]:
+    packages = compile_service_async(services, CompileOptions(**options))
+    return [p.content async for p in packages]
+
+
+def expected(count: int) -> List[str]:
+    return [p.content for p in compiled(make_packages(count))]
+
+
+@pytest.mark.parametrize(
+    "executor_cls", [None, ThreadPoolExecutor, ProcessPoolExecutor]
+)
+def test_async_matches_sync(executor_cls: Optional[type]) -> None:
+    if executor_cls is None:
+        assert asyncio.run(collect(make_packages(5))) == expected(5)
+        return
+    with executor_cls(max_workers=2) as executor:
+        result = asyncio.run(collect(make_packages(5), compile_executor=executor))
+    assert result == expected(5)
+
+
+def test_async_reuses_custom_pass_object() -> None:
+    linter = LockingLinter()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        result = asyncio.run(
+            collect(
+                make_packages(3),
+                compile_executor=executor,
+                custompassmethod=linter.check,
+            )
+        )
+    assert result == expected(3)
+    assert linter.checked == 3 * 3
+
+
+def test_portable_conversion_runs_off_the_loop() -> None:
+    threads: List[int] = []
+
+    def check(func: Any) -> List[str]:
+        threads.append(threading.get_ident())
+        return []
+
+    async def main() -> List[str]:
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            return await collect(
+                make_packages(2), compile_executor=executor, custompassmethod=check
+            )
+
+    assert asyncio.run(main()) == expected(2)
+    assert len(threads) == 2 * 3
+    assert threading.get_ident() not in threads
+
+
+def test_async_does_not_block_loop() -> None:
+    async def main() -> int:
+        ticks = 0
+
+        async def ticker() -> None:
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        task = asyncio.create_task(ticker())
+        await collect(make_packages(20))
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(main()) > 1
+
+
+@pytest.mark.parametrize("fail_fast", [False, True])
+def test_async_raises_compilation_error(fail_fast: bool) -> None:
+    async def main() -> List[str]:
+        names: List[str] = []
+        # one worker keeps the order in which packages hit the budget fixed
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            with pytest.raises(CompilationError) as exc_info:
+                async for package in compile_service_async(
+                    make_packages(6, broken=True),
+                    options=CompileOptions(
+                        compile_executor=executor, fail_fast=fail_fast
+                    ),
+                ):
+                    names.append(package.package)
+        if fail_fast:
+            assert exc_info.value.limit_reached
+            assert exc_info.value.total_errors == 1
+        else:
+            assert [ctx.name for ctx in exc_info.value.contexts] == [
+                "pack1",
+                "pack3",
+                "pack5",
+            ]
+        return names
+
+    assert asyncio.run(main()) == ["pack0"]
+
+
+def test_async_cancellation(monkeypatch: pytest.MonkeyPatch) -> None:
+    started: List[int] = []
+    release = threading.Event()
+    original = async_compile.compile_render_package
+
+    def slow_package(*args: Any) -> Any:
+        started.append(1)
+        release.wait(5)
+        return original(*args)
+
+    monkeypatch.setattr(async_compile, "compile_render_package", slow_package)
+
+    async def main() -> None:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            agen = compile_service_async(
+                make_packages(4), options=CompileOptions(compile_executor=executor)
+            )
+            task = asyncio.create_task(agen.__anext__())
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            await agen.aclose()
+            release.set()
+
+    asyncio.run(main())
+    # the running package finished, the queued ones never started
+    assert len(started) == 1
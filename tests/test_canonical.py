@@ -0,0 +1,107 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from makeproto.build_service import compile_service, extract_modules
+from makeproto.options import CompileOptions
+from tests.conftest import LabeledMethod, MetaType, Service, ping
+
+ROOT = Path(__file__).parent.parent
+
+
+def make_type(name: str) -> MetaType:
+    basetype = type(name, (), {})
+    return MetaType(
+        argtype=basetype,
+        basetype=basetype,
+        origin=None,
+        package=f"pack_{name.lower()}",
+        proto_path=f"pack_{name.lower()}/{name.lower()}.proto",
+    )
+
+
+def render_fixture(renderer: str = "jinja") -> str:
+    names = [f"Message{i}" for i in range(16)]
+    methods = [
+        LabeledMethod(
+            name=f"call{i}",
+            request_types=[make_type(name)],
+            response_types=make_type(names[-i - 1]),
+            method=ping,
+        )
+        for i, name in enumerate(names)
+    ]
+    service1 = Service(
+        name="service1",
+        module="canonical",
+        _methods=methods,
+        module_level_options=[f"opt{i} = true" for i in range(8)],
+        module_level_comments=[f"comment {i}" for i in range(8)],
+    )
+    service2 = Service(
+        name="service2",
+        module="canonical",
+        _methods=methods[:2],
+        module_level_options=["opt3 = true", "extra = false"],
+        module_level_comments=["comment 7", "last comment"],
+    )
+    protos = compile_service(
+        {"": [service1, service2]}, options=CompileOptions(renderer=renderer)
+    )
+    assert protos is not None
+    return "".join(p.content for p in protos)
+
+
+def test_extract_modules_keeps_insertion_order() -> None:
+    service1 = Service(
+        name="s1",
+        module="mod",
+        module_level_options=["b", "a"],
+        module_level_comments=["z", "y"],
+    )
+    service2 = Service(
+        name="s2",
+        module="mod",
+        module_level_options=["a", "c"],
+        module_level_comments=["x", "z"],
+    )
+    options, comments = extract_modules([service1, service2])["mod"]
+    assert list(options) == ["b", "a", "c"]
+    assert list(comments) == ["z", "y", "x"]
+
+
+def test_imports_are_sorted() -> None:
+    content = render_fixture()
+    imports: List[str] = [
+        line for line in content.splitlines() if line.startswith("import ")
+    ]
+    assert len(imports) == 16
+    assert imports == sorted(imports)
+
+
+@pytest.mark.parametrize("renderer", ["jinja", "native"])
+def test_output_stable_across_hash_seeds(renderer: str) -> None:
+    outputs = set()
+    for seed in ("0", "1", "12345"):
+        env = dict(os.environ, PYTHONHASHSEED=seed)
+        result = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import sys;"
+                "from tests.test_canonical import render_fixture;"
+                f"sys.stdout.write(render_fixture({renderer!r}))",
+            ],
+            cwd=ROOT,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        outputs.add(result.stdout)
+    assert len(outputs) == 1
+    assert outputs.pop() == render_fixture(renderer)
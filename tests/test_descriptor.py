@@ -0,0 +1,148 @@
+import sys
+from pathlib import Path
+from typing import Any
+
+import pytest
+from google.protobuf import descriptor_pb2, descriptor_pool
+
+from makeproto.descriptor import (
+    DescriptorOptionError,
+    compile_descriptors,
+    descriptor_set_bytes,
+    qualified_type_name,
+)
+from makeproto.protoc import run_protoc
+from tests.conftest import (
+    LabeledMethod,
+    Service,
+    compiled,
+    empty_instance,
+    make_packages,
+    ping,
+)
+
+
+def protoc_descriptors(services: Any, tmp_path: Path) -> Any:
+    result = run_protoc(compiled(services), descriptor_set_out=tmp_path / "set.pb")
+    return descriptor_pb2.FileDescriptorSet.FromString(result.descriptor_set)
+
+
+def without_comments(descriptor_set: Any) -> Any:
+    stripped = descriptor_pb2.FileDescriptorSet()
+    stripped.CopyFrom(descriptor_set)
+    for proto in stripped.file:
+        proto.ClearField("source_code_info")
+    return stripped
+
+
+def services_with_options() -> Any:
+    method = LabeledMethod(
+        name="ping",
+        comments="Ping Method",
+        options=["deprecated = true", "idempotency_level = NO_SIDE_EFFECTS"],
+        request_types=[empty_instance],
+        response_types=empty_instance,
+        method=ping,
+    )
+    service = Service(
+        name="pinger",
+        comments="Pinger Service",
+        package="opts",
+        module="pinger",
+        module_level_options=[
+            'java_package = "com.makeproto"',
+            "java_multiple_files = true",
+            "optimize_for = SPEED",
+        ],
+        _methods=[method],
+    )
+    return {"opts": [service]}
+
+
+def test_matches_protoc(tmp_path: Path) -> None:
+    ours = compile_descriptors(make_packages(3))
+    assert without_comments(ours) == protoc_descriptors(make_packages(3), tmp_path)
+
+
+def test_options_match_protoc(tmp_path: Path) -> None:
+    ours = compile_descriptors(services_with_options())
+    expected = protoc_descriptors(services_with_options(), tmp_path)
+    assert without_comments(ours) == expected
+
+    proto = ours.file[-1]
+    assert proto.options.java_package == "com.makeproto"
+    assert proto.service[0].method[0].options.deprecated
+
+
+def test_service_options() -> None:
+    # the text templates drop service options; descriptors keep them
+    services = services_with_options()
+    services["opts"][0].options = ["deprecated = true"]
+    proto = compile_descriptors(services).file[-1]
+    assert proto.service[0].options.deprecated
+
+
+def test_loads_into_pool() -> None:
+    pool = descriptor_pool.DescriptorPool()
+    for proto in compile_descriptors(make_packages(2)).file:
+        pool.Add(proto)
+    service = pool.FindServiceByName("pack1.service1")
+    assert [m.name for m in service.methods] == ["ping0", "ping1", "ping2"]
+    assert service.methods[0].input_type.full_name == "google.protobuf.Empty"
+
+
+def test_without_imports() -> None:
+    descriptor_set = compile_descriptors(make_packages(2), include_imports=False)
+    assert [f.name for f in descriptor_set.file] == [
+        "pack0/module0.proto",
+        "pack1/module1.proto",
+    ]
+
+
+def test_comments_in_source_info() -> None:
+    proto = compile_descriptors(services_with_options()).file[-1]
+    comments = {
+        tuple(loc.path): loc.leading_comments for loc in proto.source_code_info.location
+    }
+    assert comments == {(6, 0): " Pinger Service\n", (6, 0, 2, 0): " Ping Method\n"}
+
+    proto = compile_descriptors(services_with_options(), comments=False).file[-1]
+    assert not proto.HasField("source_code_info")
+
+
+def test_serialized_is_deterministic() -> None:
+    data = descriptor_set_bytes(make_packages(3))
+    assert data == descriptor_set_bytes(make_packages(3))
+    parsed = descriptor_pb2.FileDescriptorSet.FromString(data)  # type: ignore[arg-type]
+    assert len(parsed.file) == 4
+
+
+@pytest.mark.parametrize(
+    "option",
+    ["java_package = com.x", "no_such_option = 1", "optimize_for = FAST", "(x.y) = 1"],
+)
+def test_invalid_option(option: str) -> None:
+    services = services_with_options()
+    services["opts"][0].module_level_options = [option]
+    with pytest.raises(DescriptorOptionError) as exc:
+        compile_descriptors(services)
+    assert exc.value.option == option
+    assert "pinger.proto" in exc.value.owner
+
+
+def test_compile_errors_return_none(capfd: pytest.CaptureFixture[str]) -> None:
+    assert compile_descriptors(make_packages(2, broken=True)) is None
+    out, _ = capfd.readouterr()
+    assert "E801" in out
+
+
+def test_qualified_type_name() -> None:
+    assert qualified_type_name("User", "pack") == ".pack.User"
+    assert qualified_type_name("User", "") == ".User"
+    assert qualified_type_name("other.User", "pack") == ".other.User"
+
+
+def test_missing_protobuf(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setitem(sys.modules, "google.protobuf", None)
+    with pytest.raises(ImportError, match=r"makeproto\[descriptor\]"):
+        compile_descriptors(make_packages(1))
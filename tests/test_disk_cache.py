@@ -0,0 +1,251 @@
+import functools
+import os
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import pytest
+
+import makeproto.build_service as build_service
+from makeproto.build_service import compile_service
+from makeproto.compiler import CompilerPass
+from makeproto.compiler_passes import default_format, identity, no_custom_errors
+from makeproto.disk_cache import DiskCache, disk_cache_key
+from makeproto.fingerprint import UnstableIdentity
+from makeproto.options import CompileOptions
+from makeproto.shard import ShardPolicy
+from makeproto.template import MethodTemplate, ServiceTemplate
+from tests.conftest import compiled, make_packages
+
+ROOT = Path(__file__).parent.parent
+
+
+def contents(cache: DiskCache, count: int = 4, **kwargs: object) -> List[str]:
+    return [
+        p.content for p in compiled(make_packages(count), disk_cache=cache, **kwargs)
+    ]
+
+
+def test_warm_cache_skips_compilation(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    expected = [p.content for p in compile_service(make_packages(4))]
+    assert contents(DiskCache(tmp_path)) == expected
+
+    def no_compile(*args: object, **kwargs: object) -> None:
+        raise AssertionError("compiled a cached package")
+
+    monkeypatch.setattr(build_service, "compile_service_internal", no_compile)
+    warm = DiskCache(tmp_path)
+    assert contents(warm) == expected
+    info = warm.cache_info()
+    assert (info.hits, info.misses, info.entries) == (4, 0, 4)
+
+
+def test_partial_hits_keep_input_order(tmp_path: Path) -> None:
+    cache = DiskCache(tmp_path)
+    contents(cache, count=2)
+    expected = [p.content for p in compile_service(make_packages(4))]
+    assert contents(cache, count=4) == expected
+    assert cache.cache_info().entries == 4
+
+
+def test_key_covers_options(tmp_path: Path) -> None:
+    cache = DiskCache(tmp_path)
+    contents(cache)
+    contents(cache, name_normalizer=str.upper)
+    contents(cache, renderer="native")
+    contents(cache, version=2)
+    contents(cache, shard=ShardPolicy(max_services=1))
+    assert cache.cache_info().entries == 5 * 4
+    assert cache.hits == 0
+
+
+def test_key_is_stable_across_processes() -> None:
+    script = (
+        "import sys;"
+        "from makeproto.compiler_passes import default_format, identity, no_custom_errors;"
+        "from makeproto.disk_cache import disk_cache_key;"
+        "from tests.conftest import make_packages;"
+        "sys.stdout.write(disk_cache_key(make_packages(1)['pack0'], 3, 'jinja',"
+        " identity, default_format, no_custom_errors))"
+    )
+    keys = set()
+    for seed in ("0", "1", "4242"):
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=ROOT,
+            env=dict(os.environ, PYTHONHASHSEED=seed),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        keys.add(result.stdout)
+    assert keys == {
+        disk_cache_key(
+            make_packages(1)["pack0"],
+            3,
+            "jinja",
+            identity,
+            default_format,
+            no_custom_errors,
+        )
+    }
+
+
+def make_norm(prefix: str) -> Callable[[str], str]:
+    def norm(name: str) -> str:
+        return f"{prefix}{name}"
+
+    return norm
+
+
+class Renamer:
+    def __init__(self, prefix: str) -> None:
+        self.prefix = prefix
+
+    def rename(self, name: str) -> str:
+        return f"{self.prefix}{name}"
+
+
+class PrefixPass(CompilerPass):
+    fusable = True
+    reads = frozenset({"method.name"})
+    writes = frozenset({"method.name"})
+
+    def __init__(self, prefix: str) -> None:
+        super().__init__()
+        self.prefix = prefix
+
+    def visit_service(self, block: ServiceTemplate) -> None:
+        for method in block.methods:
+            method.accept(self)
+
+    def visit_method(self, method: MethodTemplate) -> None:
+        method.name = f"{self.prefix}{method.name}"
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        lambda prefix: {"name_normalizer": make_norm(prefix)},
+        lambda prefix: {"name_normalizer": Renamer(prefix).rename},
+        lambda prefix: {"name_normalizer": functools.partial(str.__add__, prefix)},
+        lambda prefix: {"extra_passes": [PrefixPass(prefix)]},
+    ],
+)
+def test_key_covers_captured_values(
+    tmp_path: Path, kwargs: Callable[[str], Dict[str, Any]]
+) -> None:
+    cache = DiskCache(tmp_path)
+    first = contents(cache, count=1, **kwargs("A"))
+    second = contents(cache, count=1, **kwargs("B"))
+    assert "Aping0" in first[0] and "Bping0" in second[0]
+    assert cache.hits == 0
+
+
+BANNED = {"ping"}
+LOCK = threading.Lock()
+
+
+def banned_lint(func: Callable[..., Any]) -> List[str]:
+    return ["banned"] if func.__name__ in BANNED else []
+
+
+def locked_norm(name: str) -> str:
+    with LOCK:
+        return name
+
+
+def test_key_covers_read_globals(monkeypatch: pytest.MonkeyPatch) -> None:
+    def key(custompassmethod: Callable[..., Any] = banned_lint) -> str:
+        return disk_cache_key(
+            make_packages(1)["pack0"],
+            3,
+            "jinja",
+            identity,
+            default_format,
+            custompassmethod,
+        )
+
+    before = key()
+    monkeypatch.setattr(sys.modules[__name__], "BANNED", {"pong"})
+    assert key() != before
+    with pytest.raises(UnstableIdentity, match="cache_salt"):
+        key(lambda func: [locked_norm(func.__name__)][:0])
+
+
+def test_unprovable_callable_needs_salt(tmp_path: Path) -> None:
+    class Linter:
+        def __init__(self) -> None:
+            self.lock = threading.Lock()
+
+        def check(self, func: Callable[..., Any]) -> List[str]:
+            return []
+
+    cache = DiskCache(tmp_path)
+    with pytest.raises(UnstableIdentity, match="cache_salt"):
+        contents(cache, custompassmethod=Linter().check)
+    expected = contents(cache, custompassmethod=Linter().check, cache_salt="lint-1")
+    assert contents(cache, custompassmethod=Linter().check, cache_salt="lint-1") == (
+        expected
+    )
+    assert cache.hits == 4
+
+
+def test_salt_needs_a_cache() -> None:
+    with pytest.raises(ValueError):
+        compile_service(make_packages(1), options=CompileOptions(cache_salt="x"))
+
+
+def test_failures_are_not_cached(tmp_path: Path) -> None:
+    cache = DiskCache(tmp_path)
+    assert (
+        compile_service(
+            make_packages(4, broken=True), options=CompileOptions(disk_cache=cache)
+        )
+        is None
+    )
+    assert cache.cache_info().entries == 0
+
+
+def test_corrupt_entry_is_a_miss(tmp_path: Path) -> None:
+    cache = DiskCache(tmp_path)
+    expected = contents(cache, count=1)
+    for path in tmp_path.glob("*/*.json"):
+        path.write_text("{not json", encoding="utf-8")
+    assert contents(cache, count=1) == expected
+    assert contents(cache, count=1) == expected
+    assert cache.hits == 2
+
+
+def test_prune_evicts_least_recent(tmp_path: Path) -> None:
+    cache = DiskCache(tmp_path, max_bytes=250)
+    for index, key in enumerate(["aa1", "bb2", "cc3"]):
+        cache.put(key, "x" * 100)
+        os.utime(cache._path(key), (index, index))
+    assert cache.get("aa1") is not None
+
+    assert cache.prune() == 1
+    assert cache.get("bb2") is None
+    assert cache.get("aa1") is not None
+    assert cache.get("cc3") is not None
+    assert cache.cache_info().total_bytes == 200
+
+    with pytest.raises(ValueError):
+        DiskCache(tmp_path, max_bytes=0)
+
+
+def test_concurrent_writers(tmp_path: Path) -> None:
+    cache = DiskCache(tmp_path)
+    payloads = [str(i) * 10000 for i in range(10)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda data: cache.put("key", data), payloads * 4))
+    assert cache.get("key") in payloads
+    assert not list(tmp_path.glob("*/.tmp-*"))
+
+    cache.clear()
+    assert cache.cache_info().entries == 0
@@ -0,0 +1,141 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+import pytest
+
+from makeproto.build_service import compile_service, prepare_modules
+from makeproto.compiler import ErrorBudget, ErrorLimitReached
+from makeproto.compiler_passes import (
+    CompilationError,
+    make_setters,
+    make_validators,
+    run_compiler_passes,
+    run_compiler_passes_parallel,
+)
+from makeproto.interface import IService
+from makeproto.options import CompileOptions
+from tests.conftest import (
+    LabeledMethod,
+    Service,
+    compiled,
+    empty_instance,
+    make_packages,
+    ping,
+)
+
+
+def test_budget_limit() -> None:
+    budget = ErrorBudget(2)
+    budget.charge()
+    assert not budget.exhausted
+    with pytest.raises(ErrorLimitReached):
+        budget.charge()
+    assert budget.exhausted
+
+    unlimited = ErrorBudget()
+    for _ in range(10):
+        unlimited.charge()
+    assert unlimited.count == 10
+    assert not unlimited.exhausted
+
+    with pytest.raises(ValueError):
+        ErrorBudget(0)
+
+
+def test_running_error_count() -> None:
+    _, packs = prepare_modules(make_packages(4, broken=True))
+    with pytest.raises(CompilationError) as exc_info:
+        run_compiler_passes(packs, make_validators())
+    assert not exc_info.value.limit_reached
+    assert [ctx.error_count for _, ctx in packs] == [len(ctx) for _, ctx in packs]
+    assert exc_info.value.total_errors == 2 * 3
+
+
+def reported(
+    services: Dict[str, List[IService]], fuse: bool, **limits: Any
+) -> List[Tuple[str, str, str]]:
+    _, packs = prepare_modules(services)
+    with pytest.raises(CompilationError) as exc_info:
+        run_compiler_passes(packs, make_validators(), fuse, **limits)
+    assert exc_info.value.limit_reached
+    assert all(ctx.budget is None for _, ctx in packs)
+    return [
+        (ctx.name, error.code, error.location)
+        for ctx in exc_info.value.contexts
+        for report in ctx.reports.values()
+        for error in report.errors
+    ]
+
+
+@pytest.mark.parametrize("fuse", [False, True])
+@pytest.mark.parametrize(
+    "limits,expected",
+    [
+        ({"max_errors": 4}, [("pack1", "E801")] * 3 + [("pack3", "E801")]),
+        ({"fail_fast": True}, [("pack1", "E801")]),
+    ],
+)
+def test_stops_at_limit(
+    fuse: bool, limits: Dict[str, Any], expected: List[Tuple[str, str]]
+) -> None:
+    errors = reported(make_packages(6, broken=True), fuse, **limits)
+    assert [(name, code) for name, code, _ in errors] == expected
+    assert errors == reported(make_packages(6, broken=True), False, **limits)
+
+
+def test_fused_limit_follows_pass_order() -> None:
+    def services() -> Dict[str, List[IService]]:
+        bad_request = LabeledMethod(
+            name="ping", request_types=[], response_types=empty_instance, method=ping
+        )
+        no_response = LabeledMethod(
+            name="ping",
+            request_types=[empty_instance],
+            response_types=None,
+            method=ping,
+        )
+        return {
+            "p": [
+                Service(
+                    name="bad name", module="m", package="p", _methods=[bad_request]
+                )
+            ],
+            "q": [
+                Service(name="fine", module="m", package="q", _methods=[no_response])
+            ],
+        }
+
+    # the TypeValidator errors of both packages, before any name error of p
+    for fuse in (False, True):
+        errors = reported(services(), fuse, max_errors=2)
+        assert [(name, code) for name, code, _ in errors] == [
+            ("p", "E801"),
+            ("q", "E804"),
+        ]
+
+
+def test_parallel_fail_fast_skips_queued_packages() -> None:
+    _, packs = prepare_modules(make_packages(6, broken=True))
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        with pytest.raises(CompilationError) as exc_info:
+            run_compiler_passes_parallel(
+                packs,
+                lambda: [make_validators(), make_setters()],
+                executor,
+                fail_fast=True,
+            )
+    assert exc_info.value.limit_reached
+    assert exc_info.value.total_errors == 1
+
+
+def test_compile_service_max_errors(capfd: pytest.CaptureFixture[str]) -> None:
+    assert (
+        compile_service(
+            make_packages(6, broken=True), options=CompileOptions(max_errors=2)
+        )
+        is None
+    )
+    out, _ = capfd.readouterr()
+    assert out.count("E801") == 2
+
+    assert len(compiled(make_packages(2), fail_fast=True)) == 2
@@ -0,0 +1,130 @@
+from typing import Any, Callable, Dict, List, Tuple
+
+import pytest
+
+from makeproto.build_service import compile_service, prepare_modules
+from makeproto.compiler import CompilerContext, CompilerPass, FusedPass
+from makeproto.compiler_passes import (
+    CompilationError,
+    fuse_compiler_passes,
+    make_setters,
+    make_validators,
+    run_compiler_passes,
+)
+from makeproto.interface import IService
+from makeproto.options import CompileOptions
+from makeproto.template import MethodTemplate
+from tests.conftest import LabeledMethod, Service, empty_instance, ping
+
+
+def custom_check(func: Callable[..., Any]) -> List[str]:
+    return ["custom"] if func is not ping else []
+
+
+def make_broken_services(
+    request_types: List[Any],
+    comments: Any = "",
+    method: Any = ping,
+    names: Tuple[str, ...] = ("ping", "pong"),
+) -> Dict[str, List[IService]]:
+    methods = [
+        LabeledMethod(
+            name=name,
+            comments=comments,
+            request_types=request_types,
+            response_types=empty_instance,
+            method=method,
+        )
+        for name in names
+    ]
+    return {
+        "pack1": [Service(name="svc", package="pack1", _methods=methods)],
+        "pack2": [
+            Service(name="svc1", package="pack2", _methods=methods),
+            Service(name="svc2", package="pack2", comments=comments),
+        ],
+    }
+
+
+def collect_errors(
+    services: Dict[str, List[IService]], fuse: bool
+) -> List[List[Tuple[str, str, str, str]]]:
+    _, packs = prepare_modules(services)
+    with pytest.raises(CompilationError) as exc_info:
+        run_compiler_passes(packs, make_validators(custom_check), fuse)
+    return [
+        [
+            (report.name, err.code, err.message, err.location)
+            for report in ctx.reports.values()
+            for err in report.errors
+        ]
+        for ctx in exc_info.value.contexts
+    ]
+
+
+@pytest.mark.parametrize(
+    "request_types,comments,method,names",
+    [
+        ([], "", ping, ("ping", "pong")),
+        ([empty_instance], 42, ping, ("ping", "ping", "message")),
+        ([empty_instance], 42, ping, ("ping", "pong")),
+        ([empty_instance], "", lambda x: x, ("ping", "pong")),
+        ([empty_instance, empty_instance], 42, lambda x: x, ("ping", "ping")),
+    ],
+)
+def test_fused_errors_match_unfused(
+    request_types: List[Any], comments: Any, method: Any, names: Tuple[str, ...]
+) -> None:
+    args = (request_types, comments, method, names)
+    unfused = collect_errors(make_broken_services(*args), fuse=False)
+    fused = collect_errors(make_broken_services(*args), fuse=True)
+    assert fused == unfused
+    assert any(unfused)
+
+
+def test_validators_fuse_into_one_pass() -> None:
+    fused = fuse_compiler_passes(make_validators())
+    assert len(fused) == 1
+    assert isinstance(fused[0], FusedPass)
+
+    service, typeset, name, imports, comment = make_setters()
+    scheduled = fuse_compiler_passes([service, typeset, name, imports, comment])
+    assert isinstance(scheduled[0], FusedPass)
+    assert scheduled[0].passes == [service, typeset, comment]
+    assert scheduled[1:] == [name, imports]
+
+
+class CountingPass(CompilerPass):
+    fusable = True
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.methods: List[str] = []
+
+    def visit_method(self, method: MethodTemplate) -> None:
+        self.methods.append(method.name)
+
+
+def test_fused_pass_single_traversal(simple_service: Service) -> None:
+    passes = [CountingPass(), CountingPass()]
+    _, packs = prepare_modules({"": [simple_service]})
+    blocks, ctx = packs[0]
+
+    fused = FusedPass(passes)
+    fused.execute(blocks, ctx)
+    for index in range(len(passes)):
+        fused.merge(index)
+
+    names = [m.name for m in simple_service.methods]
+    assert passes[0].methods == names
+    assert passes[1].methods == names
+    assert isinstance(passes[0].ctx, CompilerContext)
+    assert passes[0].ctx is not ctx
+
+
+def test_compile_service_fused_output(simple_service: Service) -> None:
+    expected = [p.content for p in compile_service({"": [simple_service]})]
+    fused = compile_service(
+        {"": [simple_service]}, options=CompileOptions(fuse_passes=True)
+    )
+    assert [p.content for p in fused] == expected
@@ -1,6 +1,6 @@
 from typing import Any, Callable, List, Optional, Type
 
-from makeproto.template import MethodTemplate, ServiceTemplate
+from makeproto.template import MethodTemplate, ProtoTemplate, ServiceTemplate
 from tests.conftest import make_metatype_from_type
 
 
@@ -60,3 +60,58 @@ def make_method(
     )
     service.methods.append(method_template)
     return method_template
+
+
+# render-ready templates: type strings set, no type objects
+def make_render_method(
+    service: ServiceTemplate,
+    name: str,
+    comments: str = "",
+    options: Optional[List[str]] = None,
+    request_stream: bool = False,
+    response_stream: bool = False,
+) -> MethodTemplate:
+    method = MethodTemplate(
+        service=service,
+        method_func=lambda x: x,
+        name=name,
+        comments=comments,
+        options=options,  # type: ignore
+        request_types=[],
+        response_type=None,
+        request_stream=request_stream,
+        response_stream=response_stream,
+        request_str="pack.Request",
+        response_str="Response",
+    )
+    service.methods.append(method)
+    return method
+
+
+def make_render_service(name: str, comments: str = "") -> ServiceTemplate:
+    return ServiceTemplate(
+        name=name,
+        comments=comments,
+        options=[],
+        package="pack",
+        module="mod",
+        methods=[],
+    )
+
+
+def make_render_protofile(
+    services: List[ServiceTemplate],
+    comments: str = "// file comment",
+    package: str = "pack",
+    imports: Optional[List[str]] = None,
+    options: Optional[List[str]] = None,
+) -> ProtoTemplate:
+    return ProtoTemplate(
+        comments=comments,
+        syntax=3,
+        package=package,
+        module="mod",
+        imports=set(imports or []),
+        services=services,
+        options=options or [],
+    )
@@ -0,0 +1,117 @@
+import gc
+from typing import Any, Callable, List
+
+from makeproto import memoize_function
+from makeproto.fingerprint import function_identity
+from makeproto.validators.type import is_async_func, is_asyncgen_function
+from tests.conftest import compiled, make_packages
+
+
+def test_memo_reuses_results() -> None:
+    calls: List[Callable[..., Any]] = []
+
+    @memoize_function
+    def inspect_func(func: Callable[..., Any]) -> List[str]:
+        calls.append(func)
+        return [func.__name__]
+
+    def target() -> None:
+        return None
+
+    assert inspect_func(target) == ["target"]
+    assert inspect_func(target) == ["target"]
+    assert len(calls) == 1
+    info = inspect_func.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 1, 1)
+
+
+def test_memo_invalidates_on_new_code() -> None:
+    @memoize_function
+    def returns_value(func: Callable[..., Any]) -> Any:
+        return func()
+
+    def target() -> int:
+        return 1
+
+    def other() -> int:
+        return 2
+
+    assert returns_value(target) == 1
+    target.__code__ = other.__code__
+    assert returns_value(target) == 2
+    assert returns_value.cache_info().misses == 2
+
+
+def test_memo_keys_bound_methods_by_function() -> None:
+    class Servicer:
+        async def handler(self, req: Any) -> Any:
+            return req
+
+    memo = memoize_function(lambda func: func.__name__)
+    servicer, other = Servicer(), Servicer()
+    for _ in range(5):
+        assert memo(servicer.handler) == "handler"
+    memo(other.handler)
+    info = memo.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (4, 2, 2)
+
+    del servicer
+    gc.collect()
+    assert memo.cache_info().currsize == 1
+
+
+def test_memo_is_weak() -> None:
+    memo = memoize_function(lambda func: 0)
+
+    def make_target() -> Callable[[], None]:
+        def target() -> None:
+            return None
+
+        return target
+
+    target = make_target()
+    memo(target)
+    assert memo.cache_info().currsize == 1
+    del target
+    gc.collect()
+    assert memo.cache_info().currsize == 0
+
+
+def test_memo_accepts_unhashable_callables() -> None:
+    class Unhashable:
+        __hash__ = None  # type: ignore[assignment]
+
+        def __call__(self) -> None:
+            return None
+
+    memo = memoize_function(lambda func: "ok")
+    assert memo(Unhashable()) == "ok"
+    assert memo(Unhashable()) == "ok"
+    assert memo.cache_info().misses == 2
+
+
+def test_custom_pass_memoized_across_compiles() -> None:
+    calls: List[str] = []
+
+    @memoize_function
+    def custom_check(func: Callable[..., Any]) -> List[str]:
+        calls.append(func.__name__)
+        return []
+
+    for _ in range(3):
+        compiled(make_packages(2), custompassmethod=custom_check)
+    # all six methods share the same function object
+    assert calls == ["ping"]
+    assert function_identity(custom_check) == function_identity(
+        custom_check.inspect_func
+    )
+
+
+def test_is_async_func_memoized() -> None:
+    async def agen() -> Any:
+        yield 1
+
+    before = is_asyncgen_function.cache_info().hits
+    assert is_async_func(agen)
+    assert is_async_func(agen)
+    assert is_asyncgen_function.cache_info().hits == before + 1
@@ -0,0 +1,96 @@
+import asyncio
+import dataclasses
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+
+from makeproto import (
+    CompileOptions,
+    compile_descriptors,
+    compile_service,
+    compile_service_async,
+    compile_service_partial,
+)
+from makeproto.disk_cache import DiskCache
+from makeproto.render_cache import RenderCache
+from tests.conftest import compiled, make_packages
+
+
+def upper(name: str) -> str:
+    return name.upper()
+
+
+def test_options_are_frozen() -> None:
+    options = CompileOptions(extra_passes=[])
+    assert options.extra_passes == ()
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        options.version = 2  # type: ignore[misc]
+
+
+@pytest.mark.parametrize(
+    "options,message",
+    [
+        ({"max_errors": 0}, "max_errors"),
+        ({"jobs": 0}, "jobs"),
+        ({"renderer": "mako"}, "mako"),
+        ({"cache_salt": "v2"}, "cache_salt"),
+        ({"stream": True, "jobs": 2}, "parallel rendering"),
+        ({"stream": True, "render_cache": RenderCache()}, "render cache"),
+    ],
+)
+def test_invalid_combinations(options: Dict[str, Any], message: str) -> None:
+    with pytest.raises(ValueError, match=message):
+        CompileOptions(**options)
+
+
+def test_stream_rejects_disk_cache(tmp_path: Path) -> None:
+    with pytest.raises(ValueError, match="disk cache"):
+        CompileOptions(stream=True, disk_cache=DiskCache(tmp_path))
+
+
+@pytest.mark.parametrize(
+    "options", [{"jobs": 2}, {"stream": True}, {"render_cache": RenderCache()}]
+)
+def test_process_pool_rejects_render_options(options: Dict[str, Any]) -> None:
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        with pytest.raises(ValueError, match="process-pool"):
+            CompileOptions(compile_executor=pool, **options)
+
+
+def test_positional_arguments_still_work() -> None:
+    services = make_packages(2)
+    protos = compile_service(services, upper)
+    assert protos is not None
+    expected = [p.content for p in compiled(services, name_normalizer=upper)]
+    assert [p.content for p in protos] == expected
+
+    with pytest.raises(ValueError, match="name_normalizer"):
+        compile_service(services, upper, options=CompileOptions())
+
+
+def test_entry_points_reject_unused_options(tmp_path: Path) -> None:
+    services = make_packages(1)
+    with pytest.raises(ValueError, match="disk_cache"):
+        compile_service_partial(
+            services, CompileOptions(disk_cache=DiskCache(tmp_path))
+        )
+    with pytest.raises(ValueError, match="stream"):
+        compile_descriptors(services, CompileOptions(stream=True))
+
+    async def consume() -> None:
+        async for _ in compile_service_async(services, CompileOptions(jobs=2)):
+            pass  # pragma: no cover
+
+    with pytest.raises(ValueError, match="jobs"):
+        asyncio.run(consume())
+
+
+def test_thread_pool_options_match_serial() -> None:
+    services = make_packages(4)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        options = CompileOptions(compile_executor=executor, jobs=2)
+        protos = compile_service(services, options=options)
+        assert protos is not None
+        assert [p.content for p in protos] == [p.content for p in compiled(services)]
@@ -0,0 +1,211 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import pytest
+
+from makeproto.build_service import (
+    compile_service,
+    compile_service_partial,
+    prepare_modules,
+)
+from makeproto.compiler import CompilerPass
+from makeproto.compiler_passes import (
+    CompilationError,
+    make_setters,
+    make_validators,
+    run_compiler_passes_parallel,
+)
+from makeproto.interface import IService
+from makeproto.options import CompileOptions
+from makeproto.session import CompileSession
+from makeproto.template import MethodTemplate, ServiceTemplate
+from tests.conftest import LockingLinter, Service, make_packages
+
+
+def test_parallel_compile_matches_sequential() -> None:
+    expected = [(p.qual_name, p.content) for p in compile_service(make_packages(8))]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        protos = compile_service(
+            make_packages(8), options=CompileOptions(compile_executor=executor)
+        )
+        assert protos is not None
+        assert [(p.qual_name, p.content) for p in protos] == expected
+
+
+def test_parallel_compile_fused() -> None:
+    expected = [p.content for p in compile_service(make_packages(4))]
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        protos = compile_service(
+            make_packages(4),
+            options=CompileOptions(compile_executor=executor, fuse_passes=True),
+        )
+        assert [p.content for p in protos] == expected
+
+
+def test_parallel_compile_merges_errors() -> None:
+    _, packs = prepare_modules(make_packages(6, broken=True))
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        with pytest.raises(CompilationError) as exc_info:
+            run_compiler_passes_parallel(
+                packs, lambda: [make_validators(), make_setters()], executor
+            )
+    error = exc_info.value
+    assert len(error.contexts) == 6
+    assert [ctx.has_errors() for ctx in error.contexts] == [
+        i % 2 == 1 for i in range(6)
+    ]
+    assert error.total_errors == 3 * 3
+
+
+def test_parallel_compile_failure_returns_none(
+    capfd: pytest.CaptureFixture[str],
+) -> None:
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        result = compile_service(
+            make_packages(4, broken=True),
+            options=CompileOptions(compile_executor=executor),
+        )
+    assert result is None
+    out, _ = capfd.readouterr()
+    assert "E801" in out
+
+
+def test_pipeline_is_not_copied_per_package() -> None:
+    expected = [p.content for p in compile_service(make_packages(4))]
+    linter = LockingLinter()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        protos = compile_service(
+            make_packages(4),
+            options=CompileOptions(
+                custompassmethod=linter.check, compile_executor=executor
+            ),
+        )
+        assert protos is not None
+        assert [p.content for p in protos] == expected
+        result = compile_service_partial(
+            make_packages(4),
+            options=CompileOptions(
+                custompassmethod=linter.check, compile_executor=executor
+            ),
+        )
+        assert result.ok
+    CompileSession(options=CompileOptions(custompassmethod=linter.check)).compile(
+        make_packages(4)
+    )
+    # 4 packages x 3 methods, three times, all counted on the caller's object
+    assert linter.checked == 3 * 4 * 3
+
+
+class CountingPass(CompilerPass):
+    fusable = True
+    reads = frozenset({"method.name"})
+    writes = frozenset()
+
+    def __init__(self, names: Optional[List[str]] = None) -> None:
+        super().__init__()
+        self.count = 0
+        self.names = names if names is not None else []
+
+    def visit_service(self, block: ServiceTemplate) -> None:
+        for method in block.methods:
+            method.accept(self)
+
+    def visit_method(self, method: MethodTemplate) -> None:
+        self.count += 1
+        self.names.append(method.name)
+
+
+def test_serial_paths_run_the_callers_pass() -> None:
+    cpass = CountingPass()
+    assert (
+        compile_service(make_packages(2), options=CompileOptions(extra_passes=[cpass]))
+        is not None
+    )
+    assert compile_service_partial(
+        make_packages(2), options=CompileOptions(extra_passes=[cpass])
+    ).ok
+    CompileSession(options=CompileOptions(extra_passes=[cpass])).compile(
+        make_packages(2)
+    )
+    assert cpass.count == 3 * 2 * 3
+
+
+def test_concurrent_paths_take_pass_factories() -> None:
+    names: List[str] = []
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        with pytest.raises(ValueError, match="factory"):
+            compile_service(
+                make_packages(3),
+                options=CompileOptions(
+                    extra_passes=[CountingPass()], compile_executor=executor
+                ),
+            )
+        protos = compile_service(
+            make_packages(3),
+            options=CompileOptions(
+                extra_passes=[lambda: CountingPass(names)], compile_executor=executor
+            ),
+        )
+        assert protos is not None
+    assert sorted(names) == sorted(f"ping{j}" for _ in range(3) for j in range(3))
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        protos = compile_service(
+            make_packages(2),
+            options=CompileOptions(
+                extra_passes=[CountingPass], compile_executor=executor
+            ),
+        )
+        assert protos is not None
+
+
+def shared_service_name(count: int) -> Dict[str, List[IService]]:
+    packages = make_packages(count)
+    for service_list in packages.values():
+        for service in service_list:
+            service.name = "shared"
+    return packages
+
+
+def duplicated_service_name() -> Dict[str, List[IService]]:
+    packages = make_packages(1)
+    service = packages["pack0"][0]
+    packages["pack0"].append(
+        Service(
+            name=service.name,
+            module=service.module,
+            package=service.package,
+            _methods=list(service.methods),
+        )
+    )
+    return packages
+
+
+@pytest.mark.parametrize(
+    "executor_cls", [None, ThreadPoolExecutor, ProcessPoolExecutor]
+)
+def test_service_name_unique_per_package(executor_cls: Optional[type]) -> None:
+    def run(services: Dict[str, List[IService]]) -> Optional[List[str]]:
+        if executor_cls is None:
+            protos = compile_service(services)
+        else:
+            with executor_cls(max_workers=2) as executor:
+                protos = compile_service(
+                    services, options=CompileOptions(compile_executor=executor)
+                )
+        return None if protos is None else [p.qual_name for p in protos]
+
+    assert run(shared_service_name(3)) == [f"pack{i}/module{i}.proto" for i in range(3)]
+    assert run(duplicated_service_name()) is None
+
+
+def test_service_name_unique_per_package_partial_and_session() -> None:
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        assert compile_service_partial(
+            shared_service_name(3), options=CompileOptions(compile_executor=executor)
+        ).ok
+        assert not compile_service_partial(
+            duplicated_service_name(), options=CompileOptions(compile_executor=executor)
+        ).ok
+    assert compile_service_partial(shared_service_name(3)).ok
+    assert CompileSession().compile_partial(shared_service_name(3)).ok
+    assert not CompileSession().compile_partial(duplicated_service_name()).ok
@@ -0,0 +1,65 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List
+
+import pytest
+
+from makeproto.build_service import compile_service
+from makeproto.interface import IService
+from makeproto.options import CompileOptions
+from tests.conftest import LabeledMethod, Service, empty_instance, ping
+
+
+def make_modules(count: int) -> Dict[str, List[IService]]:
+    services: List[IService] = []
+    for i in range(count):
+        methods = [
+            LabeledMethod(
+                name=f"ping{j}",
+                comments=f"Ping {j}",
+                request_types=[empty_instance],
+                response_types=empty_instance,
+                method=ping,
+            )
+            for j in range(i % 4 + 1)
+        ]
+        services.append(
+            Service(
+                name=f"service{i}",
+                module=f"module{i}",
+                package="pack",
+                _methods=methods,
+            )
+        )
+    return {"pack": services}
+
+
+def render_all(**kwargs: object) -> List[tuple]:
+    options = CompileOptions(**kwargs)  # type: ignore[arg-type]
+    protos = compile_service(make_modules(12), options=options)
+    assert protos is not None
+    return [(p.filename, p.content) for p in protos]
+
+
+@pytest.mark.parametrize("renderer", ["jinja", "native"])
+def test_jobs_matches_sequential(renderer: str) -> None:
+    expected = render_all(renderer=renderer)
+    assert [name for name, _ in expected] == [f"module{i}" for i in range(12)]
+    assert render_all(renderer=renderer, jobs=4) == expected
+
+
+def test_thread_pool_executor() -> None:
+    expected = render_all()
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        assert render_all(render_executor=executor, jobs=2) == expected
+
+
+@pytest.mark.parametrize("renderer", ["jinja", "native"])
+def test_process_pool_executor(renderer: str) -> None:
+    expected = render_all(renderer=renderer)
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        assert render_all(renderer=renderer, render_executor=executor) == expected
+
+
+def test_stream_with_jobs_rejected() -> None:
+    with pytest.raises(ValueError, match="stream=True"):
+        compile_service(make_modules(1), options=CompileOptions(stream=True, jobs=2))
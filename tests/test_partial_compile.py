@@ -0,0 +1,55 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+import pytest
+
+from makeproto import CompileResult, compile_service, compile_service_partial
+from makeproto.compiler import list_ctx_error_code
+from makeproto.options import CompileOptions
+from tests.conftest import compiled, make_packages
+
+
+def check_result(result: CompileResult) -> None:
+    assert not result.ok
+    assert [ctx.name for ctx in result.failed] == ["pack1", "pack3", "pack5"]
+    assert all(list_ctx_error_code(ctx) == ["E801"] * 3 for ctx in result.failed)
+    packages = list(result.packages)
+    assert [p.package for p in packages] == ["pack0", "pack2", "pack4"]
+    healthy = compiled(make_packages(6))[::2]
+    assert [p.content for p in packages] == [p.content for p in healthy]
+
+
+def test_partial_emits_healthy_packages() -> None:
+    check_result(compile_service_partial(make_packages(6, broken=True)))
+
+
+@pytest.mark.parametrize("executor_cls", [ThreadPoolExecutor, ProcessPoolExecutor])
+def test_partial_with_compile_executor(executor_cls: type) -> None:
+    with executor_cls(max_workers=2) as executor:
+        check_result(
+            compile_service_partial(
+                make_packages(6, broken=True),
+                options=CompileOptions(compile_executor=executor),
+            )
+        )
+
+
+@pytest.mark.parametrize("max_errors", [None, 1])
+def test_partial_error_limit_is_per_package(max_errors: Optional[int]) -> None:
+    result = compile_service_partial(
+        make_packages(4, broken=True),
+        options=CompileOptions(max_errors=max_errors, fuse_passes=True),
+    )
+    expected = 3 if max_errors is None else max_errors
+    assert [len(ctx) for ctx in result.failed] == [expected, expected]
+    assert len(list(result.packages)) == 2
+
+
+def test_partial_all_healthy() -> None:
+    result = compile_service_partial(
+        make_packages(3), options=CompileOptions(stream=True)
+    )
+    assert result.ok
+    assert [p.content for p in result.packages] == [
+        p.content for p in compile_service(make_packages(3))
+    ]
@@ -0,0 +1,106 @@
+from typing import List
+
+import pytest
+
+from makeproto.build_service import compile_service
+from makeproto.compiler import CompilerPass, FusedPass
+from makeproto.compiler_passes import (
+    PassOrderError,
+    PassScheduler,
+    make_setters,
+    make_validators,
+)
+from makeproto.options import CompileOptions
+from makeproto.template import MethodTemplate, ServiceTemplate
+from tests.conftest import Service
+
+
+class RequestStrPass(CompilerPass):
+    fusable = True
+    reads = frozenset({"method.name", "method.request_str"})
+    writes = frozenset()
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.seen: List[str] = []
+
+    def visit_service(self, block: ServiceTemplate) -> None:
+        for field in block.methods:
+            field.accept(self)
+
+    def visit_method(self, method: MethodTemplate) -> None:
+        self.seen.append(f"{method.name}:{method.request_str}")
+
+
+class UndeclaredPass(CompilerPass):
+    def visit_service(self, block: ServiceTemplate) -> None:
+        return
+
+
+def test_validators_share_one_stage() -> None:
+    validators = make_validators()
+    assert PassScheduler(validators).stages() == [validators]
+
+
+def test_setters_stages() -> None:
+    service, typeset, name, imports, comment = make_setters()
+    stages = PassScheduler([service, typeset, name, imports, comment]).stages()
+    assert stages == [[service, typeset, comment], [name], [imports]]
+
+
+def test_register_rejects_unwritten_reads() -> None:
+    scheduler = PassScheduler()
+    with pytest.raises(PassOrderError, match="method.request_str"):
+        scheduler.register(RequestStrPass())
+    assert scheduler.passes == []
+
+
+def test_register_after_writer() -> None:
+    setters = make_setters()
+    extra = RequestStrPass()
+    scheduler = PassScheduler(setters)
+    scheduler.register(extra)
+    # reads method.name, so it lands after NameSetter, next to ImportsSetter
+    assert scheduler.stages()[2] == [setters[3], extra]
+
+
+def test_undeclared_pass_is_a_barrier() -> None:
+    service, typeset, name, imports, comment = make_setters()
+    barrier = UndeclaredPass()
+    scheduler = PassScheduler([service, barrier, typeset, RequestStrPass()])
+    stages = scheduler.stages()
+    assert stages[:3] == [[service], [barrier], [typeset]]
+
+    scheduled = PassScheduler([service, typeset, comment]).schedule()
+    assert len(scheduled) == 1
+    assert isinstance(scheduled[0], FusedPass)
+
+
+@pytest.mark.parametrize("fuse_passes", [False, True])
+def test_compile_service_extra_passes(
+    simple_service: Service, fuse_passes: bool
+) -> None:
+    extra = RequestStrPass()
+    expected = [p.content for p in compile_service({"": [simple_service]})]
+    protos = compile_service(
+        {"": [simple_service]},
+        options=CompileOptions(
+            name_normalizer=str.upper, fuse_passes=fuse_passes, extra_passes=[extra]
+        ),
+    )
+    assert protos is not None
+    assert len([p.content for p in protos]) == len(expected)
+    assert extra.seen
+    assert all(seen.split(":")[0].isupper() for seen in extra.seen)
+    assert all(not seen.endswith(":") for seen in extra.seen)
+
+
+def test_compile_service_rejects_bad_extra_pass(simple_service: Service) -> None:
+    class MissingFieldReader(RequestStrPass):
+        reads = frozenset({"module.missing"})
+
+    with pytest.raises(PassOrderError):
+        compile_service(
+            {"": [simple_service]},
+            options=CompileOptions(extra_passes=[MissingFieldReader()]),
+        )
@@ -0,0 +1,140 @@
+import asyncio
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List
+
+import pytest
+from google.protobuf.empty_pb2 import Empty
+
+from makeproto import compile_service_async
+from makeproto.build_service import compile_service, compile_service_partial
+from makeproto.options import CompileOptions
+from makeproto.portable import PortableFunction, make_portable_service
+from makeproto.validators.type import is_async_func
+from tests.conftest import (
+    Service,
+    compiled,
+    make_metatype_from_type,
+    make_packages,
+    ping_server_stream,
+)
+
+
+def upper(name: str) -> str:
+    return name.upper()
+
+
+@pytest.fixture(scope="module")
+def executor() -> ProcessPoolExecutor:
+    with ProcessPoolExecutor(max_workers=2) as pool:
+        yield pool
+
+
+def test_portable_service_is_picklable(simple_service: Service) -> None:
+    portable = make_portable_service(simple_service, lambda func: ["checked"])
+    restored = pickle.loads(pickle.dumps(portable))
+
+    assert [m.name for m in restored.methods] == [
+        m.name for m in simple_service.methods
+    ]
+    funcs = [m.method for m in restored.methods]
+    assert all(isinstance(func, PortableFunction) for func in funcs)
+    assert [is_async_func(func) for func in funcs] == [
+        is_async_func(m.method) for m in simple_service.methods
+    ]
+    assert funcs[0].custom_errors == ["checked"]
+    request = restored.methods[0].request_types[0]
+    assert request.basetype == restored.methods[1].request_types[0].basetype
+    assert request.basetype.__name__ == "Empty"
+
+
+@pytest.mark.parametrize("renderer", ["jinja", "native"])
+def test_process_compile_matches_in_process(
+    executor: ProcessPoolExecutor, renderer: str
+) -> None:
+    kwargs: Any = dict(renderer=renderer, name_normalizer=upper)
+    expected = [
+        (p.qual_name, p.content)
+        for p in compile_service(make_packages(6), options=CompileOptions(**kwargs))
+    ]
+    protos = compiled(make_packages(6), compile_executor=executor, **kwargs)
+    assert [(p.qual_name, p.content) for p in protos] == expected
+
+
+def test_process_compile_simple_service(
+    executor: ProcessPoolExecutor, simple_service: Service
+) -> None:
+    expected = [p.content for p in compile_service({"": [simple_service]})]
+    protos = compile_service(
+        {"": [simple_service]},
+        options=CompileOptions(compile_executor=executor, fuse_passes=True),
+    )
+    assert [p.content for p in protos] == expected
+
+
+def custom_check(func: Callable[..., Any]) -> List[str]:
+    return ["custom failure"] if is_async_func(func) else []
+
+
+def test_process_compile_reports_errors(
+    executor: ProcessPoolExecutor, capfd: pytest.CaptureFixture[str]
+) -> None:
+    broken = make_packages(4, broken=True)
+    assert (
+        compile_service(broken, options=CompileOptions(compile_executor=executor))
+        is None
+    )
+    out, _ = capfd.readouterr()
+    assert "E801" in out
+
+    packages = make_packages(2)
+    method = packages["pack0"][0].methods[0]
+    method.method = ping_server_stream
+    method.response_types = make_metatype_from_type(AsyncIterator[Empty])
+    result = compile_service(
+        packages,
+        options=CompileOptions(
+            compile_executor=executor, custompassmethod=custom_check
+        ),
+    )
+    assert result is None
+    out, _ = capfd.readouterr()
+    assert "E902" in out
+
+
+def test_process_compile_rejects_render_options(executor: ProcessPoolExecutor) -> None:
+    with pytest.raises(ValueError, match="process-pool"):
+        compile_service(
+            make_packages(1),
+            options=CompileOptions(compile_executor=executor, stream=True),
+        )
+
+
+class NoSubmitExecutor(ProcessPoolExecutor):
+    def submit(self, *args: Any, **kwargs: Any) -> Any:
+        raise AssertionError("submitted a package")
+
+
+@pytest.mark.parametrize(
+    "kwargs,argument",
+    [
+        ({"name_normalizer": lambda name: name.upper()}, "name_normalizer"),
+        ({"format_comment": lambda text: text}, "format_comment"),
+    ],
+)
+def test_process_compile_rejects_unpicklable(
+    kwargs: Dict[str, Any], argument: str
+) -> None:
+    with NoSubmitExecutor(max_workers=1) as pool:
+        options = CompileOptions(compile_executor=pool, **kwargs)
+        with pytest.raises(ValueError, match=argument):
+            compile_service(make_packages(2), options=options)
+        with pytest.raises(ValueError, match=argument):
+            compile_service_partial(make_packages(2), options)
+
+        async def consume() -> None:
+            async for _ in compile_service_async(make_packages(2), options):
+                pass  # pragma: no cover
+
+        with pytest.raises(ValueError, match=argument):
+            asyncio.run(consume())
@@ -0,0 +1,87 @@
+import sys
+from pathlib import Path
+
+import pytest
+from google.protobuf import descriptor_pb2
+
+from makeproto.protoc import ProtocError, python_stub_names, run_protoc
+from tests.conftest import compiled, make_packages
+
+
+def test_single_protoc_run(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    from grpc_tools import protoc
+
+    calls = []
+    main = protoc.main
+
+    def counting_main(args):  # type: ignore[no-untyped-def]
+        calls.append(args)
+        return main(args)
+
+    monkeypatch.setattr(protoc, "main", counting_main)
+    packages = compiled(make_packages(3))
+    result = run_protoc(
+        packages, tmp_path / "out", descriptor_set_out=tmp_path / "set.pb"
+    )
+
+    assert len(calls) == 1
+    assert sorted(result.files) == sorted(p.qual_name for p in packages)
+    assert result.generated
+    for name in result.generated:
+        assert (tmp_path / "out" / name).is_file()
+
+    assert result.descriptor_set is not None
+    descriptors = descriptor_pb2.FileDescriptorSet.FromString(result.descriptor_set)
+    names = {f.name for f in descriptors.file}
+    assert set(result.files) <= names
+
+
+def test_descriptor_set_only(tmp_path: Path) -> None:
+    result = run_protoc(
+        compiled(make_packages(3)),
+        descriptor_set_out=tmp_path / "set.pb",
+        include_imports=False,
+    )
+    descriptors = descriptor_pb2.FileDescriptorSet.FromString(result.descriptor_set)  # type: ignore[arg-type]
+    assert sorted(f.name for f in descriptors.file) == sorted(result.files)
+    assert result.generated == []
+
+
+def test_stub_names() -> None:
+    assert python_stub_names("pack/my-api.proto") == [
+        "pack/my_api_pb2.py",
+        "pack/my_api_pb2_grpc.py",
+    ]
+    assert python_stub_names("a.proto", grpc_out=False) == ["a_pb2.py"]
+    assert python_stub_names("p/v1.api.proto", grpc_out=False) == ["p/v1/api_pb2.py"]
+
+
+def test_dotted_module_stubs(tmp_path: Path) -> None:
+    services = make_packages(1)
+    services["pack0"][0].module = "v1.api"
+    result = run_protoc(compiled(services), tmp_path)
+    assert result.generated == ["pack0/v1/api_pb2.py", "pack0/v1/api_pb2_grpc.py"]
+    for name in result.generated:
+        assert (tmp_path / name).is_file()
+
+
+def test_needs_an_output(tmp_path: Path) -> None:
+    with pytest.raises(ValueError):
+        run_protoc(compiled(make_packages(3)))
+
+
+def test_protoc_failure(tmp_path: Path) -> None:
+    class Broken:
+        qual_name = "broken.proto"
+        content = 'syntax = "proto3";\nmessage {'
+        depends: list = []
+
+    with pytest.raises(ProtocError) as exc:
+        run_protoc([Broken()], descriptor_set_out=tmp_path / "set.pb")  # type: ignore[list-item]
+    assert exc.value.files == ["broken.proto"]
+
+
+def test_missing_grpc_tools(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setitem(sys.modules, "grpc_tools", None)
+    with pytest.raises(ImportError, match=r"makeproto\[protoc\]"):
+        run_protoc(compiled(make_packages(3)), descriptor_set_out="unused.pb")
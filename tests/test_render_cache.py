@@ -0,0 +1,115 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from makeproto.build_service import compile_service
+from makeproto.options import CompileOptions
+from makeproto.render_cache import RenderCache, render_key
+from tests.conftest import Service
+from tests.test_helpers import (
+    make_render_method,
+    make_render_protofile,
+    make_render_service,
+)
+
+
+def test_lru_evicts_by_entries() -> None:
+    cache = RenderCache(max_entries=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    assert cache.get("a") == "A"
+    cache.put("c", "C")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+    assert len(cache) == 2
+
+
+def test_lru_evicts_by_bytes() -> None:
+    content = "x" * 100
+    size = sys.getsizeof(content)
+    cache = RenderCache(max_bytes=size * 2)
+    cache.put("a", content)
+    cache.put("b", content)
+    cache.put("c", content)
+
+    info = cache.cache_info()
+    assert info.entries == 2
+    assert info.total_bytes == size * 2
+    assert cache.get("a") is None
+
+    cache.put("huge", "x" * (size * 3))
+    assert cache.get("huge") is None
+
+
+def test_invalid_limits() -> None:
+    with pytest.raises(ValueError):
+        RenderCache(max_entries=0)
+
+
+def test_render_key_changes_with_input() -> None:
+    service = make_render_service("svc")
+    method = make_render_method(service, "m1")
+    template = make_render_protofile([service])
+
+    key = render_key(template, "jinja")
+    assert key == render_key(template, "jinja")
+    assert key != render_key(template, "native")
+
+    method.comments = "// changed"
+    assert key != render_key(template, "jinja")
+
+
+def test_compile_service_uses_cache(simple_service: Service) -> None:
+    cache = RenderCache()
+    first = [
+        p.content
+        for p in compile_service(
+            {"": [simple_service]}, options=CompileOptions(render_cache=cache)
+        )
+    ]
+    assert cache.cache_info().misses == 1
+    assert cache.cache_info().hits == 0
+
+    second = [
+        p.content
+        for p in compile_service(
+            {"": [simple_service]}, options=CompileOptions(render_cache=cache)
+        )
+    ]
+    assert second == first
+    assert cache.cache_info().hits == 1
+
+    simple_service.comments = "Changed comment"
+    third = [
+        p.content
+        for p in compile_service(
+            {"": [simple_service]}, options=CompileOptions(render_cache=cache)
+        )
+    ]
+    assert third != first
+    assert cache.cache_info().misses == 2
+
+
+def test_cache_with_parallel_render(simple_service: Service) -> None:
+    cache = RenderCache()
+    services = {"": [simple_service]}
+    expected = [p.content for p in compile_service(services)]
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        for _ in range(2):
+            protos = compile_service(
+                services,
+                options=CompileOptions(render_executor=executor, render_cache=cache),
+            )
+            assert [p.content for p in protos] == expected
+    assert cache.cache_info().hits == 1
+
+
+def test_stream_with_cache_rejected(simple_service: Service) -> None:
+    with pytest.raises(ValueError, match="render cache"):
+        compile_service(
+            {"": [simple_service]},
+            options=CompileOptions(stream=True, render_cache=RenderCache()),
+        )
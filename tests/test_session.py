@@ -0,0 +1,173 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+
+from makeproto import CompileSession
+from makeproto.disk_cache import DiskCache
+from makeproto.fingerprint import function_identity, package_fingerprint
+from makeproto.interface import IService
+from makeproto.options import CompileOptions
+from makeproto.render_cache import RenderCache
+from tests.conftest import (
+    LabeledMethod,
+    Service,
+    compiled,
+    empty_instance,
+    make_packages,
+    ping,
+)
+
+
+def contents(services: Dict[str, List[IService]]) -> List[str]:
+    return [p.content for p in compiled(services)]
+
+
+def test_session_reuses_unchanged_packages() -> None:
+    session = CompileSession()
+    first = session.compile(make_packages(4))
+    assert first is not None
+    assert [p.content for p in first] == contents(make_packages(4))
+
+    second = session.compile(make_packages(4))
+    assert second is not None
+    assert [p.content for p in second] == contents(make_packages(4))
+    info = session.session_info()
+    assert (info.hits, info.misses, info.packages) == (4, 4, 4)
+
+
+def test_session_recompiles_changed_package() -> None:
+    session = CompileSession()
+    session.compile(make_packages(3))
+
+    services = make_packages(3)
+    services["pack1"][0].methods[0].name = "renamed"
+    protos = session.compile(services)
+    assert protos is not None
+    content = [p.content for p in protos]
+    assert content == contents(services)
+    assert content != contents(make_packages(3))
+    info = session.session_info()
+    assert (info.hits, info.misses) == (2, 4)
+
+
+def test_session_drops_removed_packages() -> None:
+    session = CompileSession()
+    session.compile(make_packages(3))
+    services = make_packages(3)
+    del services["pack2"]
+    protos = session.compile(services)
+    assert protos is not None
+    assert len(list(protos)) == 2
+    assert session.session_info().packages == 2
+
+
+def test_session_keeps_failures(capfd: pytest.CaptureFixture[str]) -> None:
+    session = CompileSession()
+    assert session.compile(make_packages(2, broken=True)) is None
+    result = session.compile_partial(make_packages(2, broken=True))
+    assert [ctx.name for ctx in result.failed] == ["pack1"]
+    assert len(list(result.packages)) == 1
+    assert session.session_info().hits == 2
+    out, _ = capfd.readouterr()
+    assert "E801" in out
+
+
+def test_session_rerenders_changed_modules_only() -> None:
+    def make_services(comment: str) -> Dict[str, List[IService]]:
+        method = LabeledMethod(
+            name="ping",
+            request_types=[empty_instance],
+            response_types=empty_instance,
+            method=ping,
+        )
+        return {
+            "pack": [
+                Service(name="s1", module="mod1", package="pack", _methods=[method]),
+                Service(
+                    name="s2",
+                    module="mod2",
+                    package="pack",
+                    comments=comment,
+                    _methods=[method],
+                ),
+            ]
+        }
+
+    cache = RenderCache()
+    session = CompileSession(options=CompileOptions(render_cache=cache))
+    session.compile(make_services("first"))
+    protos = session.compile(make_services("second"))
+    assert protos is not None
+    assert "second" in [p.content for p in protos][1]
+    info = cache.cache_info()
+    assert (info.hits, info.misses) == (1, 3)
+
+    session.invalidate()
+    assert cache.cache_info().entries == 0
+    assert session.session_info().packages == 0
+
+
+def test_function_identity_tracks_code() -> None:
+    def first(x: Any) -> Any:
+        return x
+
+    def second(x: Any) -> Any:
+        return [x]
+
+    def third(x: Any) -> Any:
+        return x
+
+    assert function_identity(first)[1:] == function_identity(third)[1:]
+    assert function_identity(first)[1:] != function_identity(second)[1:]
+
+
+def test_package_fingerprint() -> None:
+    services = make_packages(2)
+    assert package_fingerprint(services["pack0"]) == package_fingerprint(
+        make_packages(2)["pack0"]
+    )
+    assert package_fingerprint(services["pack0"]) != package_fingerprint(
+        services["pack1"]
+    )
+    assert package_fingerprint(services["pack0"], "a") != package_fingerprint(
+        services["pack0"], "b"
+    )
+
+
+@pytest.mark.parametrize("limits", [{"max_errors": 1}, {"fail_fast": True}])
+def test_session_error_limits(limits: Dict[str, Any]) -> None:
+    unlimited = CompileSession().compile_partial(make_packages(3, broken=True))
+    assert [ctx.error_count for ctx in unlimited.failed] == [3]
+
+    session = CompileSession(CompileOptions(**limits))
+    result = session.compile_partial(make_packages(3, broken=True))
+    assert [ctx.error_count for ctx in result.failed] == [1]
+    assert len(list(result.packages)) == 2
+
+
+def test_session_compiles_on_executor() -> None:
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        session = CompileSession(CompileOptions(compile_executor=executor))
+        first = session.compile(make_packages(4))
+        assert first is not None
+        assert [p.content for p in first] == contents(make_packages(4))
+
+        services = make_packages(4)
+        services["pack2"][0].methods[0].name = "renamed"
+        second = session.compile(services)
+        assert second is not None
+        assert [p.content for p in second] == contents(services)
+    info = session.session_info()
+    assert (info.hits, info.misses) == (3, 5)
+
+
+def test_session_rejects_unsupported_options(tmp_path: Path) -> None:
+    with pytest.raises(ValueError, match="stream"):
+        CompileSession(CompileOptions(stream=True))
+    with pytest.raises(ValueError, match="disk_cache"):
+        CompileSession(CompileOptions(disk_cache=DiskCache(tmp_path)))
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        with pytest.raises(ValueError, match="thread pool"):
+            CompileSession(CompileOptions(compile_executor=pool))
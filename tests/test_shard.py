@@ -0,0 +1,236 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List
+
+import pytest
+from google.protobuf.timestamp_pb2 import Timestamp
+
+from makeproto import (
+    CompileSession,
+    compile_service,
+    compile_service_async,
+    compile_service_partial,
+)
+from makeproto.descriptor import build_descriptor_set, compile_descriptors
+from makeproto.interface import IProtoPackage, IService
+from makeproto.options import CompileOptions
+from makeproto.protoc import run_protoc
+from makeproto.shard import ShardPolicy, shard_templates
+from makeproto.template import ProtoTemplate
+from tests.conftest import (
+    LabeledMethod,
+    Service,
+    compiled,
+    empty_instance,
+    get_package,
+    get_protofile_path,
+    make_metatype_from_type,
+    ping,
+)
+
+Timestamp.package = get_package(Timestamp)
+Timestamp.proto_path = get_protofile_path(Timestamp)
+timestamp_instance = make_metatype_from_type(Timestamp)
+
+
+def big_module(count: int, module: str = "big") -> Dict[str, List[IService]]:
+    services: List[IService] = []
+    for i in range(count):
+        # odd services only use Timestamp, even ones only Empty
+        metatype = timestamp_instance if i % 2 else empty_instance
+        methods = [
+            LabeledMethod(
+                name=f"call{j}",
+                request_types=[metatype],
+                response_types=metatype,
+                method=ping,
+            )
+            for j in range(2)
+        ]
+        services.append(
+            Service(name=f"service{i}", module=module, package="pack", _methods=methods)
+        )
+    return {"pack": services}
+
+
+def by_name(services: Any, **kwargs: Any) -> Dict[str, IProtoPackage]:
+    return {proto.qual_name: proto for proto in compiled(services, **kwargs)}
+
+
+def test_shard_by_service_count() -> None:
+    protos = by_name(big_module(7), shard=ShardPolicy(max_services=3))
+    assert list(protos) == ["pack/big_1.proto", "pack/big_2.proto", "pack/big_3.proto"]
+    assert [protos[name].content.count("service ") for name in protos] == [3, 3, 1]
+    assert "service service6 {" in protos["pack/big_3.proto"].content
+
+
+def test_shards_get_their_own_imports() -> None:
+    protos = by_name(big_module(4), shard=ShardPolicy(max_services=1))
+    assert protos["pack/big_1.proto"].depends == {"google/protobuf/empty.proto"}
+    assert protos["pack/big_2.proto"].depends == {"google/protobuf/timestamp.proto"}
+    assert "timestamp.proto" not in protos["pack/big_1.proto"].content
+
+
+def test_shard_by_bytes() -> None:
+    whole = by_name(big_module(10))["pack/big.proto"].content
+    protos = by_name(big_module(10), shard=ShardPolicy(max_bytes=len(whole) // 3))
+    assert len(protos) > 2
+    contents = "".join(proto.content for proto in protos.values())
+    for i in range(10):
+        assert contents.count(f"service service{i} {{") == 1
+
+
+def test_small_modules_are_untouched() -> None:
+    expected = by_name(big_module(3))
+    protos = by_name(big_module(3), shard=ShardPolicy(max_services=3, aggregator=True))
+    assert {n: p.content for n, p in protos.items()} == {
+        n: p.content for n, p in expected.items()
+    }
+
+
+@pytest.mark.parametrize("renderer", ["jinja", "native"])
+def test_aggregator_reexports_shards(renderer: str) -> None:
+    protos = by_name(
+        big_module(5),
+        shard=ShardPolicy(max_services=2, aggregator=True),
+        renderer=renderer,
+    )
+    aggregator = protos["pack/big.proto"]
+    shards = ["pack/big_1.proto", "pack/big_2.proto", "pack/big_3.proto"]
+    assert aggregator.depends == set(shards)
+    for name in shards:
+        assert f'import public "{name}";' in aggregator.content
+    assert "service " not in aggregator.content
+
+
+def test_sharded_output_compiles(tmp_path: Path) -> None:
+    protos = by_name(big_module(5), shard=ShardPolicy(max_services=2, aggregator=True))
+    result = run_protoc(
+        protos.values(), tmp_path / "out", descriptor_set_out=tmp_path / "set.pb"
+    )
+    assert sorted(result.files) == sorted(protos)
+
+
+def test_descriptor_aggregator() -> None:
+    template = ProtoTemplate(
+        comments="",
+        syntax=3,
+        package="pack",
+        module="big",
+        imports=set(),
+        services=[],
+        options=[],
+        public_imports={"pack/big_1.proto", "pack/big_2.proto"},
+    )
+    proto = build_descriptor_set([template], include_imports=False).file[0]
+    assert list(proto.dependency) == ["pack/big_1.proto", "pack/big_2.proto"]
+    assert list(proto.public_dependency) == [0, 1]
+
+
+def test_process_pool_shards() -> None:
+    expected = by_name(big_module(5), shard=ShardPolicy(max_services=2))
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        protos = by_name(
+            big_module(5),
+            shard=ShardPolicy(max_services=2),
+            compile_executor=executor,
+        )
+    assert {n: p.content for n, p in protos.items()} == {
+        n: p.content for n, p in expected.items()
+    }
+
+
+def test_unique_file_options_per_shard() -> None:
+    services = big_module(5)
+    for service in services["pack"]:
+        service.module_level_options = [
+            'java_outer_classname = "BigProto"',
+            'java_package = "com.pack"',
+        ]
+    policy = ShardPolicy(max_services=2, aggregator=True)
+    descriptor_set = compile_descriptors(services, options=CompileOptions(shard=policy))
+    assert descriptor_set is not None
+    options = {
+        proto.name: (proto.options.java_outer_classname, proto.options.java_package)
+        for proto in descriptor_set.file
+        if proto.name.startswith("pack/")
+    }
+    assert options == {
+        "pack/big_1.proto": ("BigProto1", "com.pack"),
+        "pack/big_2.proto": ("BigProto2", "com.pack"),
+        "pack/big_3.proto": ("BigProto3", "com.pack"),
+        "pack/big.proto": ("BigProto", "com.pack"),
+    }
+
+    services["pack"][0].module_level_options = ["java_outer_classname = BigProto"]
+    with pytest.raises(ValueError, match="java_outer_classname"):
+        compile_service(services, options=CompileOptions(shard=policy))
+
+
+def test_shard_on_every_entry_point() -> None:
+    policy = ShardPolicy(max_services=2, aggregator=True)
+    expected = {n: p.content for n, p in by_name(big_module(5), shard=policy).items()}
+
+    def contents(protos: Any) -> Dict[str, str]:
+        return {proto.qual_name: proto.content for proto in protos}
+
+    async def collect() -> List[IProtoPackage]:
+        return [
+            p
+            async for p in compile_service_async(
+                big_module(5), options=CompileOptions(shard=policy)
+            )
+        ]
+
+    result = compile_service_partial(
+        big_module(5), options=CompileOptions(shard=policy)
+    )
+    assert contents(result.packages) == expected
+    session = CompileSession(options=CompileOptions(shard=policy))
+    assert contents(session.compile_partial(big_module(5)).packages) == expected
+    assert contents(asyncio.run(collect())) == expected
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        result = compile_service_partial(
+            big_module(5),
+            options=CompileOptions(shard=policy, compile_executor=executor),
+        )
+        assert contents(result.packages) == expected
+
+    descriptor_set = compile_descriptors(
+        big_module(5), options=CompileOptions(shard=policy)
+    )
+    assert descriptor_set is not None
+    names = [proto.name for proto in descriptor_set.file]
+    assert sorted(name for name in names if name.startswith("pack/")) == sorted(
+        expected
+    )
+
+
+def test_shard_name_collision() -> None:
+    services = big_module(4)
+    services["pack"].append(
+        Service(
+            name="other",
+            module="big_1",
+            package="pack",
+            _methods=list(services["pack"][0].methods),
+        )
+    )
+    with pytest.raises(ValueError, match="big_1"):
+        compile_service(
+            services, options=CompileOptions(shard=ShardPolicy(max_services=2))
+        )
+
+
+def test_no_policy_is_identity() -> None:
+    templates: List[ProtoTemplate] = []
+    assert shard_templates(templates, None) is templates
+
+
+@pytest.mark.parametrize(
+    "kwargs", [{}, {"max_services": 0}, {"max_bytes": -1}, {"aggregator": True}]
+)
+def test_invalid_policy(kwargs: Dict[str, Any]) -> None:
+    with pytest.raises(ValueError):
+        ShardPolicy(**kwargs)
@@ -0,0 +1,78 @@
+import io
+import socket
+from pathlib import Path
+
+import pytest
+
+from makeproto.build_service import StreamingProtoPackage, compile_service
+from makeproto.options import CompileOptions
+from tests.conftest import Service
+
+
+def make_services(simple_service: Service) -> dict:
+    service2 = Service(name="service_2", comments="Service2", module="protofile1")
+    return {"": [simple_service, service2]}
+
+
+@pytest.mark.parametrize("renderer", ["jinja", "native"])
+def test_stream_matches_content(simple_service: Service, renderer: str) -> None:
+    services = make_services(simple_service)
+    expected = [
+        p.content
+        for p in compile_service(services, options=CompileOptions(renderer=renderer))
+    ]
+
+    streamed = list(
+        compile_service(
+            services, options=CompileOptions(renderer=renderer, stream=True)
+        )
+    )
+    assert all(isinstance(p, StreamingProtoPackage) for p in streamed)
+    assert [p.content for p in streamed] == expected
+    assert ["".join(p.iter_content()) for p in streamed] == expected
+
+
+def test_native_stream_is_chunked(simple_service: Service) -> None:
+    services = make_services(simple_service)
+    (package,) = compile_service(
+        services, options=CompileOptions(renderer="native", stream=True)
+    )
+    chunks = list(package.iter_content())
+    assert len(chunks) > len(simple_service.methods)
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_write_to_sinks(simple_service: Service, tmp_path: Path, stream: bool) -> None:
+    services = make_services(simple_service)
+    (package,) = compile_service(services, options=CompileOptions(stream=stream))
+    content = package.content
+
+    text = io.StringIO()
+    assert package.write_to(text) == len(content)
+    assert text.getvalue() == content
+
+    binary = io.BytesIO()
+    package.write_to(binary)
+    assert binary.getvalue() == content.encode("utf-8")
+
+    file_path = tmp_path / package.qual_name
+    with open(file_path, "wb") as f:
+        package.write_to(f)
+    assert file_path.read_text(encoding="utf-8") == content
+
+
+def test_write_to_socket(simple_service: Service) -> None:
+    services = make_services(simple_service)
+    (package,) = compile_service(
+        services, options=CompileOptions(renderer="native", stream=True)
+    )
+    expected = package.content.encode("utf-8")
+
+    left, right = socket.socketpair()
+    with left, right:
+        sent = package.write_to(left)
+        left.shutdown(socket.SHUT_WR)
+        received = b""
+        while len(received) < sent:
+            received += right.recv(65536)
+    assert received == expected
@@ -0,0 +1,164 @@
+import json
+import os
+import stat
+from pathlib import Path
+from typing import Optional
+
+import pytest
+
+import makeproto.writer as writer
+from makeproto import compile_service_partial, write_protos
+from makeproto.build_service import ProtoPackage
+from makeproto.writer import MANIFEST_NAME, read_manifest
+from tests.conftest import compiled, make_packages
+
+
+@pytest.mark.parametrize("jobs", [None, 1, 4])
+def test_write_protos_layout(tmp_path: Path, jobs: Optional[int]) -> None:
+    packages = compiled(make_packages(4))
+    result = write_protos(packages, tmp_path, jobs=jobs)
+    assert result.written == [p.qual_name for p in packages]
+    assert result.unchanged == []
+    for package in packages:
+        path = tmp_path / package.qual_name
+        assert path.read_text(encoding="utf-8") == package.content
+    assert not list(tmp_path.rglob("*.tmp"))
+
+
+def test_unchanged_files_keep_mtime(tmp_path: Path) -> None:
+    packages = compiled(make_packages(2))
+    write_protos(packages, tmp_path)
+    paths = [tmp_path / p.qual_name for p in packages]
+    for path in paths:
+        os.utime(path, (1000, 1000))
+
+    changed = ProtoPackage(
+        packages[1].package,
+        packages[1].filename,
+        packages[1].content + "// edited\n",
+        packages[1].depends,
+    )
+    result = write_protos([packages[0], changed], tmp_path)
+    assert result.unchanged == [packages[0].qual_name]
+    assert result.written == [changed.qual_name]
+    assert paths[0].stat().st_mtime == 1000
+    assert paths[1].stat().st_mtime != 1000
+    assert paths[1].read_text(encoding="utf-8").endswith("// edited\n")
+
+
+def test_write_keeps_existing_mode(tmp_path: Path) -> None:
+    package = compiled(make_packages(1))[0]
+    path = tmp_path / package.qual_name
+    path.parent.mkdir(parents=True)
+    path.write_text("old", encoding="utf-8")
+    path.chmod(0o640)
+    write_protos([package], tmp_path)
+    assert stat.S_IMODE(path.stat().st_mode) == 0o640
+
+
+def test_new_files_follow_umask(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def no_umask(mask: int) -> int:
+        raise AssertionError("the process umask was changed")
+
+    set_umask = os.umask
+    previous = set_umask(0o027)
+    try:
+        monkeypatch.setattr(writer.os, "umask", no_umask)
+        write_protos(compiled(make_packages(1)), tmp_path, manifest=True)
+    finally:
+        monkeypatch.undo()
+        set_umask(previous)
+    for path in tmp_path.rglob("*"):
+        if path.is_file():
+            assert stat.S_IMODE(path.stat().st_mode) == 0o640
+
+
+def test_failed_write_leaves_old_file(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    package = compiled(make_packages(1))[0]
+    path = tmp_path / package.qual_name
+    path.parent.mkdir(parents=True)
+    path.write_text("old", encoding="utf-8")
+
+    def broken_replace(src: str, dst: str) -> None:
+        raise OSError("disk full")
+
+    monkeypatch.setattr(writer.os, "replace", broken_replace)
+    with pytest.raises(OSError):
+        write_protos([package], tmp_path, jobs=1)
+    assert path.read_text(encoding="utf-8") == "old"
+    assert [p.name for p in path.parent.iterdir()] == [path.name]
+
+
+def test_duplicated_outputs_rejected(tmp_path: Path) -> None:
+    package = compiled(make_packages(1))[0]
+    with pytest.raises(ValueError, match="Duplicated"):
+        write_protos([package, package], tmp_path)
+
+
+def test_manifest_prunes_orphans(tmp_path: Path) -> None:
+    first = compiled(make_packages(3))
+    result = write_protos(first, tmp_path, manifest=True)
+    assert result.removed == []
+    manifest = read_manifest(tmp_path)
+    assert sorted(manifest) == sorted(p.qual_name for p in first)
+    assert manifest[first[0].qual_name]["depends"] == sorted(first[0].depends)
+
+    (tmp_path / "user.txt").write_text("keep me", encoding="utf-8")
+    os.utime(tmp_path / first[0].qual_name, (1000, 1000))
+    result = write_protos(first[:1], tmp_path, manifest=True)
+    assert result.unchanged == [first[0].qual_name]
+    assert result.removed == sorted(p.qual_name for p in first[1:])
+    assert (tmp_path / first[0].qual_name).stat().st_mtime == 1000
+    for package in first[1:]:
+        # package directories emptied by the pruning go away too
+        assert not (tmp_path / package.qual_name).parent.exists()
+    assert (tmp_path / "user.txt").exists()
+    assert sorted(read_manifest(tmp_path)) == [first[0].qual_name]
+
+
+def test_manifest_keeps_failed_packages(tmp_path: Path) -> None:
+    good = compiled(make_packages(4))
+    write_protos(good, tmp_path, manifest=True)
+
+    result = compile_service_partial(make_packages(4, broken=True))
+    keep = [ctx.name for ctx in result.failed]
+    assert keep == ["pack1", "pack3"]
+    written = write_protos(result.packages, tmp_path, manifest=True, keep=keep)
+    assert written.removed == []
+    # the failed packages keep their last good files
+    for package in good:
+        assert (tmp_path / package.qual_name).exists()
+    assert sorted(read_manifest(tmp_path)) == sorted(p.qual_name for p in good)
+
+    # once they are gone from the input, they are pruned as usual
+    written = write_protos(good[:1], tmp_path, manifest=True)
+    assert written.removed == sorted(p.qual_name for p in good[1:])
+
+
+def test_manifest_is_opt_in(tmp_path: Path) -> None:
+    packages = compiled(make_packages(2))
+    write_protos(packages, tmp_path)
+    assert not (tmp_path / MANIFEST_NAME).exists()
+    result = write_protos(packages[:1], tmp_path, manifest=True)
+    assert result.removed == []
+    assert (tmp_path / packages[1].qual_name).exists()
+
+
+def test_manifest_entries_stay_inside_out_dir(tmp_path: Path) -> None:
+    out_dir = tmp_path / "out"
+    outside = tmp_path / "outside.proto"
+    outside.write_text("x", encoding="utf-8")
+    out_dir.mkdir()
+    (out_dir / MANIFEST_NAME).write_text(
+        json.dumps(
+            {"version": 1, "files": {"../outside.proto": {"digest": "", "depends": []}}}
+        ),
+        encoding="utf-8",
+    )
+    result = write_protos(compiled(make_packages(1)), out_dir, manifest=True)
+    assert result.removed == []
+    assert outside.exists()
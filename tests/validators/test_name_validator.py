@@ -1,12 +1,15 @@
 import pytest
 
+import makeproto.validators.name as name_module
 from makeproto.compiler import CompilerContext, list_ctx_error_code
 from makeproto.report import CompileReport
 from makeproto.template import ServiceTemplate
 from makeproto.validators.name import (
+    PROBE_FILENAMES_ENV,
     BlockNameValidator,
     FieldNameValidator,
     check_valid_filenames,
+    filename_error,
 )
 from tests.test_helpers import make_method, make_service
 
@@ -149,3 +152,54 @@ def test_invalid_modules_name() -> None:
     check_valid_filenames(invalid_names, report)
     assert len(report.errors) == 2
     assert [err.code for err in report.errors] == ["E101", "E101"]
+
+
+@pytest.mark.parametrize(
+    "name",
+    ["", ".", "..", "a/b", "a b", "ção", "-flag", "trailing.", "con", "LPT1.backup"],
+)
+def test_invalid_filename_rules(name: str) -> None:
+    assert filename_error(name) is not None
+
+
+@pytest.mark.parametrize("name", ["module1", "my.package.file", "v1-beta_2"])
+def test_valid_filename_rules(name: str) -> None:
+    assert filename_error(name) is None
+
+
+def test_filename_length_limit() -> None:
+    assert filename_error("a" * 249) is None
+    assert filename_error("a" * 250) is not None
+
+
+def test_filename_check_does_not_touch_disk(monkeypatch: pytest.MonkeyPatch) -> None:
+    def no_probe(*args: object) -> None:
+        raise AssertionError("probed the filesystem")
+
+    monkeypatch.delenv(PROBE_FILENAMES_ENV, raising=False)
+    monkeypatch.setattr(name_module, "find_invalid_filenames", no_probe)
+    report = CompileReport("Test", [])
+    check_valid_filenames(["module1", "bad/name"], report)
+    assert [err.location for err in report.errors] == ["bad/name"]
+
+    before = filename_error.cache_info().hits
+    check_valid_filenames(["module1"], report)
+    assert filename_error.cache_info().hits == before + 1
+
+
+def test_filename_disk_probe_opt_in(monkeypatch: pytest.MonkeyPatch) -> None:
+    probed = []
+
+    def fake_probe(names: list) -> list:
+        probed.extend(names)
+        return [("module2", "rejected by the filesystem")]
+
+    monkeypatch.setattr(name_module, "find_invalid_filenames", fake_probe)
+    report = CompileReport("Test", [])
+    check_valid_filenames(["module1", "module2", "bad/name"], report, probe_disk=True)
+    assert probed == ["module1", "module2"]
+    assert [err.location for err in report.errors] == ["bad/name", "module2"]
+
+    monkeypatch.setenv(PROBE_FILENAMES_ENV, "1")
+    check_valid_filenames(["module3"], CompileReport("Test", []))
+    assert probed[-1] == "module3"